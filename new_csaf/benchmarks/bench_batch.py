@@ -0,0 +1,72 @@
+"""
+Batch Simulation Benchmark
+
+Reports the wall time of simulating N configurations of the F16 GCAS system one at a time, next to simulating them
+in lockstep with simulate_batch_tspan. In the batch, the plant and low-level controller are solved once per event
+for all members, while the autopilot is still solved member by member.
+
+In the new_csaf directory, run
+    PYTHONPATH=$PWD python benchmarks/bench_batch.py
+"""
+import argparse
+import time
+import typing
+
+import numpy as np
+
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+def _configurations(n: int) -> typing.List[typing.Dict[str, typing.Dict[str, typing.Sequence]]]:
+    """initial plant states over a range of altitudes"""
+    ivs: typing.List[typing.Dict[str, typing.Dict[str, typing.Sequence]]] = []
+    for alt in np.linspace(2000.0, 4000.0, n):
+        states = list(f16c.f16_gcas_scen)
+        states[11] = float(alt)
+        ivs.append({"plant": {"states": states}})
+    return ivs
+
+
+def _system(compiled: bool) -> f16s.F16Simple:
+    sys = f16s.F16Simple()
+    sys.set_component_param("plant", "compiled", compiled)
+    return sys
+
+
+def run_single(ivs, tspan, compiled: bool) -> float:
+    """time the configurations simulated one at a time, return seconds"""
+    start = time.perf_counter()
+    for iv in ivs:
+        sys = _system(compiled)
+        for cname, values in iv.items():
+            for ivname, v in values.items():
+                sys.set_component_iv(cname, ivname, v)
+        sys.simulate_tspan(tspan, use_cache=False)
+    return time.perf_counter() - start
+
+
+def run_batch(ivs, tspan, compiled: bool) -> float:
+    """time the configurations simulated in lockstep, return seconds"""
+    start = time.perf_counter()
+    _system(compiled).simulate_batch_tspan(tspan, initial_values=ivs)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tmax", type=float, default=5.0, help="simulation time span (s)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 8, 32], help="numbers of configurations")
+    parser.add_argument("--repeats", type=int, default=3, help="number of timed repeats (best is reported)")
+    args = parser.parse_args()
+    tspan = (0.0, args.tmax)
+    for compiled in (False, True):
+        # warm up the compiled kernels
+        run_batch(_configurations(2), (0.0, 0.1), compiled)
+        print(f"F16Simple plant compiled={compiled}, {args.tmax} s")
+        for n in args.sizes:
+            ivs = _configurations(n)
+            single_t = min(run_single(ivs, tspan, compiled) for _ in range(args.repeats))
+            batch_t = min(run_batch(ivs, tspan, compiled) for _ in range(args.repeats))
+            print(f"    N={n:4d}  one at a time {single_t:8.3f} s   batch {batch_t:8.3f} s   "
+                  f"speedup {single_t / batch_t:5.2f}x")
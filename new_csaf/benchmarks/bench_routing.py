@@ -0,0 +1,113 @@
+"""
+Signal Routing Microbenchmark
+
+Reports the per-event routing overhead of ComponentComposition.update_component (building the input vector and
+states of the updated component, and writing its flows back into the signal buffer) through the compiled execution
+plan, next to the baseline update_component over a dictionary signal buffer. Component solves are replaced by a
+replay of the outputs recorded in a simulation, so they are not timed, and skipping unchanged pure components is
+disabled.
+
+In the new_csaf directory, run
+    PYTHONPATH=$PWD python benchmarks/bench_routing.py
+"""
+import argparse
+import collections
+import itertools
+import time
+import typing
+
+from csaf.core.scheduler import Scheduler
+from csaf.core.system import ComponentComposition
+import f16lib.systems as f16s
+
+
+class DictRouting:
+    """update_component and build_input_vec of the baseline, routing over a dictionary signal buffer"""
+
+    def __init__(self, system: ComponentComposition):
+        self._components = system.component_instances
+        self.connections = system.connections
+        self._signals_buffer = system.signals_buffer
+        self._update_times = {cname: 0.0 for cname in self._components}
+
+    def build_input_vec(self, component_name: str) -> typing.Sequence:
+        component = self._components[component_name]
+        conns = [(component_name, inname) for inname in component.inputs_names]
+        inputs = []
+        for conn in conns:
+            lu = self.connections[conn]
+            n = list(self._signals_buffer[lu])
+            inputs += n
+        return list(inputs)
+
+    def update_component(self, component_name: str, ctime: float) -> typing.Dict[str, typing.Sequence]:
+        assert component_name in self._components
+        component = self._components[component_name]
+
+        # build out the inputs to solve the component
+        states = self._signals_buffer[(component_name, "states")]
+        inputs = self.build_input_vec(component_name)
+
+        # solve and update keys for signal buffer
+        ret = component.solve_sys_tspan(inputs, states, [self._update_times[component_name], ctime])
+        r = {(component_name, k): (list(v[-1]) if len(v) > 0 else list(v)) for k, v in ret.items()}
+
+        # update the context
+        self._signals_buffer.update(r)
+        self._update_times[component_name] = ctime
+
+        return {k: (list(v[-1]) if len(v) > 0 else list(v)) for k, v in ret.items()}
+
+
+def _events(system: ComponentComposition, tspan) -> typing.List[typing.Tuple[str, float]]:
+    components = system.component_instances
+    sched = Scheduler(components, list(components.keys()) if system.priority is None else system.priority)
+    return sched.get_schedule_tspan(tspan)
+
+
+def route(router: typing.Any, events) -> float:
+    """time the updates of events through a router, return seconds"""
+    start = time.perf_counter()
+    for cname, ctime in events:
+        router.update_component(cname, ctime)
+    return time.perf_counter() - start
+
+
+def run(system_type: typing.Type[ComponentComposition], tspan, repeats: int) -> None:
+    system = system_type()
+    system.skip_unchanged = False
+
+    # record the outputs of every update in a simulation
+    recorded: typing.Dict[str, typing.List] = collections.defaultdict(list)
+    update = system.update_component
+
+    def record(cname: str, ctime: float) -> typing.Dict[str, typing.Sequence]:
+        out = update(cname, ctime)
+        recorded[cname].append({flow: [v] for flow, v in out.items()})
+        return out
+
+    system.update_component = record  # type: ignore
+    system.simulate_tspan(tspan)
+    del system.update_component
+    events = _events(system, tspan)
+
+    # stub out the solves with a replay of the recorded outputs
+    for cname, component in system.component_instances.items():
+        replay = itertools.cycle(recorded[cname])
+        component.solve_sys_tspan = lambda inputs, states, teval, replay=replay: next(replay)  # type: ignore
+    baseline = DictRouting(system)
+
+    plan_t = min(route(system, events) for _ in range(repeats))
+    dict_t = min(route(baseline, events) for _ in range(repeats))
+    print(f"{system_type.__name__}: {len(events)} events, {system.execution_plan.size} signal values")
+    print(f"    execution plan  {plan_t / len(events) * 1E6:8.3f} us/event")
+    print(f"    dict lookups    {dict_t / len(events) * 1E6:8.3f} us/event")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tmax", type=float, default=5.0, help="simulation time span (s)")
+    parser.add_argument("--repeats", type=int, default=5, help="number of timed repeats (best is reported)")
+    args = parser.parse_args()
+    for stype in (f16s.F16Shield, f16s.F16AcasShieldIntruderBalloon):
+        run(stype, (0.0, args.tmax), args.repeats)
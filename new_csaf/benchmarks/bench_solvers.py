@@ -0,0 +1,63 @@
+"""
+Continuous Solver Benchmark
+
+Simulates F16Simple (GCAS scenario) with the plant and llc integrated by each solver, and reports the run time
+and the deviation of the plant states from the LSODA trajectory. Pass --compiled to use the compiled plant
+derivative.
+
+In the new_csaf directory, run
+    PYTHONPATH=$PWD python benchmarks/bench_solvers.py
+"""
+import argparse
+import time
+import typing
+
+import numpy as np
+
+from csaf.core.solver import SystemSolver, LSODASolver, EulerSolver, RK4Solver, DormandPrinceSolver
+from csaf.core.trace import TimeTrace
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+def f16simple_with(solver: typing.Type[SystemSolver], compiled: bool = False) -> typing.Type[f16s.F16Simple]:
+    """F16Simple with its continuous components integrated by solver"""
+    plant = type("F16PlantComponent", (f16c.F16PlantComponent,),
+                 {"system_solver": solver,
+                  "default_parameters": {**f16c.F16PlantComponent.default_parameters, "compiled": compiled}})
+    llc = type("F16NNLlcComponent", (f16c.F16NNLlcComponent,), {"system_solver": solver})
+    return typing.cast(typing.Type[f16s.F16Simple],
+                       type(f"F16Simple{solver.__name__}", (f16s.F16Simple,),
+                            {"components": {**f16s.F16Simple.components, "plant": plant, "llc": llc}}))
+
+
+def run(solver: typing.Type[SystemSolver], tspan, repeats: int,
+        compiled: bool = False) -> typing.Tuple[float, np.ndarray]:
+    """best run time over repeats (s) and plant states trajectory"""
+    system = f16simple_with(solver, compiled)()
+    system.set_state("plant", f16c.f16_gcas_scen)
+    best, states = np.inf, np.zeros(0)
+    for _ in range(repeats):
+        start = time.perf_counter()
+        trajs = typing.cast(typing.Dict[str, TimeTrace], system.simulate_tspan(tspan))
+        best = min(best, time.perf_counter() - start)
+        states = np.array(trajs["plant"]["states"])
+    return best, states
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tmax", type=float, default=20.0, help="simulation time span (s)")
+    parser.add_argument("--repeats", type=int, default=3, help="number of timed repeats (best is reported)")
+    parser.add_argument("--compiled", action="store_true", help="use the compiled plant derivative")
+    args = parser.parse_args()
+
+    tspan = (0.0, args.tmax)
+    ref_time, ref = run(LSODASolver, tspan, args.repeats, args.compiled)
+    print(f"{'solver':24s} {'time (s)':>9s} {'speedup':>8s} {'max |dh| (ft)':>14s} {'max |dvt| (ft/s)':>17s}")
+    print(f"{'LSODASolver':24s} {ref_time:9.3f} {1.0:8.2f} {0.0:14.2e} {0.0:17.2e}")
+    for solver in (EulerSolver.with_substeps(4), RK4Solver, RK4Solver.with_substeps(2), DormandPrinceSolver):
+        t, states = run(solver, tspan, args.repeats, args.compiled)
+        dh = np.max(np.abs(states[:, 11] - ref[:, 11]))
+        dvt = np.max(np.abs(states[:, 0] - ref[:, 0]))
+        print(f"{solver.__name__:24s} {t:9.3f} {ref_time / t:8.2f} {dh:14.2e} {dvt:17.2e}")
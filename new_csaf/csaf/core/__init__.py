@@ -3,4 +3,9 @@ from csaf.core.scheduler import Scheduler
 from csaf.core.system_env import SystemEnv
 from csaf.core.system import ComponentComposition, System
 from csaf.core.trace import TimeTrace
+from csaf.core.recording import RecordingPolicy
+from csaf.core.monitor import Monitor
+from csaf.core.events import ZeroCrossing
+from csaf.core.sweep import Sweep
+from csaf.core.cache import ResultCache, enable_cache, disable_cache
 from csaf.core.component import Component, DiscreteComponent, ContinuousComponent
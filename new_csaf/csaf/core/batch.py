@@ -0,0 +1,218 @@
+"""
+CSAF Batch Simulation
+
+Advance N configurations of the same system in lockstep
+"""
+from __future__ import annotations
+
+from csaf.core.monitor import Monitor, as_monitor
+from csaf.core.scheduler import Scheduler
+from csaf.core.trace import TimeTrace
+
+import collections
+import copy
+import numbers
+import numpy as np
+import typing
+import tqdm  # type: ignore
+
+if typing.TYPE_CHECKING:
+    # cyclic imports issue
+    from csaf.core.system import ComponentComposition
+
+__all__ = ['BatchSimulation']
+
+SignalKey = typing.Tuple[str, str]
+
+
+def _object_rows(rows: typing.Sequence, width: int) -> np.ndarray:
+    """copy a sequence of rows into an (N, width) object array (values can be strings, bools, ...)"""
+    arr = np.empty((len(rows), width), dtype=object)
+    for idx, row in enumerate(rows):
+        arr[idx, :] = list(row)
+    return arr
+
+
+def _is_real(value) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, (bool, np.bool_))
+
+
+def stack_signals(rows: typing.Sequence) -> np.ndarray:
+    """stack the values of one flow for N members into an (N, width) array
+
+    purely numeric flows are stored as float arrays, everything else (strings, bools) as object arrays
+    """
+    width = len(rows[0]) if len(rows) > 0 else 0
+    arr = _object_rows(rows, width)
+    if all(_is_real(v) for v in arr.flat):
+        return arr.astype(float)
+    return arr
+
+
+class BatchSimulation:
+    """ simulate N members of the same component composition in lockstep
+
+    Every member shares the schedule, so each event updates one component for all active members. The signal
+    buffer holds an (N, width) array per flow. Components that are vectorized (and configured identically
+    across members) are solved once per event for all members; other components are solved member by member.
+    """
+
+    def __init__(self, members: typing.Sequence[ComponentComposition]):
+        assert len(members) > 0, "batch must have at least one member"
+        assert len({type(m) for m in members}) == 1, "batch members must be instances of the same system"
+        self.members = list(members)
+        self.system = self.members[0]
+
+        # signal buffer is where the stacked signals are stored during simulation
+        self._signals: typing.Dict[SignalKey, np.ndarray] = {}
+        self._update_times: typing.Dict[str, float] = {}
+        self._vectorized: typing.Set[str] = set()
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+    def _shares_configuration(self, component_name: str) -> bool:
+        """whether every member applied the same parameter changes to a component"""
+
+        def changes(member):
+            return [c for c in member._param_changes if c[0] == component_name]
+
+        ref = changes(self.system)
+        for member in self.members[1:]:
+            other = changes(member)
+            if len(other) != len(ref):
+                return False
+            for (_, pa, va), (_, pb, vb) in zip(ref, other):
+                try:
+                    if pa != pb or not bool(va == vb):
+                        return False
+                except ValueError:
+                    # ambiguous comparison (e.g. numpy arrays)
+                    return False
+        return True
+
+    def initialize_buffer(self) -> None:
+        """
+        reset all members and stack their initial signals
+        """
+        for member in self.members:
+            member.reset()
+            member.initialize_buffer()
+        self._signals = {k: stack_signals([m.get_signal(*k) for m in self.members])
+                         for k in self.system.execution_plan.slices}
+        self._update_times = dict(self.system._update_times)
+        self._vectorized = {name for name, c in self.system.component_instances.items()
+                            if c.is_vectorized and self._shares_configuration(name)}
+
+    def _write(self, key: SignalKey, index: np.ndarray, rows: typing.Sequence) -> None:
+        """write rows for the members in index into the buffer, promoting it to objects when needed"""
+        buf = self._signals[key]
+        if buf.dtype != object:
+            vals = np.asarray(rows)
+            if vals.dtype.kind in 'fi':
+                buf[index] = np.reshape(vals, (len(index), buf.shape[1]))
+                return
+            buf = buf.astype(object)
+            self._signals[key] = buf
+        buf[index] = _object_rows(rows, buf.shape[1])
+
+    def build_input_array(self, component_name: str, index: np.ndarray) -> np.ndarray:
+        """ extract the (len(index), width) stacked input array described in the component
+
+        :param component_name: name of component to build an input array for
+        :param index: members to gather the inputs for
+        :return: stacked inputs
+        """
+        conns = self.system.execution_plan.input_sources[component_name]
+        if len(conns) == 0:
+            return np.zeros((len(index), 0))
+        return np.concatenate([self._signals[conn][index] for conn in conns], axis=1)
+
+    def build_input_vec(self, component_name: str, member_idx: int) -> typing.List:
+        """ extract the input vector of one member """
+        inputs: typing.List = []
+        for conn in self.system.execution_plan.input_sources[component_name]:
+            inputs += self._signals[conn][member_idx].tolist()
+        return inputs
+
+    def update_component(self, component_name: str, ctime: float,
+                         index: np.ndarray) -> typing.Dict[str, np.ndarray]:
+        """
+        update the stacked signals affected by the component for the members in index
+
+        :return: flow name -> (len(index), width) array of the new values
+        """
+        teval = [self._update_times[component_name], ctime]
+        inputs: typing.Any
+        states: typing.Any
+        if component_name in self._vectorized:
+            component = self.system.component_instances[component_name]
+            inputs = self.build_input_array(component_name, index)
+            states = self._signals[(component_name, "states")][index]
+            ret = component.solve_sys_tspan(inputs, states, teval)
+            for k, v in ret.items():
+                self._write((component_name, k), index, v[-1])
+        else:
+            rows: typing.Dict[str, typing.List] = {}
+            for member_idx in index:
+                component = self.members[member_idx].component_instances[component_name]
+                inputs = self.build_input_vec(component_name, member_idx)
+                states = self._signals[(component_name, "states")][member_idx].tolist()
+                ret = component.solve_sys_tspan(inputs, states, teval)
+                for k, v in ret.items():
+                    rows.setdefault(k, []).append(list(v[-1]) if len(v) > 0 else [])
+            for k, r in rows.items():
+                self._write((component_name, k), index, r)
+        self._update_times[component_name] = ctime
+        return {k: self._signals[(component_name, k)][index] for k in
+                self.system.component_instances[component_name].flow_names}
+
+    def simulate_tspan(self, tspan,
+                       show_status: bool = False,
+                       terminating_conditions: typing.Optional[typing.Callable] = None,
+                       terminating_conditions_all: typing.Optional[typing.Union[Monitor, typing.Callable]] = None) -> \
+            typing.Tuple[typing.List[typing.Dict[str, TimeTrace]], typing.List[bool]]:
+        """ simulate all members over a given time span
+
+        a member that meets the terminating conditions stops being advanced, while the others continue
+
+        :return: (traces for each member, whether each member passed)
+        """
+        self.initialize_buffer()
+
+        components = self.system.component_instances
+        sched = Scheduler(components, list(components.keys()) if self.system.priority is None
+                          else self.system.priority)
+        evts = sched.get_schedule_tspan(tspan)
+        evts_it = evts if not show_status else tqdm.tqdm(evts)
+
+        capacities = collections.Counter(cname for cname, _ in evts)
+        dtraces = [member.create_traces(capacities) for member in self.members]
+        # every member is watched by its own copy of the monitor
+        monitor = as_monitor(terminating_conditions_all)
+        monitors = [copy.deepcopy(monitor) for _ in self.members]
+        for m, traces in zip(monitors, dtraces):
+            if m is not None:
+                m.reset(traces)
+        passed = [True] * self.size
+        active = np.arange(self.size)
+
+        for cname, ctime in evts_it:
+            if len(active) == 0:
+                break
+            out = self.update_component(cname, ctime, active)
+            still_active = []
+            for row, member_idx in enumerate(active):
+                mout = {k: v[row].tolist() for k, v in out.items()}
+                mout["times"] = ctime
+                dtraces[member_idx][cname].append(**mout)
+                monitor = monitors[member_idx]
+                if (terminating_conditions is not None and terminating_conditions(cname, mout)) or \
+                        (monitor is not None and monitor.update(cname, mout)):
+                    passed[member_idx] = False
+                else:
+                    still_active.append(member_idx)
+            active = np.array(still_active, dtype=int)
+
+        return dtraces, passed
@@ -0,0 +1,471 @@
+"""
+CSAF Result Cache
+
+Opt-in on-disk cache of simulation results, keyed by a content hash of the simulated system
+"""
+import collections.abc
+import copy
+import enum
+import functools
+import hashlib
+import importlib.metadata
+import os
+import pathlib
+import pickle
+import sys
+import sysconfig
+import tempfile
+import types
+
+import csaf.core.base as cbase
+from csaf.core.monitor import Monitor, AnyOf, TraceCondition, as_monitor
+from csaf.core.solver import SystemSolver
+
+import numpy as np
+import typing
+
+__all__ = ['ResultCache', 'enable_cache', 'disable_cache', 'get_cache', 'simulation_key']
+
+# bump when the key or the stored results change
+CACHE_FORMAT_VERSION = 5
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+# environment variable holding the default cache directory of enable_cache
+CACHE_DIR_ENV = 'CSAF_CACHE_DIR'
+
+# component class attributes that define its simulation
+COMPONENT_FIELDS = ("name", "system_solver", "sampling_frequency", "sampling_phase", "is_discrete",
+                    "default_parameters", "default_initial_values", "inputs", "outputs", "states", "flows",
+                    "initialize", "is_vectorized", "wakeup", "is_pure")
+
+# system attributes that define its simulation
+SYSTEM_FIELDS = ("priority", "monolithic", "skip_unchanged")
+
+# solver class attributes that define its numerics
+SOLVER_FIELDS = ("a", "b", "c", "substeps")
+
+# (path, modification time, size) -> content hash of a model file
+_file_digests: typing.Dict[typing.Tuple[str, int, int], str] = {}
+
+# directories of the standard library and of installed packages, whose code is described by its version
+_INSTALLED_PATHS = tuple(sorted({os.path.realpath(p) for k, p in sysconfig.get_paths().items()
+                                 if k in ("stdlib", "platstdlib", "purelib", "platlib")}))
+
+
+class _Uncacheable(Exception):
+    """part of a simulation has no stable content hash"""
+    pass
+
+
+def _update(h, tag: str, data: bytes = b"") -> None:
+    h.update(tag.encode())
+    h.update(len(data).to_bytes(8, "little"))
+    h.update(data)
+
+
+def _digest(obj: typing.Any, h, seen: typing.Set[int]) -> None:
+    """feed a stable encoding of obj into the hash h"""
+    if obj is None or obj is Ellipsis or isinstance(obj, (bool, np.bool_, str, bytes, complex, enum.Enum)):
+        _update(h, type(obj).__name__, repr(obj).encode())
+    elif isinstance(obj, (int, float, np.integer, np.floating)):
+        # 30 and 30.0 are the same time or parameter
+        value = float(obj)
+        _update(h, "num", repr(value if value == obj else obj).encode())
+    elif isinstance(obj, np.ndarray):
+        _update(h, "ndarray", f"{obj.dtype.str}{obj.shape}".encode())
+        if obj.dtype == object:
+            for v in obj.flat:
+                _digest(v, h, seen)
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, type):
+        _update(h, "type", f"{obj.__module__}.{obj.__qualname__}".encode())
+        if issubclass(obj, SystemSolver):
+            for field in SOLVER_FIELDS:
+                _digest(getattr(obj, field, None), h, seen)
+            # the code of the solve methods (their closures only hold the class, for super())
+            for klass in obj.__mro__[:obj.__mro__.index(SystemSolver) + 1]:
+                for _, method in sorted((k, v) for k, v in vars(klass).items() if isinstance(v, types.FunctionType)):
+                    for func in (method, *_called_functions(method)):
+                        _digest_function(func, h, seen)
+    else:
+        if id(obj) in seen:
+            raise _Uncacheable(f"{type(obj).__name__} object refers to itself")
+        seen.add(id(obj))
+        try:
+            _digest_container(obj, h, seen)
+        finally:
+            seen.discard(id(obj))
+
+
+def _digest_container(obj: typing.Any, h, seen: typing.Set[int]) -> None:
+    if isinstance(obj, (tuple, list)):
+        _update(h, type(obj).__name__, str(len(obj)).encode())
+        for v in obj:
+            _digest(v, h, seen)
+    elif isinstance(obj, collections.abc.Mapping):
+        _update(h, "dict", str(len(obj)).encode())
+        for k in sorted(obj, key=repr):
+            _digest(k, h, seen)
+            _digest(obj[k], h, seen)
+    elif isinstance(obj, (set, frozenset)):
+        _update(h, "set", str(len(obj)).encode())
+        for d in sorted(_hexdigest(v, seen) for v in obj):
+            h.update(d.encode())
+    elif isinstance(obj, types.FunctionType):
+        # the code of a function and of the functions of its package it calls, not the other globals it reads
+        _digest_function(obj, h, seen)
+        _digest([c.cell_contents for c in obj.__closure__ or ()], h, seen)
+        for func in _called_functions(obj):
+            _digest_function(func, h, seen)
+    elif isinstance(obj, types.CodeType):
+        _update(h, "code", obj.co_code)
+        _digest(obj.co_consts, h, seen)
+        _digest(obj.co_names, h, seen)
+    elif isinstance(obj, types.BuiltinFunctionType):
+        _update(h, "builtin", f"{obj.__module__}.{obj.__qualname__}".encode())
+    elif isinstance(obj, types.MethodType):
+        _digest(obj.__func__, h, seen)
+        _digest(obj.__self__, h, seen)
+    elif isinstance(obj, (slice, range)):
+        _digest((type(obj), obj.start, obj.stop, obj.step), h, seen)
+    elif isinstance(obj, functools.partial):
+        _digest((obj.func, obj.args, obj.keywords), h, seen)
+    elif hasattr(obj, "py_func"):
+        # jit compiled function
+        _digest(obj.py_func, h, seen)
+    elif hasattr(obj, "_asdict"):
+        _digest((type(obj), tuple(obj)), h, seen)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, types.ModuleType):
+        # an object (e.g. in the parameters) is described by its attributes and the code of its class
+        _digest((type(obj), vars(obj)), h, seen)
+        _digest_class(type(obj), h, seen)
+    else:
+        raise _Uncacheable(f"{type(obj).__name__} object has no stable content hash")
+
+
+def _digest_function(func: types.FunctionType, h, seen: typing.Set[int]) -> None:
+    _update(h, "function", f"{func.__module__}.{func.__qualname__}".encode())
+    _digest(func.__code__, h, seen)
+    _digest(func.__defaults__, h, seen)
+    _digest(func.__kwdefaults__, h, seen)
+
+
+def _is_installed(module_name: str) -> bool:
+    """whether a module is part of the standard library or of an installed package (or built in)"""
+    filename = getattr(sys.modules.get(module_name), "__file__", None)
+    return filename is None or os.path.realpath(filename).startswith(_INSTALLED_PATHS)
+
+
+def _package_version(module_name: str) -> str:
+    package = module_name.partition(".")[0]
+    try:
+        return importlib.metadata.version(package)
+    except (importlib.metadata.PackageNotFoundError, ValueError):
+        return str(getattr(sys.modules.get(package), "__version__", ""))
+
+
+def _class_functions(klass: type) -> typing.List[types.FunctionType]:
+    """functions defined by a class and its bases of the same package (methods, static and class methods and
+    properties)"""
+    package = (klass.__module__ or "").partition(".")[0]
+    ret = []
+    for base in klass.__mro__:
+        if (base.__module__ or "").partition(".")[0] != package:
+            continue
+        for _, value in sorted(vars(base).items(), key=lambda kv: kv[0]):
+            for v in (value, getattr(value, "__func__", None), getattr(value, "fget", None),
+                      getattr(value, "fset", None)):
+                func = _as_function(v)
+                if func is not None:
+                    ret.append(func)
+    return ret
+
+
+def _digest_class(klass: type, h, seen: typing.Set[int]) -> None:
+    """the code of the methods of a class and of the functions they call, or the version of the package of a class
+    of an installed package"""
+    if _is_installed(klass.__module__):
+        _update(h, "version", _package_version(klass.__module__).encode())
+        return
+    for method in _class_functions(klass):
+        for func in (method, *_called_functions(method)):
+            _digest_function(func, h, seen)
+
+
+def _code_names(code: types.CodeType) -> typing.List[str]:
+    """global and attribute names read by code, and by the code it defines"""
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.extend(_code_names(const))
+    return names
+
+
+def _as_function(obj: typing.Any) -> typing.Optional[types.FunctionType]:
+    obj = getattr(obj, "py_func", obj)
+    return obj if isinstance(obj, types.FunctionType) else None
+
+
+def _called_functions(func: types.FunctionType) -> typing.List[types.FunctionType]:
+    """ functions of the package of func that it reads from its globals (e.g. calls), and that they read in turn
+
+    names are looked up in the globals of a function and in the modules among them, so f16.subf16df and the jit
+    compiled kernels it calls are found from the F16 plant flows. The methods of the classes of the package it
+    reads are included, so the methods of the LLC feedback controller are found from the LLC initializer.
+    """
+    package = (func.__module__ or "").partition(".")[0]
+    found: typing.Dict[int, types.FunctionType] = {id(func): func}
+    ret = []
+    stack = [func]
+    while stack:
+        f = stack.pop()
+        names = _code_names(f.__code__)
+        for name in dict.fromkeys(names):
+            value = f.__globals__.get(name)
+            if isinstance(value, types.ModuleType):
+                if value.__name__.partition(".")[0] != package:
+                    continue
+                candidates = [getattr(value, n, None) for n in dict.fromkeys(names)]
+            else:
+                candidates = [value]
+            for candidate in [f for c in candidates for f in
+                              (_class_functions(c) if isinstance(c, type) and
+                               (c.__module__ or "").partition(".")[0] == package else [c])]:
+                g = _as_function(candidate)
+                while g is not None and id(g) not in found and (g.__module__ or "").partition(".")[0] == package:
+                    found[id(g)] = g
+                    ret.append(g)
+                    stack.append(g)
+                    # the function a decorator wraps
+                    g = _as_function(getattr(g, "__wrapped__", None))
+    return ret
+
+
+def _file_digest(filename: str) -> str:
+    """content hash of a file, recomputed when it changes"""
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return "missing"
+    key = (os.path.realpath(filename), st.st_mtime_ns, st.st_size)
+    if key not in _file_digests:
+        h = hashlib.sha256()
+        with open(filename, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                h.update(chunk)
+        _file_digests[key] = h.hexdigest()
+    return _file_digests[key]
+
+
+def _hexdigest(obj: typing.Any, seen: typing.Optional[typing.Set[int]] = None) -> str:
+    h = hashlib.sha256()
+    _digest(obj, h, set() if seen is None else seen)
+    return h.hexdigest()
+
+
+def _component_description(component_type: type) -> typing.Tuple:
+    return (component_type,
+            tuple(getattr(component_type, f, None) for f in COMPONENT_FIELDS),
+            tuple(_file_digest(f) for f in getattr(component_type, "model_files", ())))
+
+
+def _condition_description(condition: typing.Any) -> typing.Any:
+    """a monitor is described by its configuration, i.e. its state after a reset"""
+    if isinstance(condition, Monitor):
+        condition = copy.deepcopy(condition)
+        condition.reset({})
+    return condition
+
+
+def simulation_key(system, tspan: typing.Tuple[float, float], **settings) -> typing.Optional[str]:
+    """ content hash of a simulation, None when part of it has no stable hash (e.g. an object without a __dict__)
+
+    the hash covers the type of the system and its settings (e.g. skip_unchanged), its components (solvers,
+    sampling, default parameters and initial values, the code of the flows and of the functions they call, model
+    files), connections, the initial value and parameter changes made to it, the time span and the given settings
+    (e.g. terminating conditions)
+
+    Code is found by name: the functions and classes a function reads from its globals (or from the modules among
+    them) in its own package, the methods of those classes, and the methods of the classes of objects in the
+    parameters. Code reached otherwise (e.g. through getattr with a computed name) is not hashed. Classes of the
+    standard library and of installed packages are described by the package version rather than their code.
+
+    :param system: composition to simulate
+    :param tspan: simulation time span
+    """
+    try:
+        return _hexdigest((CACHE_FORMAT_VERSION,
+                           type(system),
+                           {cname: _component_description(ctype) for cname, ctype in system.components.items()},
+                           system.connections,
+                           tuple(getattr(system, f, None) for f in SYSTEM_FIELDS),
+                           system._iv_changes,
+                           system._param_changes,
+                           tuple(tspan),
+                           {k: _condition_description(v) for k, v in settings.items()}))
+    except (_Uncacheable, RecursionError):
+        return None
+
+
+def _stateful_monitors(monitor: typing.Optional[Monitor]) -> typing.List[Monitor]:
+    if monitor is None or isinstance(monitor, TraceCondition):
+        return []
+    if isinstance(monitor, AnyOf):
+        return [m for mi in monitor.monitors for m in _stateful_monitors(mi)]
+    return [monitor]
+
+
+def monitor_states(condition: typing.Any, traces: typing.Mapping[str, typing.Any]
+                   ) -> typing.List[typing.Dict[str, typing.Any]]:
+    """ state of the monitors of a terminating condition at the end of a simulation, to store with its result
+
+    conditions over the whole traces are stateless, and have no stored state
+
+    :param condition: terminating_conditions_all of the simulation
+    :param traces: traces of the simulation, that the monitors may refer to
+    """
+    return [{k: v for k, v in vars(m).items() if v is not traces}
+            for m in _stateful_monitors(as_monitor(condition))]
+
+
+def restore_monitors(condition: typing.Any, traces: typing.Mapping[str, typing.Any],
+                     states: typing.Sequence[typing.Dict[str, typing.Any]]) -> None:
+    """ set the monitors of a terminating condition to their stored state at the end of a cached simulation
+
+    :param condition: terminating_conditions_all of the simulation
+    :param traces: cached traces
+    :param states: monitor_states of the simulation
+    """
+    monitors = _stateful_monitors(as_monitor(condition))
+    assert len(monitors) == len(states), "stored states don't match the monitors"
+    for m, state in zip(monitors, states):
+        m.reset(traces)
+        vars(m).update(state)
+
+
+class ResultCache(cbase.CsafBase):
+    """
+    CSAF Result Cache
+
+    Simulation results stored on disk by content hash (see simulation_key), one pickle file per result. Reading a
+    result refreshes its modification time, and the least recently used results are evicted when the cache grows
+    over max_bytes. Files are written atomically, so the cache can be shared between processes.
+    """
+    suffix = ".pkl"
+
+    def __init__(self, directory: typing.Union[str, os.PathLike], max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param directory: directory of the cache (created if needed)
+        :param max_bytes: size bound of the cache
+        """
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.check()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def validate(self) -> None:
+        assert self.max_bytes > 0, f"cache size bound must be positive (got {self.max_bytes})"
+
+    def path(self, key: str) -> pathlib.Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> typing.Optional[typing.Any]:
+        """stored value of a key (None if absent)"""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as fp:
+                value = pickle.load(fp)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # unreadable (e.g. written by other code), treated as absent
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: typing.Any) -> None:
+        """store a value, evicting least recently used values over the size bound (values that can't be pickled
+        are not stored)"""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                pickle.dump(value, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(key))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            pathlib.Path(tmp).unlink(missing_ok=True)
+            return
+        except BaseException:
+            pathlib.Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def entries(self) -> typing.List[typing.Tuple[float, int, pathlib.Path]]:
+        """(access time, size, path) of the stored values, least recently used first"""
+        ret = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            ret.append((st.st_mtime, st.st_size, path))
+        return sorted(ret)
+
+    @property
+    def size(self) -> int:
+        """bytes stored"""
+        return sum(s for _, s, _ in self.entries())
+
+    def evict(self) -> None:
+        entries = self.entries()
+        total = sum(s for _, s, _ in entries)
+        for _, s, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= s
+
+    def clear(self) -> None:
+        for _, _, path in self.entries():
+            path.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+
+# cache consulted by simulations
+_cache: typing.Optional[ResultCache] = None
+
+
+def enable_cache(directory: typing.Optional[typing.Union[str, os.PathLike]] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> ResultCache:
+    """ cache the results of simulate_tspan (and so validate_tspan and goal simulations) in this process
+
+    the cache is disabled until this is called
+
+    :param directory: cache directory ($CSAF_CACHE_DIR, or ~/.cache/csaf when None)
+    :param max_bytes: size bound of the cache
+    """
+    global _cache
+    _cache = ResultCache(directory if directory is not None else
+                         os.environ.get(CACHE_DIR_ENV) or pathlib.Path.home() / ".cache" / "csaf",
+                         max_bytes=max_bytes)
+    return _cache
+
+
+def disable_cache() -> None:
+    global _cache
+    _cache = None
+
+
+def get_cache() -> typing.Optional[ResultCache]:
+    """cache consulted by simulations (None when disabled)"""
+    return _cache
+
@@ -6,6 +6,8 @@ from csaf.core.solver import LSODASolver, DiscreteSolver, SystemSolver
 
 import abc
 import enum
+import functools
+import numpy as np
 import typing
 
 # custom types
@@ -16,6 +18,41 @@ ParameterIdentifier = typing.Annotated[str, 'ParameterIdentifier']
 Parameters = typing.Dict[str, typing.Any]
 
 
+def memoize_flow(func: typing.Callable) -> typing.Callable:
+    """ remember the last evaluation of a flow function f(model, t, states, inputs, ...) for each model
+
+    use when several flows are computed from one expensive evaluation (e.g. a state derivative and outputs that
+    come from the same aero model), so requesting them at the same (t, states, inputs) evaluates it once. Only
+    numeric states and inputs are memoized. The memo is also dropped when a model parameter is replaced (compared
+    by identity, so a parameter mutated in place isn't seen).
+
+    Flows are only memoized for models with memoize_flows set, e.g. the members of a monolithic group, whose
+    outputs and state derivatives are evaluated at the same points. Component by component, the outputs are
+    evaluated at the end of a step where the solver never evaluated the derivative, so the memo couldn't hit.
+    """
+    attr = f"_memo_{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(model, t, states, inputs, *args, **kwargs):
+        if not getattr(model, "memoize_flows", False):
+            return func(model, t, states, inputs, *args, **kwargs)
+        sarr, iarr = np.asarray(states), np.asarray(inputs)
+        if sarr.dtype.kind not in 'fi' or iarr.dtype.kind not in 'fi':
+            return func(model, t, states, inputs, *args, **kwargs)
+        key = (t, sarr.dtype.str, sarr.shape, sarr.tobytes(), iarr.dtype.str, iarr.shape, iarr.tobytes(), args,
+               tuple(kwargs.items()))
+        params = model.parameters
+        memo = model.__dict__.get(attr)
+        if memo is not None and memo[0] == key and memo[1].keys() == params.keys() and \
+                all(v is params[k] for k, v in memo[1].items()):
+            return memo[2]
+        ret = func(model, t, states, inputs, *args, **kwargs)
+        model.__dict__[attr] = (key, dict(params), ret)
+        return ret
+
+    return wrapper
+
+
 class SystemRepresentationEnum(enum.IntEnum):
     BLACK_BOX = 0
 
@@ -83,6 +120,27 @@ class Component(cbase.CsafBase, metaclass=abc.ABCMeta):
     # initializer
     initialize: typing.Optional[typing.Callable] = None
 
+    # parameters the initializer depends on (None for all of them), changing others doesn't initialize again
+    initialize_parameters: typing.Optional[typing.Collection[str]] = None
+
+    # whether flows accept stacked (N, width) states and inputs, and keep no other state between calls
+    # (used by batch simulation to solve N configurations with one call)
+    is_vectorized: bool = False
+
+    # time the component is idle until after an update, (model, time, states, inputs) -> time (None for the next
+    # sample, inf for the rest of the simulation). Samples before it are skipped, holding the outputs.
+    wakeup: typing.Optional[typing.Callable] = None
+
+    # flows depend only on the states and inputs (not on time or on parameters changed during a simulation), so
+    # an update with unchanged states and inputs can be skipped, reusing the previous outputs
+    is_pure: bool = False
+
+    # remember the last evaluation of memoize_flow flows (set for the members of monolithic groups)
+    memoize_flows: bool = False
+
+    # files the component reads its model from (e.g. network weights), hashed by the result cache
+    model_files: typing.Sequence[str] = ()
+
     def __init__(self):
         self.check_fields()
         self.parameters = self.default_parameters.copy()
@@ -221,7 +279,7 @@ class Component(cbase.CsafBase, metaclass=abc.ABCMeta):
 
 class ContinuousComponent(Component):
     system_representation = SystemRepresentationEnum.BLACK_BOX
-    system_solver = LSODASolver
+    system_solver: typing.Type[SystemSolver] = LSODASolver
     is_discrete = False
     sampling_phase = 0.0
 
@@ -0,0 +1,148 @@
+"""
+CSAF Zero Crossing Events
+
+Guards over component states whose zero crossings are located inside the continuous steps of a simulation
+"""
+from __future__ import annotations
+
+import csaf.core.base as cbase
+
+import scipy.optimize  # type: ignore
+import typing
+
+if typing.TYPE_CHECKING:
+    # cyclic imports issue
+    from csaf.core.system import ComponentComposition
+
+__all__ = ['ZeroCrossing', 'Crossing', 'CrossingDetector']
+
+
+class Crossing(typing.NamedTuple):
+    """a located zero crossing of a guard"""
+    name: str
+
+    time: float
+
+    # 1 when the guard rises through zero, -1 when it falls
+    direction: int
+
+    terminal: bool
+
+    # component name -> states at the crossing
+    states: typing.Dict[str, typing.List]
+
+
+class ZeroCrossing(cbase.CsafBase):
+    """ guard over the states of components, with an event where it crosses zero
+
+    e.g. ground collision, ZeroCrossing("plant", lambda s: s[11], direction=-1)
+
+    :param components: component name(s) whose states are the arguments of the guard
+    :param guard: states of each component -> real number
+    :param direction: crossings to detect: 1 rising, -1 falling, 0 both
+    :param terminal: stop the simulation at the crossing
+    :param name: name of the crossing events (guard name when None)
+    :param xtol: tolerance of the crossing time
+    """
+    directions = (-1, 0, 1)
+
+    def __init__(self, components: typing.Union[str, typing.Sequence[str]],
+                 guard: typing.Callable[..., float],
+                 direction: int = 0,
+                 terminal: bool = True,
+                 name: typing.Optional[str] = None,
+                 xtol: float = 1E-9):
+        self.components = [components] if isinstance(components, str) else list(components)
+        self.guard = guard
+        self.direction = direction
+        self.terminal = terminal
+        self.name = name if name is not None else getattr(guard, "__name__", "guard")
+        self.xtol = xtol
+        self.check()
+
+    def validate(self) -> None:
+        assert len(self.components) > 0, "guard must have at least one component"
+        assert self.direction in self.directions, f"direction {self.direction} must be one of {self.directions}"
+        assert self.xtol > 0.0, f"crossing time tolerance must be positive (got {self.xtol})"
+
+    def __call__(self, *states: typing.Sequence) -> float:
+        return float(self.guard(*states))
+
+    def crossed(self, g0: float, g1: float) -> int:
+        """direction of a crossing of the guard going from g0 to g1 (0 for none, or a direction not detected)"""
+        if g0 < 0.0 <= g1 and g1 != g0:
+            direction = 1
+        elif g0 > 0.0 >= g1:
+            direction = -1
+        else:
+            return 0
+        return direction if self.direction in (0, direction) else 0
+
+
+class CrossingDetector:
+    """ locates the crossings of guards over the steps of a simulation
+
+    a guard is checked whenever all of its continuous components have been updated to the same time (discrete
+    components hold their states between updates). When it changed sign since the last check, the crossing time is
+    found by root finding, with the states at intermediate times from integrating again over the components' last
+    steps (see ComponentComposition.states_at), so the continuous components of a guard should share a sampling
+    rate. Guards crossing zero twice between two checks are not detected.
+    """
+
+    def __init__(self, system: ComponentComposition, zero_crossings: typing.Sequence[ZeroCrossing]):
+        self.system = system
+        self.zero_crossings = list(zero_crossings)
+        for zc in self.zero_crossings:
+            for cname in zc.components:
+                assert cname in system.components, f"guard {zc.name} refers to unknown component {cname}"
+        self._by_component: typing.Dict[str, typing.List[int]] = {}
+        for idx, zc in enumerate(self.zero_crossings):
+            for cname in zc.components:
+                self._by_component.setdefault(cname, []).append(idx)
+        # guard index -> components that must reach the same time for a check
+        components = system.component_instances
+        self._synchronized = [[c for c in zc.components if components[c].is_continuous] or zc.components
+                              for zc in self.zero_crossings]
+        # guard index -> (time, value) at the last check
+        self._last: typing.Dict[int, typing.Tuple[float, float]] = {}
+
+    def reset(self) -> None:
+        """evaluate the guards at the current states of the system"""
+        self._last = {}
+        for idx, zc in enumerate(self.zero_crossings):
+            times = {self.system._update_times.get(c) for c in self._synchronized[idx]}
+            time = times.pop() if len(times) == 1 else None
+            if time is not None:
+                self._last[idx] = (time, zc(*[self.system.get_signal(c, "states") for c in zc.components]))
+
+    def _guard_at(self, zc: ZeroCrossing, t: float) -> float:
+        return zc(*[self.system.states_at(c, t) for c in zc.components])
+
+    def update(self, component_name: str, ctime: float) -> typing.List[Crossing]:
+        """ check the guards of a component after its update at ctime
+
+        :return: crossings located since the last checks, by time
+        """
+        crossings = []
+        update_times = self.system._update_times
+        for idx in self._by_component.get(component_name, ()):
+            zc = self.zero_crossings[idx]
+            if any(update_times[c] != ctime for c in self._synchronized[idx]):
+                continue
+            g1 = zc(*[self.system.get_signal(c, "states") for c in zc.components])
+            last = self._last.get(idx)
+            self._last[idx] = (ctime, g1)
+            if last is None or last[0] >= ctime:
+                continue
+            t0, g0 = last
+            direction = zc.crossed(g0, g1)
+            if direction == 0:
+                continue
+            if g1 == 0.0:
+                tc = ctime
+            else:
+                tc = scipy.optimize.brentq(lambda t: self._guard_at(zc, t) if t > t0 else g0, t0, ctime,
+                                           xtol=zc.xtol)
+            crossings.append(Crossing(zc.name, float(tc), direction, zc.terminal,
+                                      {c: list(self.system.states_at(c, tc)) for c in zc.components}))
+        return sorted(crossings, key=lambda c: c.time)
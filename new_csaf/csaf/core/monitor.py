@@ -0,0 +1,278 @@
+"""
+CSAF Monitors
+
+Incremental terminating conditions over the samples of a simulation
+"""
+import collections
+import math
+
+import csaf.core.base as cbase
+
+import numpy as np
+import typing
+
+__all__ = ['Monitor', 'TraceCondition', 'AnyOf', 'RunningMin', 'RunningMax', 'Always', 'Eventually',
+           'SeparationMonitor', 'as_monitor']
+
+
+class Monitor(cbase.CsafBase):
+    """
+    CSAF Monitor Base Class
+
+    A monitor keeps its own state and is given each new sample of a simulation as it is recorded, rather than the
+    whole trace history, so a condition over the history costs O(1) per sample. It can be passed as the
+    terminating_conditions_all of a simulation.
+
+    A monitor is also given the zero crossings located by the simulation (see csaf.core.events). Monitors of
+    crossings only can set per_sample to False, so they run at the crossings rather than at every sample.
+    """
+    # whether to update the monitor with every sample
+    per_sample: bool = True
+
+    def reset(self, traces: typing.Mapping[str, typing.Any]) -> None:
+        """ clear the monitor state at the start of a simulation
+
+        :param traces: component name -> trace, that the simulation records into
+        """
+        pass
+
+    def update(self, component_name: str, sample: typing.Mapping[str, typing.Any]) -> bool:
+        """ advance the monitor with a new sample
+
+        :param component_name: name of the component that produced the sample
+        :param sample: flow name -> value, and the sample time at "times"
+        :return: whether to terminate the simulation
+        """
+        raise NotImplementedError
+
+    def crossing(self, crossing: typing.Any) -> bool:
+        """ advance the monitor with a zero crossing of the simulation
+
+        :param crossing: located crossing (csaf.core.events.Crossing)
+        :return: whether to terminate the simulation (at the crossing)
+        """
+        return False
+
+    def validate(self) -> None:
+        pass
+
+
+class TraceCondition(Monitor):
+    """monitor evaluating a condition over the whole traces at every sample (terminating_conditions_all)"""
+
+    def __init__(self, condition: typing.Callable[[typing.Mapping[str, typing.Any]], bool]):
+        self.condition = condition
+        self._traces: typing.Mapping[str, typing.Any] = {}
+
+    def reset(self, traces: typing.Mapping[str, typing.Any]) -> None:
+        self._traces = traces
+
+    def update(self, component_name: str, sample: typing.Mapping[str, typing.Any]) -> bool:
+        return bool(self.condition(self._traces))
+
+
+class AnyOf(Monitor):
+    """terminate when any of several monitors does (all monitors are advanced with every sample)"""
+
+    def __init__(self, *monitors: Monitor):
+        self.monitors = list(monitors)
+
+    def reset(self, traces: typing.Mapping[str, typing.Any]) -> None:
+        for m in self.monitors:
+            m.reset(traces)
+
+    def update(self, component_name: str, sample: typing.Mapping[str, typing.Any]) -> bool:
+        return any([m.update(component_name, sample) for m in self.monitors if m.per_sample])
+
+    def crossing(self, crossing: typing.Any) -> bool:
+        return any([m.crossing(crossing) for m in self.monitors])
+
+    @property
+    def per_sample(self) -> bool:  # type: ignore
+        return any(m.per_sample for m in self.monitors)
+
+
+def as_monitor(condition: typing.Union[None, Monitor, typing.Callable]) -> typing.Optional[Monitor]:
+    """a monitor for a terminating_conditions_all argument (a Monitor, or a callable over the traces)"""
+    if condition is None or isinstance(condition, Monitor):
+        return condition
+    return TraceCondition(condition)
+
+
+class SignalMonitor(Monitor):
+    """ monitor of one value of a component flow
+
+    :param component_name: component to monitor
+    :param flow: flow of the component
+    :param index: index of the value in the flow
+    """
+
+    def __init__(self, component_name: str, flow: str = "states", index: int = 0):
+        self.component_name = component_name
+        self.flow = flow
+        self.index = index
+
+    def signal(self, component_name: str, sample: typing.Mapping[str, typing.Any]) -> typing.Optional[float]:
+        """monitored value of a sample, None for samples of other components"""
+        if component_name != self.component_name:
+            return None
+        return float(sample[self.flow][self.index])
+
+
+class RunningMin(SignalMonitor):
+    """ running minimum of a value
+
+    :param below: terminate when the minimum is below this value (never when None)
+    """
+
+    def __init__(self, component_name: str, flow: str = "states", index: int = 0,
+                 below: typing.Optional[float] = None):
+        super().__init__(component_name, flow, index)
+        self.below = below
+        self.value = math.inf
+
+    def reset(self, traces: typing.Mapping[str, typing.Any]) -> None:
+        self.value = math.inf
+
+    def update(self, component_name: str, sample: typing.Mapping[str, typing.Any]) -> bool:
+        v = self.signal(component_name, sample)
+        if v is not None:
+            self.value = min(self.value, v)
+        return self.below is not None and self.value < self.below
+
+
+class RunningMax(SignalMonitor):
+    """ running maximum of a value
+
+    :param above: terminate when the maximum is above this value (never when None)
+    """
+
+    def __init__(self, component_name: str, flow: str = "states", index: int = 0,
+                 above: typing.Optional[float] = None):
+        super().__init__(component_name, flow, index)
+        self.above = above
+        self.value = -math.inf
+
+    def reset(self, traces: typing.Mapping[str, typing.Any]) -> None:
+        self.value = -math.inf
+
+    def update(self, component_name: str, sample: typing.Mapping[str, typing.Any]) -> bool:
+        v = self.signal(component_name, sample)
+        if v is not None:
+            self.value = max(self.value, v)
+        return self.above is not None and self.value > self.above
+
+
+class WindowedRobustness(SignalMonitor):
+    """ STL style robustness of a predicate over a bounded window of past samples
+
+    the predicate is value > threshold (or value < threshold when above is False), with robustness
+    value - threshold (threshold - value). Window extrema are kept in a monotonic deque, so each sample costs O(1)
+    amortized.
+
+    :param window: length of the window (s)
+    :param threshold: predicate threshold
+    :param above: predicate direction
+    """
+    # 1.0 to take the minimum over the window, -1.0 for the maximum
+    sign: float
+
+    def __init__(self, component_name: str, flow: str = "states", index: int = 0, window: float = 1.0,
+                 threshold: float = 0.0, above: bool = True):
+        super().__init__(component_name, flow, index)
+        assert window >= 0.0, f"window must be non-negative (got {window})"
+        self.window = window
+        self.threshold = threshold
+        self.above = above
+        self._deque: typing.Deque[typing.Tuple[float, float]] = collections.deque()
+        self._tstart: typing.Optional[float] = None
+        self._tlast: typing.Optional[float] = None
+
+    def reset(self, traces: typing.Mapping[str, typing.Any]) -> None:
+        self._deque.clear()
+        self._tstart, self._tlast = None, None
+
+    @property
+    def robustness(self) -> float:
+        """robustness over the current window (inf before the first sample)"""
+        return self.sign * self._deque[0][1] if self._deque else math.inf
+
+    @property
+    def window_filled(self) -> bool:
+        """whether the samples span a whole window"""
+        return self._tstart is not None and self._tlast is not None and self._tlast - self._tstart >= self.window
+
+    def update(self, component_name: str, sample: typing.Mapping[str, typing.Any]) -> bool:
+        v = self.signal(component_name, sample)
+        if v is None:
+            return False
+        t = float(sample["times"])
+        rob = (v - self.threshold) if self.above else (self.threshold - v)
+        key = self.sign * rob
+        while self._deque and self._deque[-1][1] >= key:
+            self._deque.pop()
+        self._deque.append((t, key))
+        while self._deque[0][0] < t - self.window:
+            self._deque.popleft()
+        if self._tstart is None:
+            self._tstart = t
+        self._tlast = t
+        return self.violated()
+
+    def violated(self) -> bool:
+        raise NotImplementedError
+
+
+class Always(WindowedRobustness):
+    """ always (over the last window) robustness -- terminate as soon as the predicate is violated"""
+    sign = 1.0
+
+    def violated(self) -> bool:
+        return self.robustness < 0.0
+
+
+class Eventually(WindowedRobustness):
+    """ eventually (within the last window) robustness -- terminate when the predicate wasn't satisfied by any
+    sample of a whole window (e.g. a dwell time bound)"""
+    sign = -1.0
+
+    def violated(self) -> bool:
+        return self.window_filled and self.robustness < 0.0
+
+
+class SeparationMonitor(Monitor):
+    """ separation between the position of a component and other components
+
+    the last position of each component is kept, and the distances are checked when one of them is updated
+
+    :param component_name: component to measure the separation from
+    :param others: other components
+    :param min_separation: terminate when a separation is below this distance (once all positions are known)
+    :param flow: flow holding the positions
+    :param indices: position indices in the flow
+    """
+
+    def __init__(self, component_name: str, others: typing.Sequence[str], min_separation: float,
+                 flow: str = "states", indices: slice = slice(9, 12)):
+        self.component_name = component_name
+        self.others = list(others)
+        self.min_separation = min_separation
+        self.flow = flow
+        self.indices = indices
+        self._positions: typing.Dict[str, np.ndarray] = {}
+        self.separation = math.inf
+
+    def reset(self, traces: typing.Mapping[str, typing.Any]) -> None:
+        self._positions = {}
+        self.separation = math.inf
+
+    def update(self, component_name: str, sample: typing.Mapping[str, typing.Any]) -> bool:
+        if component_name != self.component_name and component_name not in self.others:
+            return False
+        self._positions[component_name] = np.asarray(sample[self.flow][self.indices], dtype=float)
+        if len(self._positions) < len(self.others) + 1:
+            return False
+        own = self._positions[self.component_name]
+        dists = [float(np.linalg.norm(own - self._positions[o])) for o in self.others]
+        self.separation = min(self.separation, *dists)
+        return min(dists) < self.min_separation
@@ -0,0 +1,160 @@
+"""
+CSAF Monolithic Co-Simulation
+
+Integrate algebraically connected continuous components as one stacked ODE
+"""
+from __future__ import annotations
+
+from csaf.core.solver import LSODASolver
+
+import numpy as np
+import typing
+
+if typing.TYPE_CHECKING:
+    # cyclic imports issue
+    from csaf.core.component import Component
+    from csaf.core.system import ComponentComposition
+
+__all__ = ['ContinuousGroup', 'find_continuous_groups']
+
+SignalKey = typing.Tuple[str, str]
+
+
+def find_continuous_groups(system: ComponentComposition) -> typing.List[ContinuousGroup]:
+    """ group the continuous components of a system that are connected to each other
+
+    components are grouped when a connection joins them and they are sampled at the same rate and phase, so
+    they are updated at the same events. Only groups of more than one component are returned.
+    """
+    components = system.component_instances
+    priority = list(components.keys()) if system.priority is None else list(system.priority)
+    continuous = [n for n in priority if components[n].is_continuous]
+
+    # union find over the continuous components
+    parent = {n: n for n in continuous}
+
+    def find(n: str) -> str:
+        while parent[n] != n:
+            n = parent[n]
+        return n
+
+    for (cin, _), (cout, _) in system.connections.items():
+        if cin in parent and cout in parent and cin != cout:
+            a, b = components[cin], components[cout]
+            if (a.sampling_frequency, a.sampling_phase) == (b.sampling_frequency, b.sampling_phase):
+                parent[find(cin)] = find(cout)
+
+    groups: typing.Dict[str, typing.List[str]] = {}
+    for n in continuous:
+        groups.setdefault(find(n), []).append(n)
+    return [ContinuousGroup(system, names) for names in groups.values() if len(names) > 1]
+
+
+class ContinuousGroup:
+    """ several continuous components of a system solved together as one ODE
+
+    Between two events, the stacked states of the members are integrated with one solver call. Inputs that come
+    from other members are evaluated at every right hand side evaluation, while inputs from outside the group
+    are held at their value at the start of the step. Algebraic loops between members (e.g. a plant output that
+    depends on the llc output that depends on the plant output) are broken by holding the output closing the
+    loop at its value at the start of the step, so the right hand side stays a function of (t, y) only.
+
+    The group duck-types a component with a single "states" flow, so any component solver can integrate it.
+    """
+
+    def __init__(self, system: ComponentComposition, names: typing.Sequence[str]):
+        self.names = list(names)
+        self.system = system
+        self.members: typing.List[Component] = [system.component_instances[n] for n in self.names]
+        # the outputs and state derivatives of a member are evaluated at the same points
+        for member in self.members:
+            member.memoize_flows = True
+        plan = system.execution_plan
+
+        # stacked states layout
+        widths = [len(c.states.__annotations__) for c in self.members]
+        offsets = np.cumsum([0] + widths)
+        self._states_slices = [slice(int(a), int(b)) for a, b in zip(offsets[:-1], offsets[1:])]
+
+        # for each member, the source of each of its inputs: (member index, flow) within the group, else a key
+        index = {n: idx for idx, n in enumerate(self.names)}
+        self._sources: typing.List[typing.List[typing.Union[typing.Tuple[int, str], SignalKey]]] = [
+            [(index[src[0]], src[1]) if src[0] in index else src for src in plan.input_sources[n]]
+            for n in self.names
+        ]
+
+        # members share a solver type when they agree on it
+        solvers = {c.system_solver for c in self.members}
+        self.system_solver = solvers.pop() if len(solvers) == 1 else LSODASolver
+        self.flows = {"states": self._flow_states}
+        self._solver = self.system_solver(self)  # type: ignore
+
+        # inputs and member outputs held over a step, and states at the end of the step
+        self._held: typing.Dict[SignalKey, typing.List] = {}
+        self._outputs: typing.Dict[typing.Tuple[int, str], typing.Sequence] = {}
+        self._states: typing.List[typing.List] = []
+        self._start: typing.Optional[typing.Tuple[float, np.ndarray]] = None
+        self.time: typing.Optional[float] = None
+
+    def _member_inputs(self, idx: int, t: float, ys: typing.Sequence, pending: typing.Set[int],
+                       evaluated: typing.Dict[typing.Tuple[int, str], typing.Sequence]) -> typing.List:
+        inputs: typing.List = []
+        for src in self._sources[idx]:
+            if isinstance(src[0], int):
+                inputs += list(self._member_output(src[0], src[1], t, ys, pending, evaluated))  # type: ignore
+            else:
+                inputs += self._held[src]  # type: ignore
+        return inputs
+
+    def _member_output(self, idx: int, flow: str, t: float, ys: typing.Sequence, pending: typing.Set[int],
+                       evaluated: typing.Dict[typing.Tuple[int, str], typing.Sequence]) -> typing.Sequence:
+        if flow == "states":
+            return ys[idx]
+        if (idx, flow) in evaluated:
+            return evaluated[(idx, flow)]
+        if idx in pending:
+            # algebraic loop -- use the value held at the start of the step
+            return self._outputs[(idx, flow)]
+        pending.add(idx)
+        member = self.members[idx]
+        value = member.flows[flow](member, t, ys[idx], self._member_inputs(idx, t, ys, pending, evaluated))
+        pending.remove(idx)
+        evaluated[(idx, flow)] = value
+        return value
+
+    def _flow_states(self, _, t: float, y: typing.Sequence, __) -> np.ndarray:
+        ys = [y[sl] for sl in self._states_slices]
+        evaluated: typing.Dict[typing.Tuple[int, str], typing.Sequence] = {}
+        dy = []
+        for idx, member in enumerate(self.members):
+            inputs = self._member_inputs(idx, t, ys, {idx}, evaluated)
+            dy.append(np.reshape(member.flows["states"](member, t, ys[idx], inputs), -1))
+        return np.concatenate(dy)
+
+    def advance(self, tspan: typing.Sequence[float]) -> None:
+        """integrate the members from tspan[0] to tspan[1], holding the inputs from outside the group"""
+        self._held = {src: self.system.get_signal(*src)  # type: ignore
+                      for sources in self._sources for src in sources if not isinstance(src[0], int)}
+        states = [self.system.get_signal(n, "states") for n in self.names]
+        for idx, n in enumerate(self.names):
+            for flow in self.members[idx].outputs_names:
+                self._outputs[(idx, flow)] = self.system.get_signal(n, flow)
+        self._start = (tspan[0], np.concatenate(states))
+        if tspan[1] > tspan[0]:
+            y = self._solver(None, self._start[1], tspan)[-1]  # type: ignore
+            states = [list(y[sl]) for sl in self._states_slices]
+        self._states = states
+        self.time = tspan[1]
+
+    def member_states(self, component_name: str, tspan: typing.Sequence[float]) -> typing.List:
+        """states of a member at tspan[1], advancing the group when it hasn't reached that time"""
+        if self.time is None or self.time < tspan[1]:
+            self.advance(tspan)
+        return self._states[self.names.index(component_name)]
+
+    def states_at(self, component_name: str, t: float) -> typing.List:
+        """states of a member at a time within the last step, integrating the group again from its start"""
+        assert self._start is not None, "group has not been advanced"
+        t0, y0 = self._start
+        y = self._solver(None, y0, [t0, t])[-1] if t > t0 else y0  # type: ignore
+        return list(y[self._states_slices[self.names.index(component_name)]])
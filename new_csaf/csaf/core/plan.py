@@ -0,0 +1,166 @@
+"""
+CSAF Execution Plan
+
+Static signal routing for a component composition
+"""
+from __future__ import annotations
+
+import numpy as np
+
+import operator
+import typing
+import weakref
+
+if typing.TYPE_CHECKING:
+    # cyclic imports issue
+    from csaf.core.component import Component
+    from csaf.core.system import ComponentComposition
+
+__all__ = ['ExecutionPlan']
+
+SignalKey = typing.Tuple[str, str]
+
+
+def message_width(message: typing.Type[typing.Tuple]) -> int:
+    """number of fields in a message"""
+    return len(message.__annotations__)
+
+
+def is_numeric(message: typing.Type[typing.Tuple]) -> bool:
+    """whether every field of a message is a float"""
+    return all(t in (float, 'float') for t in message.__annotations__.values())
+
+
+class ExecutionPlan:
+    """ flat index maps over one contiguous signal array for a component composition type
+
+    Every (component, flow) signal owns a slice of the signal array. Each component's input vector is a gather
+    of the slices it is connected to, precomputed as one integer index array. Inputs that are not connected
+    own a slice as well, holding their initial value.
+
+    Signals of float messages are stored in a float64 array, and the other signals (e.g. strings or bools) in an
+    object array over the same indices.
+
+    Every signal also has an index into the version counters of a composition, bumped when the signal changes.
+    The counters are only tracked for the signals a pure component depends on (its inputs and flows), so it can
+    skip an update when none of them changed.
+
+    Plans only depend on the composition class, so they are compiled once per class and shared by instances.
+    """
+    _cache: 'weakref.WeakKeyDictionary[type, ExecutionPlan]' = weakref.WeakKeyDictionary()
+
+    def __init__(self,
+                 components: typing.Dict[str, typing.Type[Component]],
+                 connections: typing.Dict[SignalKey, SignalKey]):
+        self.components = dict(components)
+        self.connections = dict(connections)
+
+        # slice of the signal array for each signal, and the signals stored in the float array
+        self.slices: typing.Dict[SignalKey, slice] = {}
+        self.numeric: typing.Set[SignalKey] = set()
+        offset = 0
+        for cname, ctype in self.components.items():
+            for flow, message in [("states", ctype.states), *ctype.outputs]:
+                self._add_signal((cname, flow), message, offset)
+                offset += message_width(message)
+        for cname, ctype in self.components.items():
+            for iname, message in ctype.inputs:
+                if (cname, iname) not in self.connections:
+                    self._add_signal((cname, iname), message, offset)
+                    offset += message_width(message)
+        self.size = offset
+        numeric_mask = np.zeros(self.size, dtype=bool)
+        for key in self.numeric:
+            numeric_mask[self.slices[key]] = True
+
+        # signal feeding each input of a component, in input order
+        self.input_sources: typing.Dict[str, typing.Tuple[SignalKey, ...]] = {
+            cname: tuple(self.connections.get((cname, iname), (cname, iname)) for iname, _ in ctype.inputs)
+            for cname, ctype in self.components.items()
+        }
+
+        # gather indices for the input vector of each component
+        self.inputs: typing.Dict[str, np.ndarray] = {
+            cname: np.array([idx for src in sources for idx in range(self.slices[src].start, self.slices[src].stop)],
+                            dtype=int)
+            for cname, sources in self.input_sources.items()
+        }
+
+        # for each component, which entries of its input vector are in the float array (None when all are)
+        self.input_masks: typing.Dict[str, typing.Optional[np.ndarray]] = {
+            cname: None if np.all(numeric_mask[idx]) else numeric_mask[idx] for cname, idx in self.inputs.items()
+        }
+
+        # (flow, slice) pairs written by each component
+        self.flows: typing.Dict[str, typing.Tuple[typing.Tuple[str, slice], ...]] = {
+            cname: tuple((flow, self.slices[(cname, flow)]) for flow in ["states", *(o for o, _ in ctype.outputs)])
+            for cname, ctype in self.components.items()
+        }
+
+        # version counter index of each signal
+        self.versions: typing.Dict[SignalKey, int] = {key: idx for idx, key in enumerate(self.slices)}
+
+        # version counter indices of the signals each pure component depends on
+        depends = {cname: sorted({self.versions[src] for src in self.input_sources[cname]} |
+                                 {self.versions[(cname, flow)] for flow, _ in self.flows[cname]})
+                   for cname, ctype in self.components.items() if ctype.is_pure}
+        # getter of those version counters, for each pure component
+        self.dependencies: typing.Dict[str, typing.Callable[[typing.Sequence[int]], typing.Any]] = {
+            cname: operator.itemgetter(*deps) for cname, deps in depends.items()
+        }
+
+        # signals whose changes are tracked
+        self.tracked: typing.Set[SignalKey] = {key for key, idx in self.versions.items()
+                                               if any(idx in deps for deps in depends.values())}
+
+        # for each component, (slice, numeric) of its states, and (name, slice, numeric, version counter index,
+        # tracked) of the signals it writes (its flows and unconnected inputs)
+        self.states: typing.Dict[str, typing.Tuple[slice, bool]] = {
+            cname: (self.slices[(cname, "states")], (cname, "states") in self.numeric) for cname in self.components
+        }
+        self.writes: typing.Dict[str, typing.Tuple[typing.Tuple[str, slice, bool, int, bool], ...]] = {
+            cname: tuple((name, sl, (c, name) in self.numeric, self.versions[(c, name)], (c, name) in self.tracked)
+                         for (c, name), sl in self.slices.items() if c == cname)
+            for cname in self.components
+        }
+
+        # (states slice, states numeric, states version counter index, input indices, input mask, writes) of each
+        # component, to route its updates
+        self.routes: typing.Dict[str, typing.Tuple[slice, bool, int, np.ndarray, typing.Optional[np.ndarray],
+                                                   typing.Tuple[typing.Tuple[str, slice, bool, int, bool], ...]]] = {
+            cname: (*self.states[cname], self.versions[(cname, "states")], self.inputs[cname],
+                    self.input_masks[cname], self.writes[cname])
+            for cname in self.components
+        }
+
+    def _add_signal(self, key: SignalKey, message: typing.Type[typing.Tuple], offset: int) -> None:
+        self.slices[key] = slice(offset, offset + message_width(message))
+        if is_numeric(message):
+            self.numeric.add(key)
+
+    @classmethod
+    def compile(cls, system_type: typing.Type[ComponentComposition]) -> ExecutionPlan:
+        """get the plan for a composition type, compiling it on first use"""
+        plan = cls._cache.get(system_type)
+        if plan is None or plan.components != system_type.components or \
+                plan.connections != system_type.connections:
+            plan = cls(system_type.components, system_type.connections)
+            cls._cache[system_type] = plan
+        return plan
+
+    def allocate(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """create empty (float, object) signal arrays for this plan"""
+        return np.zeros(self.size, dtype=np.float64), np.empty(self.size, dtype=object)
+
+    def gather(self, values: np.ndarray, objects: np.ndarray, component_name: str) -> typing.List:
+        """input vector of a component from the (float, object) signal arrays"""
+        idx, mask = self.inputs[component_name], self.input_masks[component_name]
+        if mask is None:
+            return values[idx].tolist()
+        ret = objects[idx]
+        ret[mask] = values[idx[mask]]
+        return ret.tolist()
+
+    def allocate_versions(self) -> typing.List[int]:
+        """create zeroed signal version counters for this plan"""
+        return [0] * len(self.versions)
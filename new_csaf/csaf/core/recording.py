@@ -0,0 +1,118 @@
+"""
+CSAF Recording Policies
+
+Which samples of the component flows a simulation records into its traces
+"""
+import math
+
+import csaf.core.base as cbase
+from csaf.core.trace import ColumnarTimeTrace, TimeTrace
+
+import typing
+
+__all__ = ['RecordingPolicy']
+
+# component names, or component name -> flow names (None for all of the flows)
+FlowSelection = typing.Union[typing.Sequence[str], typing.Mapping[str, typing.Optional[typing.Sequence[str]]]]
+
+
+def _as_selection(selection: typing.Optional[FlowSelection]
+                  ) -> typing.Optional[typing.Dict[str, typing.Optional[typing.FrozenSet[str]]]]:
+    if selection is None:
+        return None
+    if not isinstance(selection, typing.Mapping):
+        return {cname: None for cname in selection}
+    return {cname: None if flows is None else frozenset(flows) for cname, flows in selection.items()}
+
+
+class RecordingPolicy(cbase.CsafBase):
+    """ which samples of the component flows a simulation records
+
+    e.g. the plant states at 5 Hz only, RecordingPolicy(include={"plant": ["states"]}, rate=5.0)
+
+    Unrecorded components have no trace, and unrecorded flows no field in their component trace. Conditions over
+    whole traces (terminating_conditions_all callables) only see the recorded samples, while monitors are given
+    every sample.
+
+    :param include: components (or component name -> flows) to record, all when None
+    :param exclude: components (or component name -> flows) not to record
+    :param rate: recording rate (Hz), for all components or by component name. Samples are recorded at most at
+                    the rate, on a grid from the first sample of a component.
+    :param last: keep the last samples of every trace only (ring buffer)
+    """
+
+    def __init__(self, include: typing.Optional[FlowSelection] = None,
+                 exclude: typing.Optional[FlowSelection] = None,
+                 rate: typing.Optional[typing.Union[float, typing.Mapping[str, float]]] = None,
+                 last: typing.Optional[int] = None):
+        self.include = _as_selection(include)
+        self.exclude = _as_selection(exclude) or {}
+        self.rate = rate
+        self.last = last
+        self.check()
+
+    def validate(self) -> None:
+        rates = self.rate.values() if isinstance(self.rate, typing.Mapping) else [self.rate]
+        assert all(r is None or r > 0.0 for r in rates), f"recording rates must be positive (got {self.rate})"
+        assert self.last is None or self.last > 0, f"number of kept samples must be positive (got {self.last})"
+
+    def flows(self, component_name: str, flow_names: typing.Iterable[str]) -> typing.Optional[typing.List[str]]:
+        """recorded flows of a component, None when the component isn't recorded"""
+        if self.include is not None and component_name not in self.include:
+            return None
+        if component_name in self.exclude and self.exclude[component_name] is None:
+            return None
+        included = self.include.get(component_name) if self.include is not None else None
+        excluded = self.exclude.get(component_name) or frozenset()
+        return [f for f in flow_names if (included is None or f in included) and f not in excluded]
+
+    def period(self, component_name: str) -> typing.Optional[float]:
+        """recording period of a component, None to record every sample"""
+        rate = self.rate.get(component_name) if isinstance(self.rate, typing.Mapping) else self.rate
+        return None if rate is None else 1.0 / rate
+
+    def create_traces(self, components: typing.Mapping[str, typing.Any],
+                      capacities: typing.Optional[typing.Mapping[str, int]] = None,
+                      duration: typing.Optional[float] = None) -> typing.Dict[str, TimeTrace]:
+        """ empty traces of the recorded flows, for a new simulation
+
+        :param components: component name -> component instance
+        :param capacities: component name -> number of scheduled samples
+        :param duration: simulation duration, bounding the number of samples recorded at the rate
+        """
+        traces: typing.Dict[str, TimeTrace] = {}
+        for cname, component in components.items():
+            flows = self.flows(cname, component.flow_names)
+            if flows is None:
+                continue
+            capacity = None if capacities is None else capacities.get(cname)
+            period = self.period(cname)
+            if capacity is not None and period is not None and duration is not None:
+                capacity = min(capacity, int(duration / period) + 2)
+            traces[cname] = ColumnarTimeTrace.for_component(component, capacity, flows=flows,
+                                                            max_length=self.last)
+        return traces
+
+    def record(self, traces: typing.Mapping[str, TimeTrace], component_name: str,
+               sample: typing.Mapping[str, typing.Any], force: bool = False) -> bool:
+        """ record a sample of a component (with its time at "times"), if the policy keeps it
+
+        the time of the next sample kept at the rate is held by the trace, so a policy can be shared by simulations
+        :param force: record the sample regardless of the rate (e.g. at a terminal crossing)
+        :return: whether the sample was recorded
+        """
+        trace = traces.get(component_name)
+        if trace is None:
+            return False
+        period = self.period(component_name)
+        if period is not None and not force:
+            assert isinstance(trace, ColumnarTimeTrace), "traces must be created by the policy (see create_traces)"
+            t = sample["times"]
+            nxt = trace.next_record
+            if nxt is not None and t < nxt - period * 1E-9:
+                return False
+            # next point of the grid after this sample
+            start = t if nxt is None else nxt
+            trace.next_record = start + period * (math.floor((t - start) / period + 1E-9) + 1)
+        trace.append(**{name: sample[name] for name in trace.names})
+        return True
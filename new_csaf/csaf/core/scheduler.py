@@ -5,7 +5,10 @@ from __future__ import annotations
 
 import sys
 import functools
+import heapq
+import math
 import numpy as np
+from fractions import Fraction
 
 import typing
 
@@ -13,7 +16,7 @@ if typing.TYPE_CHECKING:
     # cyclic imports issue
     from csaf.core.component import Component
 
-__all__ = ['Scheduler']
+__all__ = ['Scheduler', 'EventQueue']
 
 
 def coroutine(func: typing.Callable):
@@ -38,8 +41,8 @@ class Scheduler:
         """for a uniform time event component, get component events"""
         t0, tf = float(tspan[0]), float(tspan[1])
         # t0p, tfp = 0.0, float(tf - t0)
-        n0 = np.ceil((t0 - tp) / ts)
-        nf = np.floor((tf - tp) / ts)
+        n0 = np.ceil((t0 - tp) / ts - Scheduler.tick_tolerance)
+        nf = np.floor((tf - tp) / ts + Scheduler.tick_tolerance)
         return list(np.arange(n0, nf + 1) * ts + tp)
 
     @staticmethod
@@ -49,25 +52,71 @@ class Scheduler:
         n0 = np.ceil((t0p - tp) / (ts * t0p)) if not np.abs(ts * t0p) < sys.float_info.epsilon else 0.0
         return n0 * ts + tp + t0
 
+    # largest denominator used to turn sampling frequencies and phases into fractions
+    max_denominator: int = 1_000_000
+
+    # times within this fraction of a tick of a sampling instant are considered on it
+    tick_tolerance: float = 1E-9
+
+    # dtype of the event tables
+    event_dtype = np.dtype([('component', np.int32), ('tick', np.int64), ('time', np.float64)])
+
     def __init__(self, components: typing.Dict[str, Component], component_priority: typing.Sequence[str]):
         self._components: typing.Dict[str, Component] = components
         self._priority: typing.Sequence[str] = component_priority
 
+    @classmethod
+    def rationalize(cls, value: float) -> Fraction:
+        """closest fraction to a float value"""
+        return Fraction(value).limit_denominator(cls.max_denominator)
+
+    @property
+    def rates(self) -> typing.Tuple[typing.Tuple[Fraction, Fraction], ...]:
+        """(sampling period, sampling phase) of each component, in priority order"""
+        return tuple((1 / self.rationalize(self._components[ident].sampling_frequency),
+                      self.rationalize(self._components[ident].sampling_phase))
+                     for ident in self._priority)
+
+    @property
+    def base_period(self) -> Fraction:
+        """largest period that every component sampling period and phase is an integer multiple of"""
+        return _base_period(self.rates)
+
+    def get_event_table(self, tspan) -> np.ndarray:
+        """ event table over a given time span
+
+        Events are found in integer ticks of the base period, so event times don't drift over long time spans.
+        Tables are cached by (component rates, priority, tspan), and are read only.
+
+        :param tspan: (t0, tf) tuple of times to schedule over
+        :return: structured array of events (component index in priority, tick, time), in time and priority order
+        """
+        assert tspan[0] <= tspan[1], f"timespan '{tspan}' is not larger at index 1"
+        return _event_table(self.rates, float(tspan[0]), float(tspan[1]), self.tick_tolerance)[0]
+
     @coroutine
     def get_scheduler(self, t0=0.0):
         """starting from t0, yield next events"""
-        # priority sort components before iteration
-        components_p = [self._components[ident] for ident in self._priority]
-        ns = [np.ceil((t0 - c.sampling_phase) * c.sampling_frequency) for c in components_p]
-        ctimes = [n / c.sampling_frequency + c.sampling_phase for n, c in zip(ns, components_p)]
+        rates = self.rates
+        base = _base_period(rates)
+        # schedule a window of the longest sampling period at a time
+        window = max(period for period, _ in rates) if len(rates) > 0 else base
+        k0 = _tick(float(t0), base, self.tick_tolerance)
         yield None  # for primer
         while True:
-            current_time = min(ctimes)
-            for cidx, ctime in enumerate(ctimes):
-                c = components_p[cidx]
-                if abs(ctime - current_time) < sys.float_info.epsilon:
-                    yield self._priority[cidx], current_time
-                    ctimes[cidx] += 1 / c.sampling_frequency
+            for cidx, ctime in _build_event_table(rates, k0 * base, (k0 * base) + window, self.tick_tolerance)[1]:
+                yield self._priority[cidx], ctime
+            k0 += int(window / base)
+
+    def get_event_queue(self, tspan: typing.Tuple[float, typing.Optional[float]],
+                        after: typing.Optional[typing.Mapping[str, float]] = None) -> EventQueue:
+        """ events over a time span, where components can skip samples until a wakeup time (see EventQueue.hold)
+
+        :param tspan: (t0, tf) tuple of times to schedule over (tf None for no end)
+        :param after: component name -> time its events start strictly after
+        """
+        assert tspan[1] is None or tspan[0] <= tspan[1], f"timespan '{tspan}' is not larger at index 1"
+        return EventQueue(self.rates, self._priority, tspan, self.tick_tolerance, after=after)
 
     def get_schedule_tspan(self, tspan):
         """over a given timespan tspan, determine which components will be active
@@ -76,10 +125,124 @@ class Scheduler:
         """
         # assert that times are valid
         assert tspan[0] <= tspan[1], f"timespan '{tspan}' is not larger at index 1"
-        sched = self.get_scheduler(tspan[0])
-        ret = []
-        for e, t in sched:
-            if t >= tspan[1]:
-                return ret
-            else:
-                ret.append((e, t))
+        events = _event_table(self.rates, float(tspan[0]), float(tspan[1]), self.tick_tolerance)[1]
+        return [(self._priority[cidx], t) for cidx, t in events]
+
+
+class EventQueue:
+    """ priority queue of component events, in time then priority order
+
+    the queue holds the next event of every component, as an integer tick of the base period (so times are the
+    same as in the event tables). When a component event is taken, the next sample of the component is queued;
+    hold replaces it with the first sample at or after a wakeup time, so a component that is idle until then
+    skips its samples (its outputs stay in the signal buffer).
+    """
+
+    def __init__(self, rates: typing.Tuple[typing.Tuple[Fraction, Fraction], ...],
+                 priority: typing.Sequence[str],
+                 tspan: typing.Tuple[float, typing.Optional[float]],
+                 tolerance: float,
+                 after: typing.Optional[typing.Mapping[str, float]] = None):
+        self._priority = list(priority)
+        self._index = {cname: cidx for cidx, cname in enumerate(self._priority)}
+        self._base = _base_period(rates)
+        self._tolerance = tolerance
+        self._samples = [(int(period / self._base), int(phase / self._base)) for period, phase in rates]
+        self._kf = None if tspan[1] is None else _tick(float(tspan[1]), self._base, tolerance)
+        # component index -> tick of its queued event (heap entries with another tick are stale)
+        self._next: typing.Dict[int, int] = {}
+        self._heap: typing.List[typing.Tuple[int, int]] = []
+        k0 = _tick(float(tspan[0]), self._base, tolerance)
+        for cidx, cname in enumerate(self._priority):
+            k = k0
+            if after is not None and cname in after:
+                # first tick strictly after the time
+                k = max(k, math.floor(Fraction(after[cname]) / self._base + Fraction(tolerance)) + 1)
+            self._push(cidx, k)
+
+    def _push(self, cidx: int, k: int) -> None:
+        """queue the first sample of a component at or after tick k"""
+        pk, ph = self._samples[cidx]
+        tick = -((ph - k) // pk) * pk + ph
+        if self._kf is not None and tick >= self._kf:
+            self._next.pop(cidx, None)
+            return
+        self._next[cidx] = tick
+        heapq.heappush(self._heap, (tick, cidx))
+
+    def __iter__(self) -> EventQueue:
+        return self
+
+    def __next__(self) -> typing.Tuple[str, float]:
+        while self._heap:
+            tick, cidx = heapq.heappop(self._heap)
+            if self._next.get(cidx) != tick:
+                continue
+            self._push(cidx, tick + 1)
+            return self._priority[cidx], tick * self._base.numerator / self._base.denominator
+        raise StopIteration
+
+    def hold(self, component_name: str, until: typing.Optional[float]) -> None:
+        """ skip the samples of a component before a wakeup time
+
+        :param component_name: component of the last event taken
+        :param until: wakeup time (None to keep the next sample)
+        """
+        cidx = self._index[component_name]
+        if until is None or cidx not in self._next or until == -math.inf:
+            return
+        if until == math.inf:
+            # idle for the rest of the simulation
+            self._next.pop(cidx)
+            return
+        k = _tick(until, self._base, self._tolerance)
+        if k > self._next[cidx]:
+            self._push(cidx, k)
+
+
+def _base_period(rates: typing.Sequence[typing.Tuple[Fraction, Fraction]]) -> Fraction:
+    """GCD of the component periods and phases (as fractions)"""
+    values = [v for rate in rates for v in rate if v != 0]
+    if len(values) == 0:
+        return Fraction(1)
+    num = functools.reduce(math.gcd, (v.numerator for v in values))
+    den = functools.reduce(lambda a, b: a * b // math.gcd(a, b), (v.denominator for v in values))
+    return Fraction(num, den)
+
+
+def _tick(t: typing.Union[float, Fraction], base: Fraction, tolerance: float) -> int:
+    """first tick at or after time t"""
+    return math.ceil(Fraction(t) / base - Fraction(tolerance))
+
+
+def _build_event_table(rates: typing.Tuple[typing.Tuple[Fraction, Fraction], ...],
+                       t0: typing.Union[float, Fraction],
+                       tf: typing.Union[float, Fraction],
+                       tolerance: float) -> typing.Tuple[np.ndarray, typing.Tuple[typing.Tuple[int, float], ...]]:
+    """events in [t0, tf) for components with (period, phase) rates, ordered by time then by priority
+
+    :return: (structured event table, tuple of (component index, time))
+    """
+    base = _base_period(rates)
+    k0, kf = _tick(t0, base, tolerance), _tick(tf, base, tolerance)
+    ticks, cidxs = [], []
+    for cidx, (period, phase) in enumerate(rates):
+        pk, ph = int(period / base), int(phase / base)
+        # first and last sample index n, where tick is n * pk + ph
+        n0, nf = -((ph - k0) // pk), -((ph - kf) // pk)
+        ticks.append(np.arange(n0, nf, dtype=np.int64) * pk + ph)
+        cidxs.append(np.full(max(nf - n0, 0), cidx, dtype=np.int32))
+    tick_arr = np.concatenate(ticks) if len(ticks) > 0 else np.zeros(0, dtype=np.int64)
+    cidx_arr = np.concatenate(cidxs) if len(cidxs) > 0 else np.zeros(0, dtype=np.int32)
+    order = np.lexsort((cidx_arr, tick_arr))
+
+    table = np.empty(len(order), dtype=Scheduler.event_dtype)
+    table['component'] = cidx_arr[order]
+    table['tick'] = tick_arr[order]
+    table['time'] = table['tick'] * base.numerator / base.denominator
+    table.flags.writeable = False
+    return table, tuple(zip(table['component'].tolist(), table['time'].tolist()))
+
+
+# event tables of repeated simulations are reused
+_event_table = functools.lru_cache(maxsize=128)(_build_event_table)
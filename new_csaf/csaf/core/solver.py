@@ -6,6 +6,7 @@ from __future__ import annotations
 import csaf.core.base as cbase
 import csaf.core.scheduler as sched
 
+import numpy as np
 import scipy.integrate  # type: ignore
 
 import typing
@@ -14,7 +15,8 @@ if typing.TYPE_CHECKING:
     # cyclic imports issue
     from csaf.core.component import Component
 
-__all__ = ['LSODASolver', 'DiscreteSolver', 'SystemSolver']
+__all__ = ['LSODASolver', 'DiscreteSolver', 'SystemSolver', 'FixedStepSolver', 'EulerSolver', 'RK4Solver',
+           'DormandPrinceSolver']
 
 
 class SystemSolver(cbase.CsafBase):
@@ -47,6 +49,9 @@ class LSODASolver(SystemSolver):
               inputs: typing.Sequence,
               states: typing.Sequence,
               teval: typing.Sequence) -> typing.Sequence:
+        if np.ndim(states) == 2:
+            return self.solve_stacked(inputs, states, teval)
+
         def _state_diff_fcn(y: typing.Sequence, t: float) -> typing.Sequence:
             return self.component.flows['states'](self.component, t, y, inputs)
 
@@ -54,6 +59,122 @@ class LSODASolver(SystemSolver):
                                         teval)
         return list(states)
 
+    def solve_stacked(self,
+                      inputs: typing.Sequence,
+                      states: typing.Sequence,
+                      teval: typing.Sequence) -> typing.Sequence:
+        """solve (N, width) stacked states of a vectorized component as one flattened ODE
+
+        the members don't interact, so the Jacobian is banded (width - 1 diagonals on each side) and its
+        finite difference estimate costs width evaluations rather than N * width
+        """
+        shape = np.shape(states)
+
+        def _state_diff_fcn(y: np.ndarray, t: float) -> np.ndarray:
+            dy = self.component.flows['states'](self.component, t, np.reshape(y, shape), inputs)
+            return np.reshape(dy, -1)
+
+        states = scipy.integrate.odeint(_state_diff_fcn, np.reshape(states, -1),
+                                        teval, ml=shape[1] - 1, mu=shape[1] - 1)
+        return [np.reshape(s, shape) for s in states]
+
+
+class FixedStepSolver(SystemSolver):
+    """
+    Explicit Runge-Kutta Solver with a Fixed Step
+
+    Each solve interval is split into a fixed number of substeps. Work arrays are allocated once per state shape
+    and reused across calls, so stepping only allocates what the component flows return.
+    """
+    # Butcher tableau
+    a: typing.Sequence[typing.Sequence[float]]
+    b: typing.Sequence[float]
+    c: typing.Sequence[float]
+
+    # number of steps taken between consecutive evaluation times
+    substeps: int = 1
+
+    def __init__(self, component: Component):
+        super().__init__(component)
+        self._work: typing.Dict[typing.Tuple[int, ...], typing.Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def with_substeps(cls, substeps: int) -> typing.Type['FixedStepSolver']:
+        """solver type taking substeps steps between evaluation times"""
+        assert substeps >= 1, f"number of substeps must be at least 1 (got {substeps})"
+        return typing.cast(typing.Type[FixedStepSolver],
+                           type(f"{cls.__name__}{substeps}", (cls,), {"substeps": substeps}))
+
+    def work_arrays(self, shape: typing.Tuple[int, ...]) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(stage derivatives, stage state, scratch) arrays for a state shape"""
+        if shape not in self._work:
+            self._work[shape] = (np.zeros((len(self.b), *shape)), np.zeros(shape), np.zeros(shape))
+        return self._work[shape]
+
+    def step(self, t: float, y: np.ndarray, h: float, inputs: typing.Sequence) -> None:
+        """advance y in place by one step of size h"""
+        k, ytmp, scratch = self.work_arrays(y.shape)
+        flow = self.component.flows['states']
+        for sidx in range(len(self.b)):
+            np.copyto(ytmp, y)
+            for j, aij in enumerate(self.a[sidx][:sidx]):
+                if aij != 0.0:
+                    np.multiply(k[j], h * aij, out=scratch)
+                    ytmp += scratch
+            k[sidx] = flow(self.component, t + self.c[sidx] * h, ytmp, inputs)
+        for sidx, bi in enumerate(self.b):
+            if bi != 0.0:
+                np.multiply(k[sidx], h * bi, out=scratch)
+                y += scratch
+
+    def solve(self,
+              inputs: typing.Sequence,
+              states: typing.Sequence,
+              teval: typing.Sequence) -> typing.Sequence:
+        y = np.array(states, dtype=float)
+        ret = [y.copy()]
+        for t0, t1 in zip(teval[:-1], teval[1:]):
+            h = (t1 - t0) / self.substeps
+            for sidx in range(self.substeps):
+                self.step(t0 + sidx * h, y, h, inputs)
+            ret.append(y.copy())
+        return ret
+
+
+class EulerSolver(FixedStepSolver):
+    """
+    Forward Euler Method
+    """
+    a = [[0.0]]
+    b = [1.0]
+    c = [0.0]
+
+
+class RK4Solver(FixedStepSolver):
+    """
+    Classical Fourth Order Runge-Kutta Method
+    """
+    a = [[0.0, 0.0, 0.0, 0.0],
+         [0.5, 0.0, 0.0, 0.0],
+         [0.0, 0.5, 0.0, 0.0],
+         [0.0, 0.0, 1.0, 0.0]]
+    b = [1 / 6, 1 / 3, 1 / 3, 1 / 6]
+    c = [0.0, 0.5, 0.5, 1.0]
+
+
+class DormandPrinceSolver(FixedStepSolver):
+    """
+    Dormand-Prince Method (fifth order solution, taken with a fixed step)
+    """
+    a = [[0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+         [1 / 5, 0.0, 0.0, 0.0, 0.0, 0.0],
+         [3 / 40, 9 / 40, 0.0, 0.0, 0.0, 0.0],
+         [44 / 45, -56 / 15, 32 / 9, 0.0, 0.0, 0.0],
+         [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729, 0.0, 0.0],
+         [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656, 0.0]]
+    b = [35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]
+    c = [0.0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1.0]
+
 
 class DiscreteSolver(SystemSolver):
     """
@@ -75,7 +196,8 @@ class DiscreteSolver(SystemSolver):
         tnext = self._scheduler.get_uniform_events(1.0 / self.component.sampling_frequency,
                                                    self.component.sampling_phase, tspan)
         if len(tnext) > 0:
-            ns = self.component.flows['states'](self.component, tnext[0], states, inputs)
+            # advance at the latest sampling instant (earlier ones were handled by previous updates)
+            ns = self.component.flows['states'](self.component, tnext[-1], states, inputs)
             return [states, ns]
         else:
             return [states, states]
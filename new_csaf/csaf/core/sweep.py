@@ -0,0 +1,317 @@
+"""
+CSAF Sweep
+
+Run many simulations of a system over a pool of persistent worker processes
+"""
+import copy
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+
+import csaf.core.base as cbase
+from csaf.core.component import Component
+from csaf.core.system import ComponentComposition
+
+import typing
+
+__all__ = ['Sweep', 'SweepResult']
+
+
+class SweepResult(typing.NamedTuple):
+    """outcome of one run of a sweep"""
+    # position of the configuration in the sweep
+    position: int
+
+    configuration: typing.Any
+
+    # whether the simulation passed its terminating conditions (None if the run failed)
+    passed: typing.Optional[bool]
+
+    # traces of the run, or the value of the summary function (None if the run failed)
+    result: typing.Any
+
+    # traceback of the exception raised by the run, if any
+    error: typing.Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _RunSettings(typing.NamedTuple):
+    tspan: typing.Tuple[float, float]
+    terminating_conditions: typing.Optional[typing.Callable]
+    terminating_conditions_all: typing.Any
+    summary: typing.Optional[typing.Callable]
+
+
+# state of a sweep worker process
+_worker_target: typing.Any = None
+# queue the worker reports the start and the result of its runs to
+_worker_messages: typing.Any = None
+_worker_system: typing.Optional[ComponentComposition] = None
+# components of the worker system as set up with no changes
+_worker_setup: typing.Dict[str, Component] = {}
+
+
+def _is_scenario(target) -> bool:
+    return hasattr(target, 'generate_system')
+
+
+def _configures_systems(scenario) -> bool:
+    """whether a scenario configures given systems, rather than only generating new ones"""
+    from csaf.test.scenario import Scenario
+    scenario_type = type(scenario)
+    return scenario_type.configure_system is not Scenario.configure_system or \
+        scenario_type.generate_system is Scenario.generate_system
+
+
+def _init_worker(target, messages=None) -> None:
+    """build the system of the worker once"""
+    global _worker_target, _worker_system, _worker_setup, _worker_messages
+    _worker_messages = messages
+    _worker_target = target() if isinstance(target, type) and _is_scenario(target) else target
+    system_type = _worker_target.system_type if _is_scenario(_worker_target) else _worker_target
+    _worker_system = system_type()
+    _worker_setup = copy.deepcopy(_worker_system.component_instances)
+
+
+def _system_for(configuration) -> ComponentComposition:
+    """the worker system, configured for a run"""
+    system = _worker_system
+    assert system is not None, "sweep worker is not initialized"
+    if _is_scenario(_worker_target) and not _configures_systems(_worker_target):
+        # scenarios only generating systems get a new system per run
+        return _worker_target.generate_system(configuration)
+    system.discard_changes(_worker_setup)
+    if _is_scenario(_worker_target):
+        return _worker_target.configure_system(system, configuration)
+    configuration = configuration or {}
+    for cname, ivs in configuration.get("initial_values", {}).items():
+        for ivname, iv in ivs.items():
+            system.set_component_iv(cname, ivname, iv)
+    for cname, params in configuration.get("parameters", {}).items():
+        for pname, pv in params.items():
+            system.set_component_param(cname, pname, pv)
+    return system
+
+
+def _run_task(task: typing.Tuple[int, typing.Any, _RunSettings]) -> SweepResult:
+    index, configuration, settings = task
+    try:
+        system = _system_for(configuration)
+        trajs, passed = system.simulate_tspan(settings.tspan,  # type: ignore
+                                              terminating_conditions=settings.terminating_conditions,
+                                              terminating_conditions_all=settings.terminating_conditions_all,
+                                              return_passed=True)
+        result = trajs if settings.summary is None else settings.summary(trajs, passed)
+        return SweepResult(index, configuration, bool(passed), result)
+    except Exception:
+        return SweepResult(index, configuration, None, None, traceback.format_exc())
+
+
+def _run_chunk(run_id: int, tasks: typing.Sequence[typing.Tuple[int, typing.Any, _RunSettings]]) -> None:
+    """run tasks in order, reporting (run id, position, worker pid, None) before and (.., result) after each"""
+    pid = os.getpid()
+    for task in tasks:
+        _worker_messages.put((run_id, task[0], pid, None))
+        _worker_messages.put((run_id, task[0], pid, _run_task(task)))
+
+
+def _forward(messages, inbox: queue.Queue) -> None:
+    """move the messages of the workers to a queue that can be waited on with a timeout, until None"""
+    while True:
+        message = messages.get()
+        if message is None:
+            return
+        inbox.put(message)
+
+
+class Sweep(cbase.CsafBase):
+    """
+    CSAF Parameter Sweep
+
+    Simulates a system for many configurations over a pool of worker processes. The pool is created once and
+    kept between runs; every worker builds the system once and reuses it for all of its runs, restoring copies of
+    its components and applying the changes of each configuration, so imports, model loading and compilation are
+    paid once per worker. Scenarios should implement configure_system for this; a scenario overriding only
+    generate_system gets a new system per run.
+
+    The target is either
+        - a System type, with configurations as dicts {"initial_values": {component: {name: value}},
+          "parameters": {component: {name: value}}} (both optional)
+        - a Scenario (type or instance), with configurations in its configuration space
+
+    Functions passed to run (terminating conditions and summary) are sent to the workers, so they must be
+    picklable (e.g. defined at module level).
+
+    A run whose worker process dies (e.g. a segfault), or that exceeds the run timeout, fails without stopping the
+    sweep; the worker is replaced and the other runs of its chunk are sent again.
+
+    ```
+    with Sweep(F16Simple, processes=4) as sweep:
+        for res in sweep.run(configs, (0.0, 20.0), chunksize=8):
+            ...
+    ```
+    """
+
+    # seconds between checks of the workers running a simulation
+    poll_interval = 0.1
+
+    def __init__(self, target: typing.Any, processes: typing.Optional[int] = None,
+                 mp_context: typing.Optional[str] = None, timeout: typing.Optional[float] = None):
+        """
+        :param target: System type, or Scenario type or instance
+        :param processes: number of worker processes (number of cpus when None)
+        :param mp_context: multiprocessing start method (platform default when None)
+        :param timeout: seconds a run may take before its worker is stopped and the run failed (no limit when None)
+        """
+        self.target = target
+        self.processes = processes
+        self.mp_context = mp_context
+        self.timeout = timeout
+        self._pool: typing.Optional[typing.Any] = None
+        self._messages: typing.Any = None
+        self._run_ids = itertools.count()
+        # whether a chunk was lost with its worker
+        self._lost_chunks = False
+
+    def validate(self) -> None:
+        assert _is_scenario(self.target) or (isinstance(self.target, type) and
+                                             issubclass(self.target, ComponentComposition)), \
+            f"sweep target {self.target} must be a System type or a Scenario"
+        assert self.timeout is None or self.timeout > 0.0, f"run timeout must be positive (got {self.timeout})"
+
+    @property
+    def pool(self):
+        """worker pool (created on first use)"""
+        if self._pool is None:
+            self.validate()
+            ctx = multiprocessing.get_context(self.mp_context)
+            # written without a feeder thread, so a message put before a worker dies is received
+            self._messages = ctx.SimpleQueue()
+            self._pool = ctx.Pool(self.processes, initializer=_init_worker, initargs=(self.target, self._messages))
+        return self._pool
+
+    def run(self, configurations: typing.Iterable, tspan: typing.Tuple[float, float],
+            chunksize: int = 1,
+            progress: typing.Optional[typing.Callable[[int, int], None]] = None,
+            summary: typing.Optional[typing.Callable[[typing.Dict, bool], typing.Any]] = None,
+            terminating_conditions: typing.Optional[typing.Callable] = None,
+            terminating_conditions_all: typing.Any = None) -> typing.Iterator[SweepResult]:
+        """ simulate every configuration, yielding the results as they complete (in any order)
+
+        a run that raises, times out or whose worker dies does not stop the sweep; its result holds the error
+        instead
+
+        :param configurations: configurations to simulate
+        :param tspan: simulation time span
+        :param chunksize: number of runs sent to a worker at once
+        :param progress: called with (number of completed runs, number of runs) after every run
+        :param summary: reduce the (traces, passed) of a run in the worker, returning its value instead of traces
+        :param terminating_conditions: simulation terminating conditions
+        :param terminating_conditions_all: simulation terminating conditions over the traces, or a Monitor
+        """
+        assert chunksize >= 1, f"chunksize must be at least 1 (got {chunksize})"
+        configurations = list(configurations)
+        settings = _RunSettings(tuple(tspan), terminating_conditions, terminating_conditions_all,  # type: ignore
+                                summary)
+        tasks = [(idx, conf, settings) for idx, conf in enumerate(configurations)]
+        pool, run_id = self.pool, next(self._run_ids)
+        inbox: queue.Queue = queue.Queue()
+        # position -> chunk of the run
+        chunks: typing.Dict[int, typing.List] = {}
+
+        def submit(chunk: typing.List) -> None:
+            def failed(exc: BaseException) -> None:
+                # the chunk couldn't be sent to a worker (e.g. a function that can't be pickled)
+                error = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+                for task in chunk:
+                    inbox.put((run_id, task[0], None, SweepResult(task[0], task[1], None, None, error)))
+
+            for task in chunk:
+                chunks[task[0]] = chunk
+            pool.apply_async(_run_chunk, (run_id, chunk), error_callback=failed)
+
+        reader = threading.Thread(target=_forward, args=(self._messages, inbox), daemon=True)
+        reader.start()
+        try:
+            for idx in range(0, len(tasks), chunksize):
+                submit(tasks[idx:idx + chunksize])
+            remaining = set(range(len(tasks)))
+            # position -> (worker pid, start time) of the started runs
+            started: typing.Dict[int, typing.Tuple[int, float]] = {}
+            stopped: typing.Set[int] = set()
+            checked = time.monotonic()
+            while remaining:
+                try:
+                    message: typing.Optional[typing.Tuple] = inbox.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    message = None
+                if message is not None and message[0] == run_id and message[1] in remaining and \
+                        message[2] not in stopped:
+                    _, idx, pid, res = message
+                    if res is None:
+                        started[idx] = (pid, time.monotonic())
+                    else:
+                        started.pop(idx, None)
+                        remaining.discard(idx)
+                        if progress is not None:
+                            progress(len(tasks) - len(remaining), len(tasks))
+                        yield res
+                if time.monotonic() - checked < self.poll_interval:
+                    continue
+                checked = time.monotonic()
+                live = {p.pid for p in multiprocessing.active_children()}
+                for idx, (pid, start) in list(started.items()):
+                    if pid in live and (self.timeout is None or checked - start <= self.timeout):
+                        continue
+                    if pid in live:
+                        error = f"run timed out after {self.timeout} s"
+                        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+                    else:
+                        error = f"worker process {pid} died during the run"
+                    stopped.add(pid)
+                    self._lost_chunks = True
+                    del started[idx]
+                    remaining.discard(idx)
+                    # the later runs of the chunk never started
+                    chunk = chunks[idx]
+                    rest = chunk[[t[0] for t in chunk].index(idx) + 1:]
+                    if rest:
+                        submit(rest)
+                    if progress is not None:
+                        progress(len(tasks) - len(remaining), len(tasks))
+                    yield SweepResult(idx, tasks[idx][1], None, None, error)
+        finally:
+            self._messages.put(None)
+            reader.join()
+
+    def run_all(self, configurations: typing.Iterable, tspan: typing.Tuple[float, float],
+                **kwargs) -> typing.List[SweepResult]:
+        """simulate every configuration, returning the results in configuration order (see run)"""
+        return sorted(self.run(configurations, tspan, **kwargs), key=lambda r: r.position)
+
+    def close(self) -> None:
+        """stop the workers"""
+        if self._pool is not None:
+            # chunks of stopped workers never complete, so the pool would wait on them
+            if self._lost_chunks:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+            self._lost_chunks = False
+            self._pool = None
+            self._messages = None
+
+    def __enter__(self) -> 'Sweep':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -1,15 +1,68 @@
 """
 CSAF System
 """
+from csaf.core.batch import BatchSimulation
+from csaf.core.cache import get_cache, monitor_states, restore_monitors, simulation_key
 from csaf.core.component import Component
-from csaf.core.scheduler import Scheduler
-from csaf.core.trace import TimeTrace
+from csaf.core.events import Crossing, CrossingDetector, ZeroCrossing
+from csaf.core.monitor import Monitor, as_monitor
+from csaf.core.monolithic import ContinuousGroup, find_continuous_groups
+from csaf.core.plan import ExecutionPlan
+from csaf.core.recording import RecordingPolicy
+from csaf.core.scheduler import Scheduler, EventQueue
+from csaf.core.trace import TimeTrace, ColumnarTimeTrace
 import csaf.core.base as cbase
 
+import collections
+import copy
+import numpy as np
 import typing
 import tqdm  # type: ignore
 
-__all__ = ['ComponentComposition', 'System']
+__all__ = ['ComponentComposition', 'System', 'SystemSnapshot']
+
+
+class SystemSnapshot(typing.NamedTuple):
+    """state of a composition between two events (see ComponentComposition.snapshot)"""
+    # time of the last processed event (None before the first event)
+    time: typing.Optional[float]
+
+    # signal buffer of the float signals
+    signals: np.ndarray
+
+    # component name -> time of its last update
+    update_times: typing.Dict[str, float]
+
+    # component instances, holding their parameters (including stateful ones)
+    components: typing.Dict[str, Component]
+
+    # component name -> wakeup time it is idle until (see Component.wakeup)
+    wakeups: typing.Dict[str, float] = {}
+
+    # signal buffer of the other signals (see ExecutionPlan)
+    objects: np.ndarray = np.empty(0, dtype=object)
+
+
+def _same_value(a: typing.Any, b: typing.Any) -> bool:
+    """whether two parameter values are known to be equal"""
+    if a is b:
+        return True
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError):
+        # elements without a truth value (e.g. arrays)
+        return False
+
+
+def _changed(old: typing.Optional[typing.Sequence], new: typing.Sequence) -> bool:
+    """whether a signal value differs from the last value written (None when unknown)"""
+    if old is None:
+        return True
+    try:
+        return bool(old != new)
+    except ValueError:
+        # elements without a truth value (e.g. arrays)
+        return True
 
 
 class ComponentComposition(cbase.CsafBase):
@@ -23,15 +76,43 @@ class ComponentComposition(cbase.CsafBase):
 
     priority: typing.Optional[typing.Sequence[str]] = None
 
+    # integrate connected continuous components together as one ODE (see csaf.core.monolithic)
+    monolithic: bool = False
+
+    # guards whose crossings are located within the simulation steps (see csaf.core.events)
+    zero_crossings: typing.Sequence[ZeroCrossing] = ()
+
+    # skip the updates of pure components whose states and inputs did not change (see Component.is_pure)
+    skip_unchanged: bool = True
+
     def __init__(self):
         # create instances of all components mentioned in the composition description
         self._components: typing.Dict[str, Component] = {k: v() for k, v in self.components.items()}
 
-        # signal buffer is where signals are stored during simulation
-        self._signals_buffer: typing.Dict[typing.Tuple[str, str], typing.Sequence] = {}
+        # signal buffer is where signals are stored during simulation (routed by the execution plan)
+        self._plan: typing.Optional[ExecutionPlan] = None
+        self._signals: np.ndarray = np.zeros(0, dtype=np.float64)
+        self._objects: np.ndarray = np.empty(0, dtype=object)
         self._update_times: typing.Dict[str, float] = {}
+        self._groups: typing.Dict[str, ContinuousGroup] = {}
+        self._time: typing.Optional[float] = None
+        # component name -> (start time, states, inputs) of its last update
+        self._steps: typing.Dict[str, typing.Tuple[float, typing.Sequence, typing.Sequence]] = {}
+        self._crossings: typing.List[Crossing] = []
+        # component name -> wakeup time of a component idle until then
+        self._wakeups: typing.Dict[str, float] = {}
+        # signal version counters, and for pure components, the versions and outputs of an update to reuse
+        self._versions: typing.List[int] = []
+        self._reusable: typing.Dict[str, typing.Tuple[typing.Any, typing.Dict[str, typing.Sequence]]] = {}
+        # last value written to each signal (by version counter index), None when unknown (e.g. after a restore)
+        self._written: typing.List[typing.Optional[typing.Sequence]] = []
+        self._nskipped = 0
         self._iv_changes = []
         self._param_changes = []
+        # copies of the components after their setup (initialized, with the changes applied), restored on reset
+        self._pristine: typing.Optional[typing.Dict[str, Component]] = None
+        # whether the components were simulated since their setup
+        self._dirty = False
 
         self._initialized = False
 
@@ -39,113 +120,459 @@ class ComponentComposition(cbase.CsafBase):
         """
         initialize the signals for a simulation
         """
+        self._plan = ExecutionPlan.compile(type(self))
+        self._signals, self._objects = self._plan.allocate()
+        self._reset_versions()
+        self._dirty = True
+
         # for now, initialized the components with the smallest number of inputs
         # TODO: FIXME: this is a heuristic! The user should be made aware of this
         components_least_input = sorted([(k, ci) for k, ci in self._components.items()],
                                         key=lambda args: len(args[1].inputs))
         for namei, componenti in components_least_input:
             r = componenti.solve_default()
-            self._signals_buffer.update({(namei, k): v for k, v in componenti.initial_values.items()})
-            self._signals_buffer.update({(namei, k): v for k, v in r.items()})
+            self.write_signals(namei, componenti.initial_values)
+            self.write_signals(namei, r)
             self._update_times[namei] = 0.0
 
+        self._time = None
+        self._steps = {}
+        self._wakeups = {}
+        self._build_groups()
+
+    def _reset_versions(self) -> None:
+        self._versions = self.execution_plan.allocate_versions()
+        self._written = [None] * len(self._versions)
+        self._reusable = {}
+        self._nskipped = 0
+
+    def _build_groups(self) -> None:
+        self._groups = {}
+        if self.monolithic:
+            for group in find_continuous_groups(self):
+                self._groups.update({n: group for n in group.names})
+
+    def snapshot(self) -> SystemSnapshot:
+        """ capture the simulation state (e.g. after simulate_tspan stops), to resume from it later
+
+        components are deep copied, so stateful parameters (e.g. autopilot or predictor objects) are captured too.
+        A snapshot taken before the signal buffer is initialized holds the components only, and a simulation
+        resumed from it initializes the buffer from their initial values.
+        """
+        return SystemSnapshot(self._time, self._signals.copy(), dict(self._update_times),
+                              copy.deepcopy(self._components), dict(self._wakeups), self._objects.copy())
+
+    def restore(self, snapshot: SystemSnapshot) -> None:
+        """ set the simulation state to a snapshot
+
+        the snapshot is copied, so it can be restored any number of times. To branch with a perturbation, restore
+        a snapshot, write_signals the perturbed values and take a new snapshot.
+        """
+        assert set(snapshot.components) == set(self.components), "snapshot is not of this system"
+        self._components = copy.deepcopy(snapshot.components)
+        self._dirty = True
+        self._plan = ExecutionPlan.compile(type(self))
+        self._signals = snapshot.signals.copy()
+        self._objects = snapshot.objects.copy()
+        self._update_times = dict(snapshot.update_times)
+        self._wakeups = dict(snapshot.wakeups)
+        self._time = snapshot.time
+        self._steps = {}
+        self._reset_versions()
+        self._build_groups()
+
+    @property
+    def execution_plan(self) -> ExecutionPlan:
+        """static signal routing for this composition"""
+        if self._plan is None:
+            self._plan = ExecutionPlan.compile(type(self))
+        return self._plan
+
+    def _buffer(self, key: typing.Tuple[str, str]) -> np.ndarray:
+        """signal array storing a signal"""
+        return self._signals if key in self.execution_plan.numeric else self._objects
+
+    def get_signal(self, component_name: str, flow_name: str) -> typing.List:
+        """current value of the signal flow_name of a component"""
+        key = (component_name, flow_name)
+        return self._buffer(key)[self.execution_plan.slices[key]].tolist()
+
+    @property
+    def signals_buffer(self) -> typing.Dict[typing.Tuple[str, str], typing.List]:
+        """copy of the current value of every signal"""
+        return {k: self._buffer(k)[sl].tolist() for k, sl in self.execution_plan.slices.items()}
+
+    def write_signals(self, component_name: str, values: typing.Mapping[str, typing.Sequence]) -> None:
+        """ write flow values of a component into the signal buffer
+
+        :param component_name: name of component that produced the values
+        :param values: flow name -> value (values for flows without a signal are ignored)
+        """
+        for name, sl, numeric, version, tracked in self._plan.writes[component_name]:  # type: ignore
+            if name in values:
+                (self._signals if numeric else self._objects)[sl] = values[name]
+                self._written[version] = list(values[name])
+                if tracked:
+                    self._versions[version] += 1
+
+    def create_traces(self, capacities: typing.Optional[typing.Mapping[str, int]] = None
+                      ) -> typing.Dict[str, TimeTrace]:
+        """ empty traces for the flows of every component
+
+        :param capacities: component name -> number of rows to preallocate
+        """
+        return {dname: ColumnarTimeTrace.for_component(component,
+                                                       None if capacities is None else capacities.get(dname))
+                for dname, component in self.component_instances.items()}
+
     def build_input_vec(self, component_name: str) -> typing.Sequence:
         """ extract the input vector described in the component
 
         a component describes its inputs as a sequence of messages, which can
-        translate into a vector.
-
-        TODO: is this too slow?
-        TODO: should some of this be in the csaf.core.Component class?
+        translate into a vector. The execution plan precomputes it as one gather.
 
         :param component_name: name of component to build an input vector for
         :return: input vector
         """
-        # TODO: FIXME
-        component = self._components[component_name]
-        conns = [(component_name, inname) for inname in component.inputs_names]
-        inputs = []
-        for conn in conns:
-            lu = self.connections[conn]
-            n = list(self._signals_buffer[lu])
-            inputs += n
-        return list(inputs)
+        return self._plan.gather(self._signals, self._objects, component_name)  # type: ignore
 
     def update_component(self, component_name: str, ctime: float) -> typing.Dict[str, typing.Sequence]:
         """
         update the signal buffer affected by the component with component name
-
-        TODO: is this too slow?
         """
         assert component_name in self._components
         component = self._components[component_name]
+        plan = self._plan
+        assert plan is not None, "signal buffer must be initialized before updating components"
+
+        pure = component.is_pure and self.skip_unchanged
+        if pure:
+            versions = plan.dependencies[component_name](self._versions)
+            reusable = self._reusable.get(component_name)
+            if reusable is not None and reusable[0] == versions:
+                # nothing the component depends on changed since an update that left it unchanged
+                self._steps.pop(component_name, None)
+                self._update_times[component_name] = ctime
+                self._time = ctime
+                self._nskipped += 1
+                return dict(reusable[1])
 
         # build out the inputs to solve the component
-        states = self._signals_buffer[(component_name, "states")]
-        inputs = self.build_input_vec(component_name)
+        ssl, numeric, sversion, idx, mask, writes = plan.routes[component_name]
+        written = self._written
+        states = written[sversion]
+        if states is None:
+            states = (self._signals if numeric else self._objects)[ssl].tolist()
+        inputs = self._signals[idx].tolist() if mask is None else \
+            plan.gather(self._signals, self._objects, component_name)
+
+        # solve and update the signal buffer
+        tspan = [self._update_times[component_name], ctime]
+        self._steps[component_name] = (tspan[0], states, inputs)
+        ret: typing.Dict[str, typing.Sequence]
+        if component_name in self._groups:
+            states = self._groups[component_name].member_states(component_name, tspan)
+            ret = {k: [states] if k == "states" else [f(component, ctime, states, inputs)]
+                   for k, f in component.flows.items()}
+        else:
+            ret = component.solve_sys_tspan(inputs, states, tspan)
+        out: typing.Dict[str, typing.Sequence] = {k: (list(v[-1]) if len(v) > 0 else list(v)) for k, v in ret.items()}
+        for flow, sl, numeric, version, tracked in writes:
+            if flow in out:
+                if tracked:
+                    # only the signals pure components depend on count versions, and unchanged ones are not written
+                    if not _changed(written[version], out[flow]):
+                        continue
+                    self._versions[version] += 1
+                written[version] = out[flow]
+                (self._signals if numeric else self._objects)[sl] = out[flow]
+        if pure:
+            # a component at a fixed point of its inputs produces the same update again
+            if plan.dependencies[component_name](self._versions) == versions:
+                self._reusable[component_name] = (versions, out)
+            else:
+                self._reusable.pop(component_name, None)
+        self._update_times[component_name] = ctime
+        self._time = ctime
 
-        # solve and update keys for signal buffer
-        ret = component.solve_sys_tspan(inputs, states, [self._update_times[component_name], ctime])
-        r = {(component_name, k): (list(v[-1]) if len(v) > 0 else list(v)) for k, v in ret.items()}
+        return out
 
-        # update the context
-        self._signals_buffer.update(r)
-        self._update_times[component_name] = ctime
+    def wakeup(self, component_name: str, ctime: float, out: typing.Mapping[str, typing.Sequence]
+               ) -> typing.Optional[float]:
+        """ time a component is idle until, after its update at ctime with outputs out (see Component.wakeup)
 
-        return {k: (list(v[-1]) if len(v) > 0 else list(v)) for k, v in ret.items()}
+        :return: wakeup time, None when the component updates at every sample
+        """
+        component = self._components[component_name]
+        if component.wakeup is None:
+            return None
+        until = component.wakeup(ctime, out.get("states", []), self.build_input_vec(component_name))
+        if until is None:
+            self._wakeups.pop(component_name, None)
+        else:
+            self._wakeups[component_name] = until
+        return until
+
+    def event_queue(self, tspan: typing.Tuple[float, typing.Optional[float]],
+                    after: typing.Optional[typing.Mapping[str, float]] = None) -> EventQueue:
+        """ scheduled events of the components over a time span, skipping the samples of idle components
+
+        :param tspan: time span (tmin, tmax), tmax None for no end
+        :param after: component name -> time its events start strictly after
+        """
+        sched = Scheduler(self._components, list(self._components.keys()) if self.priority is None else self.priority)
+        queue = sched.get_event_queue(tspan, after=after)
+        for cname, until in self._wakeups.items():
+            queue.hold(cname, until)
+        return queue
+
+    @property
+    def has_wakeups(self) -> bool:
+        """whether a component can be idle between its samples"""
+        return any(c.wakeup is not None for c in self._components.values())
+
+    def states_at(self, component_name: str, t: float) -> typing.List:
+        """ states of a component at a time within its last update step
+
+        continuous components are integrated again from the start of the step (with the inputs of the step), and
+        discrete components hold their states over the step. Times outside of the step are clamped to it.
+        """
+        current = self.get_signal(component_name, "states")
+        if component_name not in self._steps or t >= self._update_times[component_name]:
+            return current
+        t0, states0, inputs = self._steps[component_name]
+        component = self._components[component_name]
+        if t <= t0 or component.is_discrete:
+            return list(states0)
+        if component_name in self._groups:
+            return self._groups[component_name].states_at(component_name, t)
+        return list(component.solve_state(inputs, states0, [t0, t])[-1])
+
+    @property
+    def crossings(self) -> typing.List[Crossing]:
+        """zero crossings located by the last simulation"""
+        return list(self._crossings)
+
+    def _end_at_crossing(self, dtraces: typing.Dict[str, TimeTrace], crossing: Crossing,
+                         recording: typing.Optional[RecordingPolicy] = None) -> None:
+        """drop the samples after a terminal crossing, and record the states of its guard at the crossing"""
+        for cname, trace in dtraces.items():
+            nkeep = int(np.searchsorted(np.asarray(trace["times"]), crossing.time, side="right"))
+            if nkeep < len(trace):
+                trace.truncate(nkeep)  # type: ignore
+        for cname, states in crossing.states.items():
+            component = self._components[cname]
+            if component.is_discrete or cname not in self._steps:
+                continue
+            inputs = self._steps[cname][2]
+            out: typing.Dict[str, typing.Any] = {k: (states if k == "states" else f(component, crossing.time, states,
+                                                                                    inputs))
+                                                 for k, f in component.flows.items()}
+            self.write_signals(cname, out)
+            self._update_times[cname] = crossing.time
+            out["times"] = crossing.time
+            if recording is None:
+                dtraces[cname].append(**out)
+            else:
+                recording.record(dtraces, cname, out, force=True)
+        self._time = crossing.time
 
     def simulate_tspan(self, tspan,
                        show_status: bool = False,
                        terminating_conditions: typing.Optional[typing.Callable] = None,
-                       terminating_conditions_all: typing.Optional[typing.Callable] = None,
-                       return_passed: bool = False) -> typing.Union[typing.Dict[str, TimeTrace],
-                                                                    typing.Tuple[typing.Dict[str, TimeTrace], bool]]:
+                       terminating_conditions_all: typing.Optional[typing.Union[Monitor, typing.Callable]] = None,
+                       return_passed: bool = False,
+                       snapshot: typing.Optional[SystemSnapshot] = None,
+                       use_cache: bool = True,
+                       zero_crossings: typing.Optional[typing.Sequence[ZeroCrossing]] = None,
+                       recording: typing.Optional[RecordingPolicy] = None) -> typing.Union[
+                           typing.Dict[str, TimeTrace], typing.Tuple[typing.Dict[str, TimeTrace], bool]]:
         """ simulate the composed system over a given time span
         :param tspan: time span (tmin, tmax)
         :param show_status: show progress bar in stdout
         :param terminating_conditions: callable that accepts the current system state, when returning true,
                                         will stop the simulation
         :param terminating_conditions_all: callable that accepts the current system state AND all past system states,
-                                            when returning true, will stop the simulation
+                                            when returning true, will stop the simulation. A csaf Monitor is given
+                                            the new sample of every event instead.
         :param return_passed: whether to return a boolean value that if false means that the simulation met the
                                 terminating conditions
+        :param snapshot: resume from a snapshot rather than the initial values. Events the snapshot has already
+                            processed are skipped, and the traces hold only the resumed events.
+        :param use_cache: consult the result cache, when enabled (see csaf.core.cache). Resumed simulations are not
+                            cached. On a cache hit the components are not simulated, so their state isn't that of the
+                            end of the run; a monitor is set to its stored state at the end of the run.
+        :param zero_crossings: guards to locate crossings of, in addition to the zero_crossings of the system. The
+                            simulation stops at the exact time of a terminal crossing, and the crossings are given to
+                            the monitor and kept in crossings.
+        :param recording: components, flows and samples to record in the traces (see csaf.core.recording), all
+                            when None. Simulations with a recording policy are not cached.
         """
-        self.reset()
-        self.initialize_buffer()
+        zero_crossings = [*self.zero_crossings, *(zero_crossings or ())]
+        cache = get_cache() if use_cache and snapshot is None and recording is None else None
+        key = None
+        if cache is not None:
+            key = simulation_key(self, tspan, terminating_conditions=terminating_conditions,
+                                 terminating_conditions_all=terminating_conditions_all,
+                                 zero_crossings=zero_crossings)
+        if key is not None:
+            hit = cache.get(key)  # type: ignore
+            if hit is not None:
+                dtraces, passed, self._crossings, states = hit
+                restore_monitors(terminating_conditions_all, dtraces, states)
+                return dtraces if not return_passed else (dtraces, passed)
+
+        dtraces, passed = self._simulate_events(tspan, show_status, terminating_conditions,
+                                                terminating_conditions_all, snapshot, zero_crossings, recording)
+        if key is not None:
+            cache.put(key, (dtraces, passed, self._crossings,  # type: ignore
+                            monitor_states(terminating_conditions_all, dtraces)))
+        return dtraces if not return_passed else (dtraces, passed)
+
+    def _simulate_events(self, tspan,
+                         show_status: bool,
+                         terminating_conditions: typing.Optional[typing.Callable],
+                         terminating_conditions_all: typing.Optional[typing.Union[Monitor, typing.Callable]],
+                         snapshot: typing.Optional[SystemSnapshot],
+                         zero_crossings: typing.Sequence[ZeroCrossing] = (),
+                         recording: typing.Optional[RecordingPolicy] = None
+                         ) -> typing.Tuple[typing.Dict[str, TimeTrace], bool]:
+        """run the scheduled events of simulate_tspan, returning (traces, passed)"""
+        if snapshot is None:
+            self.reset()
+            self.initialize_buffer()
+        else:
+            assert snapshot.time is None or tspan[0] >= snapshot.time, \
+                f"time span {tspan} starts before the snapshot time {snapshot.time}"
+            self.restore(snapshot)
+            if not snapshot.update_times:
+                self.initialize_buffer()
 
         sched = Scheduler(self._components, list(self._components.keys()) if self.priority is None else self.priority)
         evts = sched.get_schedule_tspan(tspan)
-        evts_it = evts if not show_status else tqdm.tqdm(evts)
-
-        # get time trace fields
-        dnames = self._components.keys()
-        dtraces = {}
-        for dname in dnames:
-            fields = ['times'] + list(self._components[dname].flow_names)
-            dtraces[dname] = TimeTrace(fields)
+        after = snapshot.update_times if snapshot is not None and snapshot.time is not None else None
+        if after is not None:
+            evts = [(cname, ctime) for cname, ctime in evts if ctime > after[cname]]
+        # with idle components, the events are taken from a queue, and the scheduled ones are an upper bound
+        queue = self.event_queue(tspan, after=after) if self.has_wakeups else None
+        evts_src: typing.Iterable[typing.Tuple[str, float]] = evts if queue is None else queue
+        evts_it = evts_src if not show_status else tqdm.tqdm(evts_src, total=len(evts))
+
+        # time traces, preallocated for the scheduled events
+        counts = collections.Counter(cname for cname, _ in evts)
+        dtraces = self.create_traces(counts) if recording is None else \
+            recording.create_traces(self._components, counts, float(tspan[1]) - float(tspan[0]))
+        monitor = as_monitor(terminating_conditions_all)
+        if monitor is not None:
+            monitor.reset(dtraces)
+        sample_monitor = monitor if monitor is not None and monitor.per_sample else None
+        self._crossings = []
+        detector = CrossingDetector(self, zero_crossings) if zero_crossings else None
+        if detector is not None:
+            detector.reset()
 
         try:
             for cname, ctime in evts_it:
                 out = self.update_component(cname, ctime)
-                out["times"] = ctime
-                dtraces[cname].append(**out)
+                if queue is not None:
+                    queue.hold(cname, self.wakeup(cname, ctime, out))
+                out["times"] = ctime  # type: ignore
+                if recording is None:
+                    dtraces[cname].append(**out)
+                else:
+                    recording.record(dtraces, cname, out)
+
+                if detector is not None:
+                    for crossing in detector.update(cname, ctime):
+                        self._crossings.append(crossing)
+                        stop = monitor is not None and monitor.crossing(crossing)
+                        if crossing.terminal or stop:
+                            self._end_at_crossing(dtraces, crossing, recording)
+                            return dtraces, False
 
                 if terminating_conditions is not None and terminating_conditions(cname, out):
-                    return dtraces if not return_passed else (dtraces, False)
+                    return dtraces, False
 
-                if terminating_conditions_all is not None and terminating_conditions_all(dtraces):
-                    return dtraces if not return_passed else (dtraces, False)
+                if sample_monitor is not None and sample_monitor.update(cname, out):
+                    return dtraces, False
         except Exception as exc:
             # FIXME: TODO
             raise exc
             pass
 
-        return dtraces if not return_passed else (dtraces, True)
+        return dtraces, True
+
+    def batch_members(self,
+                      initial_values: typing.Optional[typing.Sequence[typing.Dict[str, typing.Dict[str, typing.Sequence]]]] = None,
+                      parameters: typing.Optional[typing.Sequence[typing.Dict[str, typing.Dict[str, typing.Any]]]] = None
+                      ) -> typing.List['ComponentComposition']:
+        """ create a configured copy of this system for each initial value / parameter set
+
+        every member carries the changes already made to this system, followed by its own changes
+
+        :param initial_values: for each member, component name -> initial value name -> value
+        :param parameters: for each member, component name -> parameter name -> value
+        :return: list of systems
+        """
+        assert initial_values is not None or parameters is not None, "batch requires initial values or parameters"
+        if initial_values is not None and parameters is not None:
+            assert len(initial_values) == len(parameters), "initial values and parameters must have the same length"
+        n = len(initial_values) if initial_values is not None else len(parameters)  # type: ignore
+        members = []
+        for idx in range(n):
+            member = self.__class__()
+            for change in self._iv_changes:
+                member.set_component_iv(*change)
+            for param in self._param_changes:
+                member.set_component_param(*param)
+            for cname, ivs in (initial_values[idx] if initial_values is not None else {}).items():
+                for ivname, iv in ivs.items():
+                    member.set_component_iv(cname, ivname, iv)
+            for cname, params in (parameters[idx] if parameters is not None else {}).items():
+                for pname, pv in params.items():
+                    member.set_component_param(cname, pname, pv)
+            members.append(member)
+        return members
+
+    def simulate_batch_tspan(self, tspan,
+                             initial_values: typing.Optional[
+                                 typing.Sequence[typing.Dict[str, typing.Dict[str, typing.Sequence]]]] = None,
+                             parameters: typing.Optional[
+                                 typing.Sequence[typing.Dict[str, typing.Dict[str, typing.Any]]]] = None,
+                             show_status: bool = False,
+                             terminating_conditions: typing.Optional[typing.Callable] = None,
+                             terminating_conditions_all: typing.Optional[typing.Union[Monitor, typing.Callable]] = None,
+                             return_passed: bool = False) -> typing.Union[typing.List[typing.Dict[str, TimeTrace]],
+                                                                          typing.Tuple[typing.List[typing.Dict[str, TimeTrace]],
+                                                                                       typing.List[bool]]]:
+        """ simulate N configurations of the composed system in lockstep over a given time span
+
+        The configurations share one schedule and a stacked signal buffer. Components marked as vectorized
+        are solved once per event for all configurations.
+
+        :param tspan: time span (tmin, tmax)
+        :param initial_values: for each configuration, component name -> initial value name -> value
+        :param parameters: for each configuration, component name -> parameter name -> value
+        :param show_status: show progress bar in stdout
+        :param terminating_conditions: callable that accepts the current system state, when returning true,
+                                        will stop the simulation of that configuration
+        :param terminating_conditions_all: callable that accepts the current system state AND all past system states,
+                                            when returning true, will stop the simulation of that configuration
+        :param return_passed: whether to also return a list of booleans that are false for configurations that met
+                                the terminating conditions
+        """
+        members = self.batch_members(initial_values=initial_values, parameters=parameters)
+        dtraces, passed = BatchSimulation(members).simulate_tspan(tspan,
+                                                                  show_status=show_status,
+                                                                  terminating_conditions=terminating_conditions,
+                                                                  terminating_conditions_all=terminating_conditions_all)
+        return dtraces if not return_passed else (dtraces, passed)
 
     def validate_tspan(self, tspan: typing.Tuple[float, float],
                        show_status: bool = False,
                        terminating_conditions: typing.Optional[typing.Callable] = None,
-                       terminating_conditions_all: typing.Optional[typing.Callable] = None) -> bool:
+                       terminating_conditions_all: typing.Optional[typing.Union[Monitor, typing.Callable]] = None,
+                       use_cache: bool = True) -> bool:
         """ determine whether a simulation will complete over a time span
         :param tspan: time span (tmin, tmax)
         :param show_status: show progress bar in stdout
@@ -153,48 +580,98 @@ class ComponentComposition(cbase.CsafBase):
                                         will stop the simulation
         :param terminating_conditions_all: callable that accepts the current system state AND all past system states,
                                             when returning true, will stop the simulation
+        :param use_cache: consult the result cache, when enabled (see csaf.core.cache)
         """
         ret = self.simulate_tspan(tspan,
                                   show_status=show_status,
                                   terminating_conditions=terminating_conditions,
                                   terminating_conditions_all=terminating_conditions_all,
-                                  return_passed=True)
+                                  return_passed=True,
+                                  use_cache=use_cache)
         assert isinstance(ret, tuple)
         assert isinstance(ret[1], bool)
         return ret[1]
 
-    def _set_component_iv(self, component_name: str, iv_name: str, state: typing.Sequence):
-        assert component_name in self._components, f"component with identifier {component_name} not found"
-        component = self.component_instances[component_name]
+    def _set_component_iv(self, component_name: str, iv_name: str, state: typing.Sequence,
+                          components: typing.Optional[typing.Dict[str, Component]] = None):
+        components = self._components if components is None else components
+        assert component_name in components, f"component with identifier {component_name} not found"
+        component = components[component_name]
         assert iv_name in component.initial_values, f"initial value name {iv_name} no found in component {component_name}"
         component.initial_values[iv_name] = state
         for cin, cout in self.connections.items():
             if cout == (component_name, iv_name):
-                self._components[cin[0]].initial_values[cin[1]] = state
+                components[cin[0]].initial_values[cin[1]] = state
 
     def set_component_iv(self, component_name: str, iv_name: str, state: typing.Sequence):
         self._set_component_iv(component_name, iv_name, state)
+        if self._pristine is not None:
+            self._set_component_iv(component_name, iv_name, state, components=self._pristine)
+        # a later value replaces an earlier one, so the changes stay bounded when a system is reused
+        self._iv_changes = [c for c in self._iv_changes if c[:2] != (component_name, iv_name)]
         self._iv_changes.append((component_name, iv_name, state))
 
-    def _set_component_param(self, component_name: str, param_name: str, param: typing.Any):
-        assert component_name in self._components
-        component = self.component_instances[component_name]
+    def _set_component_param(self, component_name: str, param_name: str, param: typing.Any,
+                             components: typing.Optional[typing.Dict[str, Component]] = None):
+        components = self._components if components is None else components
+        assert component_name in components
+        component = components[component_name]
         assert param_name in component.parameters, f"component '{component_name}' has no parameter '{param_name}'"
+        previous = component.parameters[param_name]
         component.parameters[param_name] = param
-        if component.initialize is not None:
+        # initialize again only when the parameter changed and the initializer depends on it
+        depends = component.initialize_parameters is None or param_name in component.initialize_parameters
+        if component.initialize is not None and depends and not _same_value(previous, param):
             component.initialize()
 
     def set_component_param(self, component_name: str, param_name: str, param: typing.Any):
         self._set_component_param(component_name, param_name, param)
+        # as for initial values, a later value replaces an earlier one
+        self._param_changes = [c for c in self._param_changes if c[:2] != (component_name, param_name)]
         self._param_changes.append((component_name, param_name, param))
+        if self._pristine is not None:
+            if self._dirty:
+                self._set_component_param(component_name, param_name, param, components=self._pristine)
+            else:
+                # the components are still as set up, and are copied again at the next reset
+                self._pristine = None
 
-    def reset(self):
-        # create instances of all components mentioned in the composition description
-        self._components: typing.Dict[str, Component] = {k: v() for k, v in self.components.items()}
-        for change in self._iv_changes:
-            self._set_component_iv(*change)
-        for param in self._param_changes:
-            self._set_component_param(*param)
+    def discard_changes(self, setup: typing.Mapping[str, Component]) -> None:
+        """ drop the initial value and parameter changes made to the system, restoring components set up without them
+
+        no initializer runs, so a system is reconfigured for another run at the cost of copying the components
+
+        :param setup: components of a system of this type set up with no changes (e.g. copies of the component
+                        instances of a new system)
+        """
+        assert set(setup) == set(self.components), "components are not of this system"
+        self._iv_changes = []
+        self._param_changes = []
+        self._components = copy.deepcopy(dict(setup))
+        self._pristine = None
+        self._dirty = False
+
+    def reset(self, full: bool = False):
+        """ set the components back to their state after setup (initialized, with the changes made to the system)
+
+        the components are copied once they are set up, and the copies restored on later resets, so initializers
+        (e.g. loading networks) don't run again for every simulation
+
+        :param full: create the components again and replay the changes, instead of restoring the copies
+        """
+        if full or (self._pristine is None and self._dirty):
+            # create instances of all components mentioned in the composition description
+            self._components = {k: v() for k, v in self.components.items()}
+            for change in self._iv_changes:
+                self._set_component_iv(*change)
+            for param in self._param_changes:
+                self._set_component_param(*param)
+            self._pristine = None
+        elif self._dirty:
+            self._components = copy.deepcopy(self._pristine)  # type: ignore
+        if self._pristine is None:
+            self._pristine = copy.deepcopy(self._components)
+        self._dirty = False
 
     def set_state(self, component_name: str, state: typing.Sequence):
         self.set_component_iv(component_name, "states", state)
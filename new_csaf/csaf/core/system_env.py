@@ -3,8 +3,9 @@ CSAF System Environment (implement component flows externally)
 """
 import csaf.core.base as cbase
 from csaf.core.system import ComponentComposition
+from csaf.core.monitor import as_monitor
+from csaf.core.recording import RecordingPolicy
 from csaf.core.scheduler import Scheduler
-from csaf.core.trace import TimeTrace
 import typing
 
 __all__ = ['SystemEnv']
@@ -24,9 +25,16 @@ class SystemEnv(cbase.CsafBase):
 
     agents: typing.Sequence[str]
 
-    def __init__(self, terminating_conditions=None, terminating_conditions_all=None):
+    def __init__(self, terminating_conditions=None, terminating_conditions_all=None,
+                 recording: typing.Optional[RecordingPolicy] = None):
+        """
+        :param recording: components, flows and samples to record in traces (see csaf.core.recording), all when None
+        """
         self.system = self.system_type()
         self.termconds, self.termconds_all = terminating_conditions, terminating_conditions_all
+        self.recording = recording
+        # traces recorded by the current episode
+        self.traces: typing.Dict[str, typing.Any] = {}
         self._iter: typing.Optional[typing.Coroutine] = None
 
     def _set_coroutine(self):
@@ -62,34 +70,43 @@ class SystemEnv(cbase.CsafBase):
         sched = Scheduler(self.system.component_instances, list(self.system.component_instances.keys()) if
                           self.system.priority is None else self.system.priority)
 
-        evts_it = sched.get_scheduler()
+        queue = self.system.event_queue((0.0, None)) if self.system.has_wakeups else None
+        evts_it = sched.get_scheduler() if queue is None else queue
 
         # get time trace fields
         # NOTE: we need dtraces for the terminating_conditions_all
-        dnames = self.system.component_instances.keys()
-        dtraces = {}
-        for dname in dnames:
-            fields = ['times'] + list(self.system.component_instances[dname].flow_names)
-            dtraces[dname] = TimeTrace(fields)
+        dtraces = self.system.create_traces() if self.recording is None else \
+            self.recording.create_traces(self.system.component_instances)
+        self.traces = dtraces
+        monitor = as_monitor(terminating_conditions_all)
+        if monitor is not None:
+            monitor.reset(dtraces)
+        # as in ComponentComposition.simulate_tspan, monitors of crossings only are not updated with samples
+        sample_monitor = monitor if monitor is not None and monitor.per_sample else None
 
         yield None
 
+        out: typing.Any
         try:
             for cname, ctime in evts_it:
                 if cname in self.agents:
                     out  = yield (ctime,
                                   self.system.build_input_vec(cname))  # type: ignore
                     # update the context
-                    r = {(cname, k): v for k, v in out.items()}
-                    self.system._signals_buffer.update(r)
+                    self.system.write_signals(cname, out)
                     self.system._update_times[cname] = ctime
                 else:
                     out = self.system.update_component(cname, ctime)  # type: ignore
+                    if queue is not None:
+                        queue.hold(cname, self.system.wakeup(cname, ctime, out))
                 out["times"] = ctime  # type: ignore
-                dtraces[cname].append(**out)
+                if self.recording is None:
+                    dtraces[cname].append(**out)
+                else:
+                    self.recording.record(dtraces, cname, out)
                 if terminating_conditions is not None and terminating_conditions(cname, out):
                     return
-                if terminating_conditions_all is not None and terminating_conditions_all(dtraces):
+                if sample_monitor is not None and sample_monitor.update(cname, out):  # type: ignore
                     return
         except Exception as exc:
             # FIXME: TODO
@@ -6,11 +6,21 @@ Data Structure for Storing Trajectories (often simulation output)
 import collections
 import csv
 import datetime
+import json
+import os
+import typing
 import warnings
 
 import numpy as np
 
-__all__ = ['TimeTrace']
+from csaf.core.plan import is_numeric
+
+__all__ = ['TimeTrace', 'ColumnarTimeTrace', 'TraceArray', 'save_traces', 'load_traces']
+
+# name of the metadata file of a saved trace directory
+TRACE_META_FILE = 'trace.json'
+
+TRACE_FORMAT_VERSION = 1
 
 
 class Trace(collections.abc.Sequence):
@@ -68,7 +78,18 @@ class Trace(collections.abc.Sequence):
             raise TypeError('Expected int or str.')
 
     def __len__(self):
-        return len(self.data._asdict[self.names[0]])
+        return len(getattr(self.data, self.names[0]))
+
+    def __getstate__(self):
+        # the namedtuple type is created per trace, so it is rebuilt rather than pickled
+        state = self.__dict__.copy()
+        del state['NT'], state['data']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.NT = collections.namedtuple('Variables', self.names)
+        self.data = self.NT(*[getattr(self, name) for name in self.names])
 
     def save(self, filename):
         raise NotImplementedError
@@ -173,3 +194,351 @@ class TimeTrace(Trace):
     @classmethod
     def from_named_tuple(cls, named_tuple):
         raise NotImplementedError
+
+    def save(self, filename, compress: bool = False, dtypes: typing.Optional[typing.Mapping[str, typing.Any]] = None):
+        """ save the trace to a directory of binary columns
+
+        every field is stored in its own .npy file, which load memory maps, with the field layout in trace.json.
+        Fields of strings are stored as fixed width unicode, and other object fields are pickled.
+
+        :param filename: directory to save to (created if missing)
+        :param compress: store each field in a compressed .npz instead (loaded into memory rather than mapped)
+        :param dtypes: field name -> dtype to store the field as (e.g. float32 states)
+        """
+        os.makedirs(filename, exist_ok=True)
+        dtypes = dtypes or {}
+        fields = {}
+        for name in self.names:
+            arr = np.asarray(getattr(self, name))
+            kind = 'numeric'
+            if name in dtypes:
+                arr = arr.astype(dtypes[name])
+            elif arr.dtype == object:
+                if all(isinstance(v, str) for v in arr.flat):
+                    arr, kind = arr.astype(str), 'str'
+                else:
+                    kind = 'object'
+            fname = f"{name}.npz" if compress else f"{name}.npy"
+            if compress:
+                np.savez_compressed(os.path.join(filename, fname), data=arr)
+            else:
+                np.save(os.path.join(filename, fname), arr, allow_pickle=kind == 'object')
+            fields[name] = {'file': fname, 'kind': kind, 'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+
+        # metadata is written last, so a directory with it is complete
+        with open(os.path.join(filename, TRACE_META_FILE), 'w') as f:
+            json.dump({'version': TRACE_FORMAT_VERSION, 'names': list(self.names), 'time_str': self.time_str,
+                       'length': len(self), 'fields': fields}, f)
+
+    @classmethod
+    def load(cls, filename, mmap: bool = True) -> 'ColumnarTimeTrace':
+        """ load a trace saved by save
+
+        :param filename: trace directory
+        :param mmap: memory map the uncompressed numeric fields (read only), so only the accessed parts are read
+        """
+        with open(os.path.join(filename, TRACE_META_FILE)) as f:
+            meta = json.load(f)
+        assert meta['version'] <= TRACE_FORMAT_VERSION, f"unsupported trace format version {meta['version']}"
+        buffers = {}
+        for name in meta['names']:
+            field = meta['fields'][name]
+            path = os.path.join(filename, field['file'])
+            if path.endswith('.npz'):
+                with np.load(path, allow_pickle=field['kind'] == 'object') as z:
+                    arr = z['data']
+            else:
+                arr = np.load(path, mmap_mode='r' if mmap and field['kind'] == 'numeric' else None,
+                              allow_pickle=field['kind'] == 'object')
+            # string fields go back to objects, so they can be appended to with any string
+            buffers[name] = arr.astype(object) if field['kind'] == 'str' else arr
+        return ColumnarTimeTrace.from_buffers(meta['names'], buffers, time_str=meta['time_str'])
+
+
+def save_traces(traces: typing.Mapping[str, TimeTrace], filename, compress: bool = False,
+                dtypes: typing.Optional[typing.Mapping[str, typing.Mapping[str, typing.Any]]] = None) -> None:
+    """ save simulation traces (component name -> trace) to a directory, one trace directory per component
+
+    :param traces: component name -> trace, as returned by simulate_tspan
+    :param filename: directory to save to
+    :param compress: compress the fields
+    :param dtypes: component name -> field name -> dtype to store the field as
+    """
+    os.makedirs(filename, exist_ok=True)
+    for cname, trace in traces.items():
+        trace.save(os.path.join(filename, cname), compress=compress, dtypes=(dtypes or {}).get(cname))
+
+
+def load_traces(filename, mmap: bool = True,
+                components: typing.Optional[typing.Sequence[str]] = None) -> typing.Dict[str, 'ColumnarTimeTrace']:
+    """ load simulation traces saved by save_traces
+
+    :param filename: directory of the traces
+    :param mmap: memory map the fields
+    :param components: names of the components to load (all when None)
+    """
+    if components is None:
+        components = sorted(n for n in os.listdir(filename)
+                            if os.path.exists(os.path.join(filename, n, TRACE_META_FILE)))
+    return {cname: TimeTrace.load(os.path.join(filename, cname), mmap=mmap) for cname in components}
+
+
+class TraceArray(np.ndarray):
+    """
+    Array view of a ColumnarTimeTrace field
+
+    It keeps the list behaviors that trace consumers rely on -- truthiness is non-emptiness, == compares the whole
+    field and index finds the first matching element. Computations on it return plain arrays, and equal compares
+    elementwise.
+    """
+
+    def __bool__(self):
+        return bool(self.item()) if self.ndim == 0 else len(self) > 0
+
+    def __eq__(self, other):
+        if isinstance(other, np.ndarray):
+            other = other.tolist()
+        return self.tolist() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def equal(self, other) -> np.ndarray:
+        """elementwise comparison with other, as == for arrays"""
+        return np.equal(self.view(np.ndarray), other)
+
+    def __array_wrap__(self, obj, context=None, return_scalar=False):
+        arr = obj.view(np.ndarray)
+        return arr[()] if arr.ndim == 0 else arr
+
+    def index(self, value) -> int:
+        """index of the first element equal to value"""
+        for idx, elem in enumerate(self.view(np.ndarray)):
+            if np.array_equal(elem, value):
+                return idx
+        raise ValueError(f"{value} is not in the trace")
+
+    def tolist(self) -> typing.Any:
+        return self.view(np.ndarray).tolist()
+
+
+def message_dtype(message: typing.Type[typing.Tuple]) -> typing.Any:
+    """buffer dtype of a message -- float for all float fields (see csaf.core.plan.is_numeric), else object"""
+    return np.float64 if is_numeric(message) else object
+
+
+class ColumnarTimeTrace(TimeTrace):
+    """
+    Time Trace with Columnar Storage
+
+    Each field is stored in a preallocated 2-D NumPy buffer (1-D for scalar fields like the times) that grows by
+    doubling, and field access returns a zero-copy TraceArray view of the recorded rows. Field shapes and dtypes
+    can be given up front (see for_component); otherwise they are taken from the first appended row, with numeric
+    values stored as float and anything else as object. A field whose rows change shape is demoted to a 1-D
+    object buffer holding the rows.
+
+    With a max_length, the trace is a ring buffer of the last max_length rows. The buffers hold twice as many
+    rows, and the kept rows are moved to the front of new buffers when they are full, so field views stay
+    contiguous. Views of a ring buffer are read-only, and keep the rows they were taken with as it advances.
+    """
+    # number of rows allocated when no capacity is given
+    initial_capacity: int = 64
+
+    def __init__(self, elements_str, init_trace=None, time_str='times',
+                 shapes: typing.Optional[typing.Dict[str, typing.Tuple[int, ...]]] = None,
+                 dtypes: typing.Optional[typing.Dict[str, typing.Any]] = None,
+                 capacity: typing.Optional[int] = None,
+                 max_length: typing.Optional[int] = None):
+        assert max_length is None or max_length > 0, f"max length must be positive (got {max_length})"
+        self.names = tuple(elements_str)
+        self.NT = collections.namedtuple('Variables', self.names)  # type: ignore
+        self.time_str = time_str
+        if time_str not in self.names:
+            raise AssertionError(f'time variable ({time_str}) missing from the time trace: {self.names}')
+
+        self._shapes: typing.Dict[str, typing.Tuple[int, ...]] = {time_str: (), **(shapes or {})}
+        self._dtypes: typing.Dict[str, typing.Any] = {time_str: np.float64, **(dtypes or {})}
+        self._buffers: typing.Dict[str, np.ndarray] = {}
+        self.max_length = max_length
+        self._capacity = max(capacity or self.initial_capacity, 1) if max_length is None else 2 * max_length
+        # recorded rows are [offset, offset + length) of the buffers
+        self._offset = 0
+        self._length = 0
+        # time of the next sample kept at a recording rate, in a simulation (see csaf.core.recording)
+        self.next_record: typing.Optional[float] = None
+
+        if init_trace is not None:
+            columns = [list(c) for c in init_trace]
+            assert (len(set(len(c) for c in columns)) == 1)
+            if max_length is not None:
+                columns = [c[-max_length:] for c in columns]
+            self._capacity = max(len(columns[0]), self._capacity if max_length is not None else 1)
+            for name, column in zip(self.names, columns):
+                dtype = self._dtypes.get(name)
+                if dtype is None:
+                    dtype = np.float64 if np.asarray(column).dtype.kind in 'biuf' else object
+                self._allocate(name, np.shape(column[0]) if name not in self._shapes else self._shapes[name],
+                               dtype)
+                self._set_column(name, column)
+            self._length = len(columns[0])
+
+    @classmethod
+    def for_component(cls, component, capacity: typing.Optional[int] = None,
+                      flows: typing.Optional[typing.Sequence[str]] = None,
+                      max_length: typing.Optional[int] = None) -> 'ColumnarTimeTrace':
+        """ trace of a component's flows, with buffers sized from its message widths
+
+        :param flows: flows to trace (all when None)
+        :param max_length: keep the last max_length rows only
+        """
+        messages = {**dict(component.outputs), "states": component.states}
+        flows = list(component.flow_names) if flows is None else list(flows)
+        return cls(['times'] + flows,
+                   shapes={f: (len(messages[f].__annotations__),) for f in flows},
+                   dtypes={f: message_dtype(messages[f]) for f in flows},
+                   capacity=capacity,
+                   max_length=max_length)
+
+    def _allocate(self, name: str, shape: typing.Tuple[int, ...], dtype: typing.Any) -> None:
+        self._shapes[name], self._dtypes[name] = tuple(shape), dtype
+        self._buffers[name] = np.empty((self._capacity, *shape), dtype=dtype)
+
+    def _set_column(self, name: str, column: typing.Sequence) -> None:
+        try:
+            self._buffers[name][:len(column)] = column
+        except ValueError:
+            self._demote(name)
+            for idx, value in enumerate(column):
+                self._buffers[name][idx] = value
+
+    def _demote(self, name: str) -> None:
+        """store the rows of a field as objects, so they can have any shape"""
+        rows = self._buffers[name][self._offset:self._offset + self._length].tolist()
+        self._allocate(name, (), object)
+        for idx, row in enumerate(rows):
+            self._buffers[name][idx] = row
+
+    @classmethod
+    def from_buffers(cls, elements_str, buffers: typing.Mapping[str, np.ndarray],
+                     time_str='times') -> 'ColumnarTimeTrace':
+        """trace over existing field buffers of the same length (e.g. memory maps), without copying them"""
+        trace = cls(elements_str, time_str=time_str)
+        lengths = {len(b) for b in buffers.values()}
+        assert len(lengths) == 1, "buffers must have the same length"
+        for name in trace.names:
+            buffer = buffers[name]
+            trace._shapes[name], trace._dtypes[name] = buffer.shape[1:], buffer.dtype
+            trace._buffers[name] = buffer
+        trace._length = trace._capacity = lengths.pop()
+        return trace
+
+    def _reallocate(self, capacity: int) -> None:
+        """copy the recorded rows to the front of new buffers of a capacity"""
+        self._capacity = capacity
+        rows = slice(self._offset, self._offset + self._length)
+        for name, buffer in self._buffers.items():
+            moved = np.empty((self._capacity, *buffer.shape[1:]), dtype=buffer.dtype)
+            moved[:self._length] = buffer[rows]
+            self._buffers[name] = moved
+        self._offset = 0
+
+    def _grow(self) -> None:
+        self._reallocate(max(2 * self._capacity, 1))
+
+    def _compact(self) -> None:
+        """move the rows of a ring buffer to the front of new buffers, so views of the old ones are not changed"""
+        self._reallocate(self._capacity)
+
+    def append(self, **kwargs):
+        if len(kwargs) != len(self.names):
+            raise TypeError(f'missing one of required positional arguments: {self.names}')
+
+        n = self._offset + self._length
+        if n == 0 and not self._buffers:
+            for name in self.names:
+                value = kwargs[name]
+                dtype = self._dtypes.get(name)
+                if dtype is None:
+                    dtype = np.float64 if np.asarray(value).dtype.kind in 'biuf' else object
+                self._allocate(name, self._shapes.get(name, np.shape(value)), dtype)
+        elif n == self._capacity:
+            if self.max_length is not None and self._offset > 0:
+                self._compact()
+            else:
+                self._grow()
+            n = self._length
+
+        try:
+            for name in self.names:
+                try:
+                    self._buffers[name][n] = kwargs[name]
+                except ValueError:
+                    if self._shapes[name] == ():
+                        raise
+                    self._demote(name)
+                    self._buffers[name][n] = kwargs[name]
+        except KeyError:
+            raise TypeError(f'missing one of required positional arguments: {self.names}')
+        self._length += 1
+        if self.max_length is not None and self._length > self.max_length:
+            self._offset += 1
+            self._length -= 1
+
+    def truncate(self, length: int) -> None:
+        """keep the first length rows"""
+        assert length >= 0, f"length must be non-negative (got {length})"
+        self._length = min(self._length, length)
+
+    def field(self, name: str) -> TraceArray:
+        """zero-copy view of the recorded rows of a field (read-only for a ring buffer)"""
+        if name not in self._buffers:
+            return np.empty((0, *self._shapes.get(name, ())), dtype=self._dtypes.get(name, object)).view(TraceArray)
+        view = self._buffers[name][self._offset:self._offset + self._length].view(TraceArray)
+        if self.max_length is not None:
+            view.flags.writeable = False
+        return view
+
+    def __getattr__(self, name):
+        # only called when the regular lookup fails -- guard against lookups before the state is set
+        if name in self.__dict__.get('names', ()):
+            return self.field(name)
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    @property
+    def data(self):
+        return self.NT(*[self.field(name) for name in self.names])
+
+    def __getitem__(self, i):
+        if isinstance(i, str):
+            if i not in self.names:
+                raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{i}'")
+            return self.field(i)
+        elif isinstance(i, (int, np.integer)):
+            if not -self._length <= i < self._length:
+                raise IndexError('trace index out of range')
+            return [self.field(n)[i] for n in self.names]
+        else:
+            raise TypeError('Expected int or str.')
+
+    def __len__(self):
+        return self._length
+
+    def __getstate__(self):
+        # only the recorded rows are pickled, the buffers are reallocated to their capacity on unpickling
+        state = {k: v for k, v in self.__dict__.items() if k != 'NT'}
+        rows = slice(self._offset, self._offset + self._length)
+        state['_buffers'] = {name: b[rows].copy() for name, b in self._buffers.items()}
+        state['_offset'] = 0
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('_offset', 0)
+        state.setdefault('max_length', None)
+        state.setdefault('next_record', None)
+        buffers = state.pop('_buffers')
+        self.__dict__.update(state)
+        self.NT = collections.namedtuple('Variables', self.names)
+        self._buffers = {}
+        for name, rows in buffers.items():
+            self._buffers[name] = np.empty((self._capacity, *rows.shape[1:]), dtype=rows.dtype)
+            self._buffers[name][:len(rows)] = rows
@@ -1,8 +1,17 @@
 from csaf.core.base import CsafBase
+from csaf.core.events import ZeroCrossing
+from csaf.core.monitor import Monitor
 from csaf.core.system import System
 from csaf.core.trace import TimeTrace
+import copy
+import itertools
+import multiprocessing
+import queue
+import time
 import typing
 
+import numpy as np
+
 
 class Scenario(CsafBase):
     """
@@ -20,7 +29,16 @@ class Scenario(CsafBase):
     bounds: typing.Optional[typing.Sequence[typing.Tuple[float, float]]] = None
 
     def generate_system(self, conf: typing.Sequence) -> System:
-        return self.system_type()
+        """new system of a configuration"""
+        return self.configure_system(self.system_type(), conf)
+
+    def configure_system(self, system: System, conf: typing.Sequence) -> System:
+        """ apply a configuration to a system of system_type with no changes made to it
+
+        scenarios override this rather than generate_system, so a system can be reused for many configurations
+        (e.g. by sweeps)
+        """
+        return system
 
 
 class Goal(CsafBase):
@@ -60,7 +78,11 @@ class SimGoal(Goal):
     """
     terminating_conditions: typing.Optional[typing.Callable[[], bool]] = None
 
-    terminating_conditions_all: typing.Optional[typing.Callable[[TimeTrace], bool]] = None
+    # a monitor is copied for every simulation, so runs (and goal instances) don't share its state
+    terminating_conditions_all: typing.Optional[typing.Union[Monitor, typing.Callable[[TimeTrace], bool]]] = None
+
+    # guards whose crossings are located within the simulation steps
+    zero_crossings: typing.Sequence[ZeroCrossing] = ()
 
     sim_kwargs: typing.Dict[str, typing.Any] = {}
 
@@ -68,13 +90,18 @@ class SimGoal(Goal):
 
     @classmethod
     def run_sim(cls, conf: typing.Sequence, timespan=None):
+        """simulate a configuration (served by the result cache when enabled, unless sim_kwargs has use_cache=False)"""
         if timespan is None:
             timespan = cls.tspan
         sys = cls.scenario_type().generate_system(conf)
+        condition = cls.terminating_conditions_all
+        if isinstance(condition, Monitor):
+            condition = copy.deepcopy(condition)
         return sys.simulate_tspan(timespan,
                                   terminating_conditions=cls.terminating_conditions,
-                                  terminating_conditions_all=cls.terminating_conditions_all,
+                                  terminating_conditions_all=condition,
                                   return_passed=True,
+                                  zero_crossings=cls.zero_crossings,
                                   **cls.sim_kwargs)
 
 
@@ -97,22 +124,148 @@ class FixedSimGoal(SimGoal):
         return True
 
 
+# goal evaluated by a BOptFalsifyGoal worker process
+_worker_goal: typing.Any = None
+
+
+def _init_goal_worker(goal: 'BOptFalsifyGoal') -> None:
+    global _worker_goal
+    _worker_goal = goal
+
+
+def _evaluate_configuration(conf: typing.Sequence) -> float:
+    return float(_worker_goal.objective_function_single(conf))
+
+
+class _GoalObjective:
+    """GPyOpt objective evaluating the configurations of a batch over the goal's worker pool"""
+
+    def __init__(self, goal: 'BOptFalsifyGoal'):
+        self.goal = goal
+
+    def evaluate(self, x):
+        start = time.time()
+        pool = self.goal._pool
+        if pool is None:
+            f_evals = np.reshape(self.goal.objective_function(x), (-1, 1))
+        else:
+            f_evals = np.reshape(pool.map(_evaluate_configuration, list(x)), (-1, 1))
+        # GPyOpt cost model, the batch is evaluated at once
+        return f_evals, [time.time() - start] * len(f_evals)
+
+
+def _estimate_lipschitz(model, bounds: typing.Sequence[typing.Tuple[float, float]]) -> float:
+    """Lipschitz constant of a GP model mean, maximizing the norm of its gradient"""
+    import scipy.optimize  # type: ignore
+
+    def neg_grad_norm(x):
+        dmdx, _ = model.predictive_gradients(np.atleast_2d(x))
+        return -np.sqrt((dmdx * dmdx).sum(axis=1)).ravel()
+
+    bounds_arr = np.array(bounds, dtype=float)
+    samples = np.random.uniform(bounds_arr[:, 0], bounds_arr[:, 1], (500, len(bounds_arr)))
+    samples = np.vstack((samples, model.X))
+    x0 = samples[np.argmin(neg_grad_norm(samples))]
+    res = scipy.optimize.minimize(lambda x: float(neg_grad_norm(x)[0]), x0, method='L-BFGS-B', bounds=bounds_arr,
+                                  options={'maxiter': 200})
+    lipschitz = -float(res.fun)
+    # a flat model would not penalize at all
+    return lipschitz if lipschitz >= 1E-7 else 10.0
+
+
+class _LocalPenalization:
+    """ GPyOpt batch evaluator by local penalization of the acquisition (Gonzalez et al., 2016)
+
+    configurations of the batch are suggested one at a time, penalizing the acquisition around the configurations
+    already in the batch and the pending ones (still being evaluated)
+    """
+
+    def __init__(self, acquisition, batch_size: int):
+        self.acquisition = acquisition
+        self.batch_size = batch_size
+        # configurations being evaluated, penalized when no others are given to compute_batch
+        self.pending: typing.Optional[np.ndarray] = None
+
+    def compute_batch(self, duplicate_manager=None, context_manager=None, pending=None):
+        acquisition = self.acquisition
+        if pending is None:
+            pending = self.pending
+        penalized = None if pending is None or len(pending) == 0 else np.atleast_2d(pending)
+        lipschitz: typing.Optional[float] = None
+        batch = []
+        try:
+            for _ in range(self.batch_size):
+                if penalized is None:
+                    acquisition.update_batches(None, None, None)
+                else:
+                    if lipschitz is None:
+                        lipschitz = _estimate_lipschitz(acquisition.model.model, acquisition.space.get_bounds())
+                    acquisition.update_batches(penalized, lipschitz, acquisition.model.model.Y.min())
+                x = acquisition.optimize()[0]
+                batch.append(x)
+                penalized = x if penalized is None else np.vstack((penalized, x))
+        finally:
+            acquisition.update_batches(None, None, None)
+        return np.vstack(batch)
+
+
 class BOptFalsifyGoal(SimGoal):
+    """
+    Falsify a property by minimizing an objective over the configuration space with Bayesian optimization
+
+    Every iteration suggests batch_size configurations, chosen by local penalization of the acquisition or by
+    Thompson sampling of the model (batch_method), and simulates them concurrently on a pool of processes. In
+    asynchronous mode a new configuration is suggested as soon as a simulation completes, penalizing (or Thompson
+    sampling around) the configurations still being simulated, so no worker waits on the slowest run of a batch.
+
+    Workers are started with the mp_context start method. With "fork" (the default on Linux), goal types generated
+    at runtime don't need to be picklable.
+    """
+    # number of iterations, each evaluating batch_size configurations (asynchronous mode stops after as many
+    # evaluations)
     max_iter = 500
     max_time = 120.0
+    # the optimization stops when two consecutive suggestions are within this distance
     tolerance = 5.0
 
+    # seconds to wait for a simulation to complete in asynchronous mode, before assuming its worker died
+    evaluation_timeout: typing.Optional[float] = 600.0
+
+    # number of configurations suggested per iteration
+    batch_size = 1
+
+    # batch acquisition, "local_penalization" or "thompson"
+    batch_methods = ("local_penalization", "thompson")
+    batch_method = "local_penalization"
+
+    # number of concurrent simulations (batch_size when None, 1 evaluates in process)
+    processes: typing.Optional[int] = None
+
+    # suggest a new configuration whenever a worker is free, rather than a batch at a time
+    asynchronous = False
+
+    # multiprocessing start method (platform default when None)
+    mp_context: typing.Optional[str] = None
+
     constraints: typing.Sequence[typing.Dict] = tuple()
 
     @staticmethod
     def property(ctraces: TimeTrace) -> bool:
         pass
 
-    def objective_function(self, conf: typing.Sequence):
-        pass
+    def objective_function_single(self, conf: typing.Sequence) -> float:
+        """obj: configuration space -> real number"""
+        raise NotImplementedError
+
+    def objective_function(self, x):
+        """GPyOpt Objective"""
+        return np.array([self.objective_function_single(xi) for xi in x])
+
+    def workers(self) -> int:
+        """number of concurrent simulations"""
+        return self.processes if self.processes is not None else self.batch_size
 
     def gen_optimizer(self):
-        import numpy as np
         import GPy  # type: ignore
         import GPyOpt  # type: ignore
 
@@ -134,7 +287,7 @@ class BOptFalsifyGoal(SimGoal):
         #    initial_design))
 
         # get GPyOpt objective from function
-        objective = GPyOpt.core.task.SingleObjective(self.objective_function)
+        objective = _GoalObjective(self)
 
         # custom kernel!
         # we know that the relative heading angle is periodic, so we can set and fix it
@@ -158,8 +311,15 @@ class BOptFalsifyGoal(SimGoal):
         # get the type of acquisition
         acquisition = GPyOpt.acquisitions.AcquisitionEI(model, feasible_region, optimizer=aquisition_optimizer)
 
-        # get the collection method
-        evaluator = GPyOpt.core.evaluators.Sequential(acquisition)
+        # get the collection method (asynchronous mode suggests one configuration at a time)
+        batch_size = 1 if self.asynchronous else self.batch_size
+        if self.batch_method == "thompson":
+            evaluator = GPyOpt.core.evaluators.ThompsonBatch(acquisition, batch_size)
+        elif batch_size > 1 or self.asynchronous:
+            acquisition = GPyOpt.acquisitions.AcquisitionLP(model, feasible_region, aquisition_optimizer, acquisition)
+            evaluator = _LocalPenalization(acquisition, batch_size)
+        else:
+            evaluator = GPyOpt.core.evaluators.Sequential(acquisition)
 
         # get a cost model from the cost func
         cost = None  # GPyOpt.core.task.cost.CostModel(self.cost_func)
@@ -174,12 +334,110 @@ class BOptFalsifyGoal(SimGoal):
                                                           cost=cost)
 
     def __init__(self):
+        self._pool: typing.Optional[typing.Any] = None
         self.optimizer = self.gen_optimizer()
 
+    def validate(self) -> None:
+        super().validate()
+        assert self.batch_method in self.batch_methods, \
+            f"batch method {self.batch_method} must be one of {self.batch_methods}"
+        assert self.batch_size >= 1, f"batch size must be at least 1 (got {self.batch_size})"
+        assert self.workers() >= 1, f"number of processes must be at least 1 (got {self.workers()})"
+
+    def suggest(self, pending: typing.Optional[np.ndarray] = None) -> np.ndarray:
+        """ next configuration to evaluate, given the evaluated configurations of the optimizer
+
+        :param pending: configurations being evaluated, that the suggestion should stay away from
+        """
+        bo = self.optimizer
+        # Thompson samples differ between suggestions already
+        evaluator = bo.evaluator if isinstance(bo.evaluator, _LocalPenalization) else None
+        if evaluator is not None:
+            evaluator.pending = pending
+        try:
+            return bo.suggest_next_locations(pending_X=pending)[0]
+        finally:
+            if evaluator is not None:
+                evaluator.pending = None
+
+    def best_configuration(self) -> typing.List[float]:
+        """evaluated configuration with the lowest objective"""
+        bo = self.optimizer
+        return bo.X[int(np.argmin(bo.Y))].tolist()
+
+    def run_asynchronous(self) -> None:
+        """ run the optimization, keeping every worker busy with a suggested configuration
+
+        suggestions stop after max_iter * batch_size evaluations, after max_time, or once a suggestion is within
+        tolerance of the previous one
+        """
+        bo = self.optimizer
+        start = time.time()
+        done: queue.Queue = queue.Queue()
+        pending: typing.Dict[int, typing.Any] = {}
+        keys = itertools.count()
+        nsubmitted = 0
+
+        def submit(x: np.ndarray) -> None:
+            key = next(keys)
+            pending[key] = x
+            self._pool.apply_async(_evaluate_configuration, (x,),  # type: ignore
+                                   callback=lambda y: done.put((key, y)),
+                                   error_callback=lambda e: done.put((key, e)))
+
+        # the initial design is evaluated by the workers too, so a dead worker can't block it
+        initial: typing.List[np.ndarray] = []
+        if bo.Y is None:
+            initial, bo.X = list(bo.X), bo.X[:0]
+            bo.Y = np.empty((0, 1))
+        previous: typing.Optional[np.ndarray] = None
+        converged = False
+        while True:
+            while initial and len(pending) < self.workers():
+                submit(initial.pop(0))
+            # suggestions need an evaluated configuration to fit the model
+            while len(bo.Y) > 0 and not initial and len(pending) < self.workers() and not converged \
+                    and nsubmitted < self.max_iter * self.batch_size and time.time() - start < self.max_time:
+                x = self.suggest(np.array(list(pending.values())) if pending else None)
+                converged = previous is not None and float(np.linalg.norm(x - previous)) <= self.tolerance
+                previous = x
+                submit(x)
+                nsubmitted += 1
+            if not pending:
+                break
+            try:
+                key, y = done.get(timeout=self.evaluation_timeout)
+            except queue.Empty:
+                raise TimeoutError(f"no simulation completed within {self.evaluation_timeout} s "
+                                   f"(a worker may have died)") from None
+            x = pending.pop(key)
+            if isinstance(y, BaseException):
+                raise y
+            bo.X = np.vstack((bo.X, x))
+            bo.Y = np.vstack((bo.Y, [[y]]))
+
     def test_goal(self) -> bool:
-        self.optimizer.run_optimization(max_iter=self.max_iter,
-                                        max_time=self.max_time,
-                                        eps=self.tolerance,
-                                        verbosity=False)
-        t, p = self.run_sim(self.optimizer.x_opt)
+        if self.workers() > 1 or self.asynchronous:
+            ctx = multiprocessing.get_context(self.mp_context)
+            self._pool = ctx.Pool(self.workers(), initializer=_init_goal_worker, initargs=(self,))
+        completed = False
+        try:
+            if self.asynchronous:
+                self.run_asynchronous()
+            else:
+                self.optimizer.run_optimization(max_iter=self.max_iter,
+                                                max_time=self.max_time,
+                                                eps=self.tolerance,
+                                                verbosity=False)
+            completed = True
+        finally:
+            if self._pool is not None:
+                # simulations still running after a failure are stopped
+                if completed:
+                    self._pool.close()
+                else:
+                    self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+        t, p = self.run_sim(self.best_configuration())
         return self.property(t)
@@ -1,7 +1,10 @@
 from f16lib.components import f16_xequil
 from f16lib.systems import F16AcasShieldIntruderBalloon, F16AcasIntruderBalloon
 import csaf
+from csaf.core.events import ZeroCrossing
+from csaf.core.monitor import SeparationMonitor
 from csaf.test.scenario import Scenario, BOptFalsifyGoal, FixedSimGoal
+import functools
 import typing
 import numpy as np
 
@@ -27,6 +30,26 @@ def collision_condition(ctraces: csaf.TimeTrace) -> bool:
     return False
 
 
+def collision_monitor() -> SeparationMonitor:
+    """
+    air collision condition, as a monitor that only looks at the new samples
+    """
+    return SeparationMonitor("plant", ["intruder_plant", "balloon"], 400.0, indices=slice(9, 12))
+
+
+def separation(own: typing.Sequence[float], other: typing.Sequence[float], threshold: float = 400.0) -> float:
+    """separation between two aircraft states, less a threshold"""
+    return float(np.linalg.norm(np.array(own[9:12]) - np.array(other[9:12]))) - threshold
+
+
+def collision_crossings(threshold: float = 400.0) -> typing.List[ZeroCrossing]:
+    """
+    air collision condition, as the separations from the ownship crossing a threshold
+    """
+    return [ZeroCrossing(("plant", other), functools.partial(separation, threshold=threshold), direction=-1,
+                         name=f"collision_{other}") for other in ("intruder_plant", "balloon")]
+
+
 class AcasScenarioCoord(typing.NamedTuple):
     rel_pos_x: float
     rel_pos_y: float
@@ -100,15 +123,14 @@ def generate_acas_scenario(
 
             return ownship_states, intruder_states, balloon_states
 
-        def generate_system(self, conf: typing.Sequence) -> csaf.System:
-            """create a system from the relative coordinates coord"""
+        def configure_system(self, sys: csaf.System, conf: typing.Sequence) -> csaf.System:
+            """configure a system from the relative coordinates coord"""
             iwaypoints = [(*conf[:2], altitude), ] + list(intruder_waypoints)
             if "predictor" in self.system_type.components:
                 import f16lib.models.predictor as predictor
                 c: typing.Dict[str, typing.Type[csaf.Component]] = self.system_type.components
                 c["predictor"].flows["outputs"] = predictor.model_output
                 c["predictor"].initialize = predictor.model_init
-            sys = self.system_type()
             ownship, intruder, balloon = self.rel_to_abs(conf)
             sys.set_component_param("intruder_autopilot", "waypoints", iwaypoints)
             sys.set_component_param("waypoint", "waypoints", own_waypoints)
@@ -132,7 +154,7 @@ def generate_acas_goal(scen_type: typing.Type[Scenario]) -> typing.Type[BOptFals
     class _AcasFalsifyGoal(BOptFalsifyGoal):
         scenario_type = scen_type
 
-        terminating_conditions_all = collision_condition
+        terminating_conditions_all = collision_monitor()
 
         tspan = (0.0, 30.0)
 
@@ -172,11 +194,6 @@ def generate_acas_goal(scen_type: typing.Type[Scenario]) -> typing.Type[BOptFals
             # geometric mean of min dists
             return np.sqrt(min(dists) * min(bdists))
 
-        def objective_function(self, x) -> np.ndarray:
-            """GPyOpt Objective"""
-            ret = np.array([self.objective_function_single(xi) for xi in x])
-            return ret
-
     return _AcasFalsifyGoal
 
 
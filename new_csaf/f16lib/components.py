@@ -6,6 +6,7 @@ import f16lib.models.autoaltitude as autoalt
 import f16lib.models.autowaypoint as awaypoint
 import f16lib.models.switch as switch
 import f16lib.models.autoacas as acas
+import f16lib.models.acasxu as acasxu
 import f16lib.models.monitor_ap as monitor
 import f16lib.models.acas_switch as aswitch
 import f16lib.models.dummy_predictor as predictor
@@ -73,7 +74,9 @@ class F16PlantComponent(ContinuousComponent):
         "clt_mult": 1,
         "cmt_mult": 1,
         "cnt_mult": 1,
-        "model": "morelli"
+        "model": "morelli",
+        # use the nopython compiled state derivative
+        "compiled": False
     }
     inputs = (
         ("inputs", F16ControllerOutputMessage),
@@ -90,6 +93,8 @@ class F16PlantComponent(ContinuousComponent):
         "outputs": f16.model_output,
         "states": f16.model_state_update
     }
+    initialize = f16.model_init
+    is_vectorized = True
 
 
 class F16LlcComponent(ContinuousComponent):
@@ -126,6 +131,8 @@ class F16LlcComponent(ContinuousComponent):
         "states": llc.model_state_update
     }
     initialize = llc.model_init
+    initialize_parameters: typing.Collection[str] = ("lqr_name",)
+    is_vectorized = True
 
 
 class F16NNLlcComponent(F16LlcComponent):
@@ -135,6 +142,8 @@ class F16NNLlcComponent(F16LlcComponent):
         "states": nnllc.model_state_update
     }
     initialize = nnllc.model_init
+    initialize_parameters = ()
+    model_files = (nnllc.Model.default_np_model_path,)
 
 
 class F16AutopilotComponent(DiscreteComponent):
@@ -235,6 +244,7 @@ class F16MonitorComponent(DiscreteComponent):
     flows = {
         "outputs": monitor.model_output
     }
+    is_pure = True
 
 
 class F16SwitchComponent(DiscreteComponent):
@@ -263,6 +273,7 @@ class F16SwitchComponent(DiscreteComponent):
     flows = {
         "outputs": switch.model_output
     }
+    is_pure = True
 
 
 def create_collision_predictor(nagents: int) -> typing.Type[DiscreteComponent]:
@@ -271,7 +282,12 @@ def create_collision_predictor(nagents: int) -> typing.Type[DiscreteComponent]:
         sampling_frequency = 10.0
         default_parameters: typing.Dict[str, typing.Any] = {
             "intruder_waypoints" : ((0.0, 0.0, 1000.0),),
-            "own_waypoints" : ((0.0, 0.0, 1000.0),)
+            "own_waypoints" : ((0.0, 0.0, 1000.0),),
+            # GP training mode ("full" or "windowed", see CollisionPredictor) and window length (samples)
+            "mode": "full",
+            "window": 100,
+            # ownship prediction model ("surrogate" or "kinematic", see CollisionPredictor)
+            "ownship_model": "surrogate"
         }
         inputs = (
             ("inputs_own", F16PlantStateMessage),
@@ -290,6 +306,7 @@ def create_collision_predictor(nagents: int) -> typing.Type[DiscreteComponent]:
             "outputs": predictor.model_output
         }
         initialize = predictor.model_init
+        initialize_parameters = ("intruder_waypoints", "own_waypoints", "mode", "window", "ownship_model")
 
     return _F16CollisionPredictor
 
@@ -301,6 +318,10 @@ def create_nagents_acas_xu(nagents: int) -> typing.Type[DiscreteComponent]:
         default_parameters = {
             "roll_rates": (0, -1.5, 1.5, -3.0, 3.0),
             "gains": "nominal",
+            # network evaluation backend ("onnx" or "numpy")
+            "nn_backend": "onnx",
+            # hold the reference commands between network evaluations, skipping the samples in between
+            "hold_reference": False,
             "setpoint": 2500.0,
             "xequil": [502.0, 0.03887505597600522, 0.0, 0.0, 0.03887505597600522, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1000.0,
                        9.05666543872074]
@@ -323,6 +344,9 @@ def create_nagents_acas_xu(nagents: int) -> typing.Type[DiscreteComponent]:
             "states": acas.model_state_update
         }
         initialize = acas.model_init
+        initialize_parameters = ("roll_rates", "gains", "nn_backend")
+        wakeup = acas.model_wakeup
+        model_files = (*acasxu.network_filenames("onnx"), *acasxu.network_filenames("numpy"))
 
     return _F16AcasComponent
 
@@ -371,6 +395,7 @@ class F16AcasRecoverySwitchComponent(DiscreteComponent):
         "outputs_state": aswitch.model_output_state
     }
     initialize = None
+    is_pure = True
 
 
 class F16CollisionPredictor(DiscreteComponent):
@@ -432,6 +457,8 @@ class StaticObject(DiscreteComponent):
     flows = {
         "states": lambda m, t, s, i: s
     }
+    is_vectorized = True
+    is_pure = True
 
 
 class F16AcasSwitchComponent(DiscreteComponent):
@@ -460,3 +487,4 @@ class F16AcasSwitchComponent(DiscreteComponent):
         "outputs": switch_model_output,
         "outputs_state": switch_model_state
     }
+    is_pure = True
@@ -115,7 +115,7 @@ AcasNoBalloonAirspeedFalsifyGoal = f16a.generate_acas_goal(AcasNoBalloonAirspeed
 
 class FixedSimAcasGoal(FixedSimGoal):
     """class with defaults for f16 acas fixed simulation goals"""
-    terminating_conditions_all = f16a.collision_condition
+    terminating_conditions_all = f16a.collision_monitor()
 
     tspan = (0.0, 30.0)
 
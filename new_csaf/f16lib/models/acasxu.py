@@ -6,16 +6,17 @@ with support for multiple aircraft
 
 taken from https://github.com/stanleybak/AeroBenchVVPython
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import copy
 import os
+import threading
 from math import pi, atan2, sqrt, sin, cos, asin
 
 import numpy as np
 
-import onnxruntime as ort  # type: ignore
-
 from f16lib.models.helpers.aerobench_helpers import *
+from f16lib.models.helpers.acasxu_nn import NumpyNetwork
 
 
 def get_script_path(script_filename):
@@ -30,14 +31,22 @@ class AcasXuAutopilot():
     '''AcasXu autopilot'''
 
     def __init__(self, init, num_aircraft_acasxu=1, stop_on_coc=False,
-                 hardcoded_u_seq=None, stdout=False, roll_rates=(0.0, -1.5, 1.5, -3.0, 3.0)):
-        'waypoints is a list of 3-tuples'
+                 hardcoded_u_seq=None, stdout=False, roll_rates=(0.0, -1.5, 1.5, -3.0, 3.0), batched=True,
+                 backend="onnx"):
+        '''waypoints is a list of 3-tuples
+
+        batched: evaluate all aircraft pairs at an update together, with one network call per previous advisory
+        backend: evaluate the networks with "onnx" (onnxruntime) or "numpy"
+        '''
 
         self.roll_rates = roll_rates
+        self.batched = batched
 
         init = np.array(init, dtype=float)
 
-        self.nets = load_networks()
+        self.backend = backend
+        self._nets = load_networks(backend)
+        self._nets_generation = _sessions_generation
 
         self.stop_on_coc = stop_on_coc
         self.coc_time = None
@@ -119,6 +128,23 @@ class AcasXuAutopilot():
         self.mode = mode
         # Autopilot.__init__(self, mode, llc=llc)
 
+    def __deepcopy__(self, memo):
+        '''copy the autopilot state, sharing the networks (they are read-only, and sessions can't be copied)'''
+        memo[id(self._nets)] = self._nets
+        result = self.__class__.__new__(self.__class__)
+        memo[id(self)] = result
+        for k, v in self.__dict__.items():
+            setattr(result, k, copy.deepcopy(v, memo))
+        return result
+
+    @property
+    def nets(self):
+        'the networks, loaded again when the session cache was cleared'
+        if self._nets_generation != _sessions_generation:
+            self._nets = load_networks(self.backend)
+            self._nets_generation = _sessions_generation
+        return self._nets
+
     def is_finished(self, t, x_f16):
         'is the maneuver done?'
 
@@ -169,6 +195,10 @@ class AcasXuAutopilot():
 
                 # print("--------------------")
 
+                if self.batched:
+                    # this updates self.all_acasxu_commands for all pairs
+                    self.update_nn_commands(t, x_f16)
+
                 for a in range(self.num_aircraft_acasxu):
                     ownship_state = x_f16[a * self.num_vars:(a + 1) * self.num_vars]
 
@@ -191,8 +221,9 @@ class AcasXuAutopilot():
 
                         intruder_state = x_f16[b * self.num_vars:(b + 1) * self.num_vars]
 
-                        # this updates self.all_acasxu_commands[a][b]
-                        self.update_nn_command(t, a, ownship_state, b, intruder_state, stdout=stdout)
+                        if not self.batched:
+                            # this updates self.all_acasxu_commands[a][b]
+                            self.update_nn_command(t, a, ownship_state, b, intruder_state, stdout=stdout)
                         c = self.all_acasxu_commands[a][b]
 
                         # run acas xu on the intruder
@@ -305,6 +336,31 @@ class AcasXuAutopilot():
             if stdout:
                 print(f"Unscaled network output ({self.labels[c]}): {res}")
 
+    def update_nn_commands(self, t, x_f16):
+        '''
+        updates self.all_acasxu_commands for every (ownship, intruder) pair
+
+        the network inputs of all pairs are computed and scaled together, and the pairs are grouped by their
+        previous command, so each network is run once on its group
+        '''
+
+        states = np.reshape(np.asarray(x_f16, dtype=float), (self.num_aircraft, self.num_vars))
+        own, intr = np.array([(a, b) for a in range(self.num_aircraft_acasxu)
+                              for b in range(self.num_aircraft) if a != b], dtype=int).reshape(-1, 2).T
+
+        if len(own) == 0:
+            return
+
+        data_in = get_network_inputs(states[own], states[intr])
+        last_commands = np.array([self.all_acasxu_commands[a][b] for a, b in zip(own, intr)], dtype=int)
+
+        commands = np.zeros(len(own), dtype=int)
+        in_range = data_in[:, 0] <= 60760
+        commands[in_range] = run_networks_grouped(self.nets, last_commands[in_range], data_in[in_range])
+
+        for a, b, c in zip(own, intr, commands):
+            self.all_acasxu_commands[a][b] = int(c)
+
     def get_u_ref(self, t, x_f16):
         '''get the reference input signals'''
 
@@ -601,6 +657,38 @@ def make_intruder_waypoints(init, num_vars, hypot=1e5):
     return rv
 
 
+def wrap_to_pi_array(psi_rad):
+    '''handle angle wrapping of an array
+
+    returns equivelent angles in range [-pi, pi]
+    '''
+
+    rv = np.mod(psi_rad, 2.0 * pi)
+    rv[rv >= pi] -= 2.0 * pi
+
+    return rv
+
+
+def get_network_inputs(ownship_states, intruder_states):
+    '''network inputs (rho, theta, psi, v_own, v_int) of (N, num_vars) ownship and intruder states
+
+    returns an (N, 5) array
+    '''
+
+    heading1 = wrap_to_pi_array(-ownship_states[:, StateIndex.PSI] + pi / 2)
+    heading2 = wrap_to_pi_array(-intruder_states[:, StateIndex.PSI] + pi / 2)
+
+    dx = intruder_states[:, StateIndex.POS_E] - ownship_states[:, StateIndex.POS_E]
+    dy = intruder_states[:, StateIndex.POS_N] - ownship_states[:, StateIndex.POS_N]
+
+    rho = np.sqrt(dx ** 2 + dy ** 2)
+    theta = wrap_to_pi_array(np.arctan2(dy, dx) - heading1)
+    psi = wrap_to_pi_array(heading2 - heading1)
+
+    return np.stack([rho, theta, psi, ownship_states[:, StateIndex.VEL], intruder_states[:, StateIndex.VEL]],
+                    axis=1)
+
+
 def predict_with_onnxruntime(sess, input_tensor):
     'run with onnx network with single input and single output'
 
@@ -615,6 +703,67 @@ def predict_with_onnxruntime(sess, input_tensor):
     return res[0]
 
 
+def predict_batch(net, inputs):
+    'run an onnxruntime session or a NumpyNetwork on a batch of (N, 5) inputs, returning an (N, 5) array'
+
+    if isinstance(net, NumpyNetwork):
+        return net.predict(inputs)
+
+    return predict_batch_with_onnxruntime(net, inputs)
+
+
+def predict_batch_with_onnxruntime(sess, inputs):
+    '''run an onnx network with single input and single output on a batch of (N, 5) inputs
+
+    returns an (N, 5) array. Networks exported with a fixed batch size of one are run once per row.
+    '''
+
+    input_shape = sess.get_inputs()[0].shape
+
+    if isinstance(input_shape[0], int) and input_shape[0] == 1:
+        return np.concatenate([predict_with_onnxruntime(sess, row.reshape(input_shape)) for row in inputs])
+
+    return predict_with_onnxruntime(sess, inputs.reshape(len(inputs), *input_shape[1:]))
+
+
+ACASXU_INPUT_RANGES = np.array([[0, 60760], [-pi, pi], [-pi, pi], [100, 1200], [0, 1200]])
+
+ACASXU_MEANS_FOR_SCALING = np.array([19791.091, 0.0, 0.0, 650.0, 600.0])
+
+ACASXU_RANGE_FOR_SCALING = np.array([60261.0, 6.28318530718, 6.28318530718, 1100.0, 1200.0])
+
+
+def scale_inputs(data_in):
+    'check the ranges of (N, 5) network inputs, and return the scaled inputs as float32'
+
+    low, high = ACASXU_INPUT_RANGES[:, 0] - 1e-6, ACASXU_INPUT_RANGES[:, 1] + 1e-6
+    bad = np.logical_or(data_in < low, data_in > high)
+
+    if np.any(bad):
+        row, i = np.argwhere(bad)[0]
+        raise AssertionError(f"acasxu neural network input {i} ({data_in[row, i]}) not in range "
+                             f"{list(ACASXU_INPUT_RANGES[i])}")
+
+    return ((data_in - ACASXU_MEANS_FOR_SCALING) / ACASXU_RANGE_FOR_SCALING).astype(np.float32)
+
+
+def run_networks_grouped(nets, last_commands, data_in):
+    '''run the networks selected by last_commands on the (N, 5) unscaled inputs
+
+    inputs are grouped by previous command, so each network is run once on its group. Returns the (N,) commands.
+    '''
+
+    scaled = scale_inputs(data_in)
+    commands = np.zeros(len(data_in), dtype=int)
+
+    for last_command in np.unique(last_commands):
+        idx = np.flatnonzero(last_commands == last_command)
+        res = predict_batch(nets[last_command], scaled[idx])
+        commands[idx] = np.argmin(res, axis=1)
+
+    return commands
+
+
 def scale_and_run_network(sess, data_in, stdout):
     'scale inputs and run network'
 
@@ -634,22 +783,135 @@ def scale_and_run_network(sess, data_in, stdout):
         print(f"scaled inputs: {data_in}")
 
     data_in = np.array(data_in, dtype=np.float32)
-    data_in.shape = (1, 1, 1, 5)
+    data_in.shape = (1, 5)
 
-    return predict_with_onnxruntime(sess, data_in)
+    return predict_batch(sess, data_in)
 
 
-def load_networks():
-    'load 5 neural networks and return a list'
+# default options of the onnxruntime sessions created by get_session, for the whole process (see
+# set_session_options)
+session_options = {
+    # threads used within an operator (0 lets onnxruntime decide)
+    "intra_op_num_threads": 0,
+    # onnxruntime.GraphOptimizationLevel name
+    "graph_optimization_level": "ORT_ENABLE_ALL",
+    # directory to store the optimized models in, and to load them from on later startups
+    "optimized_model_dir": None
+}
 
-    nets = []
+# process wide sessions (and NumpyNetworks), keyed by model filename and session options
+_sessions: Dict[Tuple, Any] = {}
+_sessions_lock = threading.Lock()
+# incremented when the cache is cleared, so autopilots load their networks again
+_sessions_generation = 0
+
+
+def set_session_options(**options):
+    '''update the default options of the sessions created from now on (cached sessions with other options are kept)
+
+    the defaults are process wide, and seen by every later caller; pass options to load_networks to only change
+    the sessions it returns
+    '''
+
+    for name in options:
+        assert name in session_options, f"unknown session option {name}"
+
+    session_options.update(options)
+
+
+def clear_session_cache():
+    'drop the cached sessions (existing autopilots load their networks again on their next use)'
+
+    global _sessions_generation
+
+    with _sessions_lock:
+        _sessions.clear()
+        _sessions_generation += 1
+
+
+def create_session(filename, intra_op_num_threads, graph_optimization_level, optimized_model_dir):
+    'create an onnxruntime session for a model file'
+
+    # onnxruntime is only imported when the onnx backend is used
+    import onnxruntime as ort  # type: ignore
+
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = intra_op_num_threads
+    opts.graph_optimization_level = getattr(ort.GraphOptimizationLevel, graph_optimization_level)
+
+    if optimized_model_dir is not None:
+        optimized_filename = os.path.join(optimized_model_dir,
+                                          f"{os.path.splitext(os.path.basename(filename))[0]}"
+                                          f".{graph_optimization_level.lower()}.onnx")
 
-    for net in range(1, 6):
-        dir_name = get_script_path(__file__)
-        filename = os.path.join(dir_name, "trained_models", f"ACASXU_run2a_{net}_1_batch_2000.onnx")
+        if os.path.exists(optimized_filename):
+            # already optimized
+            filename = optimized_filename
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        else:
+            os.makedirs(optimized_model_dir, exist_ok=True)
+            opts.optimized_model_filepath = optimized_filename
+
+    return ort.InferenceSession(filename, sess_options=opts, providers=["CPUExecutionProvider"])
+
+
+def get_session(filename, **options):
+    '''get the session of a model file, created once per process for its session options
+
+    options override the default session_options. Sessions are shared, which is safe as onnxruntime sessions can be
+    run concurrently from several threads
+    '''
+
+    for name in options:
+        assert name in session_options, f"unknown session option {name}"
+
+    opts = {**session_options, **options}
+    key = (os.path.realpath(filename), *sorted(opts.items()))
+
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = create_session(filename, **opts)
+
+        return _sessions[key]
+
+
+def get_numpy_network(filename):
+    'get the NumpyNetwork of a weight archive, loaded once per process'
 
-        sess = ort.InferenceSession(filename)
+    key = (os.path.realpath(filename), "numpy")
 
-        nets.append(sess)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = NumpyNetwork(filename)
+
+        return _sessions[key]
+
+
+def load_networks(backend="onnx", **options):
+    '''load 5 neural networks and return a list (shared by every caller in the process)
+
+    backend is "onnx" for onnxruntime sessions, or "numpy" for NumpyNetworks loaded from the converted weights
+    in trained_models/np. options override the default session_options of the onnx sessions
+    '''
+
+    assert backend in ("onnx", "numpy"), f"unknown acasxu network backend {backend}"
+    assert backend == "onnx" or not options, "session options only apply to the onnx backend"
+
+    nets = []
+
+    for filename in network_filenames(backend):
+        if backend == "numpy":
+            nets.append(get_numpy_network(filename))
+        else:
+            nets.append(get_session(filename, **options))
 
     return nets
+
+
+def network_filenames(backend="onnx"):
+    'model files of the 5 networks ("onnx" models, or "numpy" weight archives)'
+    dir_name = get_script_path(__file__)
+    if backend == "numpy":
+        return [os.path.join(dir_name, "trained_models", "np", f"ACASXU_run2a_{net}_1_batch_2000.npz")
+                for net in range(1, 6)]
+    return [os.path.join(dir_name, "trained_models", f"ACASXU_run2a_{net}_1_batch_2000.onnx") for net in range(1, 6)]
@@ -10,7 +10,8 @@ def model_init(model):
 
 def get_auto(model, f16_state):
     if model.auto is None:
-        model.parameters['auto'] = AcasXuAutopilot(f16_state, roll_rates=model.parameters['roll_rates'])
+        model.parameters['auto'] = AcasXuAutopilot(f16_state, roll_rates=model.parameters['roll_rates'],
+                                                  backend=model.parameters['nn_backend'])
         if model.gains == "recovery":
             self = model.parameters['auto']
 
@@ -44,6 +45,16 @@ def model_output(model, time_t, state_controller, input_f16):
     return auto.get_u_ref(time_t, input_f16)[:4]
 
 
+def model_wakeup(model, time_t, state_controller, input_f16):
+    """with held references, the controller is idle until its next network evaluation
+
+    None (no wakeup) until the autopilot is created at the first update
+    """
+    if not model.hold_reference or model.auto is None:
+        return None
+    return model.auto.next_nn_update
+
+
 def model_state_update(model, time_t, state_controller, input_f16):
     # NOTE: not using llc
     expanded_states = [[*input_f16[i*13:(i+1)*13], 0.0, 0.0, 0.0] for i in range(len(input_f16)//13)]
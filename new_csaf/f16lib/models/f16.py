@@ -1,10 +1,18 @@
 import numpy as np
+from csaf.core.component import memoize_flow
 import f16lib.models.helpers.f16plant_helper as ph
+import f16lib.models.helpers.f16plant_kernel as pk
 from f16lib.models.helpers.variables import state_vector
 from f16lib.models.helpers.stevens_dyn import stevens_f16
 from f16lib.models.helpers.morelli_dyn import morelli_f16
 
 
+def model_init(model):
+    """pack the parameters for the compiled derivative"""
+    if model.parameters['compiled']:
+        model.parameters['packed'] = pk.pack_parameters(model.parameters)
+
+
 def model_output(model, time_t, state_f16, input_controller):
     return subf16df(model, time_t, state_f16, input_controller)[1]
 
@@ -13,12 +21,25 @@ def model_state_update(model, time_t, state_f16, input_controller):
     return subf16df(model, time_t, state_f16, input_controller)[0]
 
 
+@memoize_flow
 def subf16df(model, t, x, u, adjust_cy=True):
-    ''' Calculate state space differential '''
+    ''' Calculate state space differential, of stacked (N, 13) states and (N, 4) inputs too '''
     # if len(f) != 4+4:
     #    raise E.SystemDimensionError("forcing vector must have 4 values")
     parameters = model.parameters
-
+    if np.ndim(x) == 2:
+        if parameters['compiled']:
+            return pk.subf16df_stacked_kernel(np.ascontiguousarray(x, dtype=float),
+                                              np.ascontiguousarray(u, dtype=float), parameters['packed'], adjust_cy)
+        rets = [_subf16df(parameters, xi, ui, adjust_cy) for xi, ui in zip(x, u)]
+        return np.array([xdot for xdot, _ in rets]), np.array([output for _, output in rets])
+    if parameters['compiled']:
+        return pk.subf16df_kernel(np.asarray(x, dtype=float), np.asarray(u, dtype=float), parameters['packed'],
+                                  adjust_cy)
+    return _subf16df(parameters, x, u, adjust_cy)
+
+
+def _subf16df(parameters, x, u, adjust_cy):
     thtlc, el, ail, rdr = u[0:4]
     s, b, cbar, rm, xcgref, xcg, he, c1, c2, c3, c4, c5, c6, c7, c8, c9, rtod, g = \
         (parameters[p] for p in 's b cbar rm xcgref xcg he c1 c2 c3 c4 c5 c6 c7 c8 c9 rtod g'.split())
@@ -0,0 +1,139 @@
+"""
+ACAS Xu Networks in NumPy
+
+the ACAS Xu networks are small fully connected ReLU networks, so they can be evaluated with NumPy matmuls from
+weights converted once from the ONNX models. The conversion reads the ONNX protobuf directly, so it needs neither
+onnx nor onnxruntime.
+
+In the new_csaf directory, run
+    PYTHONPATH=$PWD python f16lib/models/helpers/acasxu_nn.py
+to convert the ONNX models in trained_models into .npz archives in trained_models/np
+"""
+import os
+import typing
+
+import numpy as np
+
+
+# ONNX TensorProto data types supported by the reader
+_ONNX_DTYPES = {1: np.float32, 11: np.float64}
+
+
+def _read_varint(buf: bytes, idx: int) -> typing.Tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = buf[idx]
+        idx += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, idx
+
+
+def _read_fields(buf: bytes) -> typing.Dict[int, typing.List]:
+    """protobuf message fields, {field number: [values]}"""
+    fields: typing.Dict[int, typing.List] = {}
+    idx = 0
+    while idx < len(buf):
+        key, idx = _read_varint(buf, idx)
+        number, wire_type = key >> 3, key & 7
+        value: typing.Union[int, bytes]
+        if wire_type == 0:
+            value, idx = _read_varint(buf, idx)
+        elif wire_type == 1:
+            value, idx = buf[idx:idx + 8], idx + 8
+        elif wire_type == 2:
+            size, idx = _read_varint(buf, idx)
+            value, idx = buf[idx:idx + size], idx + size
+        elif wire_type == 5:
+            value, idx = buf[idx:idx + 4], idx + 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire_type}")
+        fields.setdefault(number, []).append(value)
+    return fields
+
+
+def _read_tensor(buf: bytes) -> typing.Tuple[str, np.ndarray]:
+    fields = _read_fields(buf)
+    name = fields[8][0].decode()
+    dtype = _ONNX_DTYPES.get(fields.get(2, [1])[0])
+    assert dtype is not None, f"tensor {name} has an unsupported data type"
+    assert 9 in fields, f"tensor {name} must store its values as raw data"
+    dims = [int(d) for d in fields.get(1, [])]
+    return name, np.frombuffer(fields[9][0], dtype=np.dtype(dtype).newbyteorder('<')).reshape(dims).copy()
+
+
+def read_onnx_graph(filename: str) -> typing.Tuple[typing.List[typing.Tuple[str, typing.List[str]]],
+                                                   typing.Dict[str, np.ndarray]]:
+    """read the nodes [(op type, input names)] and initializers {name: array} of an ONNX model"""
+    with open(filename, 'rb') as f:
+        model = _read_fields(f.read())
+    graph = _read_fields(model[7][0])
+    nodes = []
+    for node_buf in graph.get(1, []):
+        node = _read_fields(node_buf)
+        nodes.append((node[4][0].decode(), [n.decode() for n in node.get(1, [])]))
+    initializers = dict(_read_tensor(t) for t in graph.get(5, []))
+    return nodes, initializers
+
+
+def convert_onnx_to_npz(onnx_filename: str, npz_filename: str) -> None:
+    """ convert an ACAS Xu ONNX network to a weight archive
+
+    the network must be an input offset (Sub), a Flatten and layers of MatMul, Add and Relu. The archive stores
+    the offset as 'offset' and the layers as 'w0', 'b0', 'w1', 'b1', ...
+    """
+    nodes, initializers = read_onnx_graph(onnx_filename)
+    arrays: typing.Dict[str, typing.Any] = {}
+    weights, biases = [], []
+    for op, inputs in nodes:
+        params = [initializers[n] for n in inputs if n in initializers]
+        if op == 'Sub':
+            arrays['offset'] = params[0].reshape(-1)
+        elif op == 'MatMul':
+            weights.append(params[0])
+        elif op == 'Add':
+            biases.append(params[0].reshape(-1))
+        else:
+            assert op in ('Flatten', 'Relu'), f"unsupported operation {op} in {onnx_filename}"
+    assert len(weights) == len(biases) > 0, f"{onnx_filename} is not a sequence of fully connected layers"
+    for idx, (w, b) in enumerate(zip(weights, biases)):
+        arrays[f"w{idx}"], arrays[f"b{idx}"] = w, b
+    np.savez(npz_filename, **arrays)
+
+
+class NumpyNetwork:
+    """ACAS Xu network evaluated with NumPy"""
+
+    def __init__(self, filename: str):
+        try:
+            p = np.load(filename)
+        except FileNotFoundError:
+            raise FileNotFoundError(f'Missing numpy model file {filename} (see {__file__} to convert the ONNX '
+                                    f'models)')
+        nlayers = len([k for k in p.keys() if k.startswith('w')])
+        self.weights = [p[f'w{idx}'] for idx in range(nlayers)]
+        self.biases = [p[f'b{idx}'] for idx in range(nlayers)]
+        # fold the input offset into the first layer, (x - offset) @ w0 + b0 = x @ w0 + (b0 - offset @ w0)
+        if 'offset' in p:
+            self.biases[0] = (self.biases[0] - p['offset'] @ self.weights[0]).astype(self.biases[0].dtype)
+        self.ninputs = self.weights[0].shape[0]
+
+    def predict(self, inputs: np.ndarray) -> np.ndarray:
+        """evaluate the network on (N, 5) scaled inputs, returning (N, 5) scores"""
+        x = np.reshape(inputs, (-1, self.ninputs)).astype(self.weights[0].dtype, copy=False)
+        for w, b in zip(self.weights[:-1], self.biases[:-1]):
+            x = x @ w
+            x += b
+            np.maximum(x, 0, out=x)
+        x = x @ self.weights[-1]
+        x += self.biases[-1]
+        return x
+
+
+if __name__ == "__main__":
+    models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "trained_models")
+    for net in range(1, 6):
+        name = f"ACASXU_run2a_{net}_1_batch_2000"
+        convert_onnx_to_npz(os.path.join(models_dir, f"{name}.onnx"), os.path.join(models_dir, "np", f"{name}.npz"))
+        print(f"converted {name}")
@@ -169,6 +169,33 @@ def pdot(p3, p1):
     return pd
 
 
+# engine thrust tables (lookup tables are module constants, so numba compiles them in)
+# Idle
+THRUST_A_TABLE = np.array([
+    [1060, 670, 880, 1140, 1500, 1860],
+    [635, 425, 690, 1010, 1330, 1700],
+    [60, 25, 345, 755, 1130, 1525],
+    [-1020, -170, -300, 350, 910, 1360],
+    [-2700, -1900, -1300, -247, 600, 1100],
+    [-3600, -1400, -595, -342, -200, 700]]).T
+# Military
+THRUST_B_TABLE = np.array([
+    [12680, 9150, 6200, 3950, 2450, 1400],
+    [12680, 9150, 6313, 4040, 2470, 1400],
+    [12610, 9312, 6610, 4290, 2600, 1560],
+    [12640, 9839, 7090, 4660, 2840, 1660],
+    [12390, 10176, 7750, 5320, 3250, 1930],
+    [11680, 9848, 8050, 6100, 3800, 2310]]).T
+# Maximum
+THRUST_C_TABLE = np.array([
+    [20000, 15000, 10800, 7000, 4000, 2500],
+    [21420, 15700, 11225, 7323, 4435, 2600],
+    [22700, 16860, 12250, 8154, 5000, 2835],
+    [24240, 18910, 13760, 9285, 5700, 3215],
+    [26070, 21075, 15975, 11115, 6860, 3950],
+    [28886, 23319, 18300, 13484, 8642, 5057]]).T
+
+
 @jit(nopython=True)
 def thrust_lookup(power, alt, rmach):
     '''
@@ -177,31 +204,6 @@ def thrust_lookup(power, alt, rmach):
     Non-linearities: lookup table, rounding using fix(), ...
     '''
 
-    # Idle
-    thrust_a_table = np.array([
-        [1060, 670, 880, 1140, 1500, 1860],
-        [635, 425, 690, 1010, 1330, 1700],
-        [60, 25, 345, 755, 1130, 1525],
-        [-1020, -170, -300, 350, 910, 1360],
-        [-2700, -1900, -1300, -247, 600, 1100],
-        [-3600, -1400, -595, -342, -200, 700]]).T
-    # Military
-    thrust_b_table = np.array([
-        [12680, 9150, 6200, 3950, 2450, 1400],
-        [12680, 9150, 6313, 4040, 2470, 1400],
-        [12610, 9312, 6610, 4290, 2600, 1560],
-        [12640, 9839, 7090, 4660, 2840, 1660],
-        [12390, 10176, 7750, 5320, 3250, 1930],
-        [11680, 9848, 8050, 6100, 3800, 2310]]).T
-    # Maximum
-    thrust_c_table = np.array([
-        [20000, 15000, 10800, 7000, 4000, 2500],
-        [21420, 15700, 11225, 7323, 4435, 2600],
-        [22700, 16860, 12250, 8154, 5000, 2835],
-        [24240, 18910, 13760, 9285, 5700, 3215],
-        [26070, 21075, 15975, 11115, 6860, 3950],
-        [28886, 23319, 18300, 13484, 8642, 5057]]).T
-
     if alt < 0: alt = 0.01  # uh, why not 0?
 
     h = .0001 * alt
@@ -225,21 +227,33 @@ def thrust_lookup(power, alt, rmach):
         t = thrust_table[i, m + 1] * cdh + thrust_table[i + 1, m + 1] * dh
         return s, t
 
-    s, t = s_and_t(thrust_b_table)
+    s, t = s_and_t(THRUST_B_TABLE)
     tmil = s + (t - s) * dm
 
     if power < 50:
-        s, t = s_and_t(thrust_a_table)
+        s, t = s_and_t(THRUST_A_TABLE)
         tidl = s + (t - s) * dm
         thrst = tidl + (tmil - tidl) * power * .02
     else:
-        s, t = s_and_t(thrust_c_table)
+        s, t = s_and_t(THRUST_C_TABLE)
         tmax = s + (t - s) * dm
         thrst = tmil + (tmax - tmil) * (power - 50) * .02
 
     return thrst
 
 
+# damping derivatives table
+DAMPP_TABLE = np.array([[-.267, -.110, .308, 1.34, 2.08, 2.91, 2.76, 2.05, 1.50, 1.49, 1.83, 1.21], \
+                        [.882, .852, .876, .958, .962, .974, .819, .483, .590, 1.21, -.493, -1.04], \
+                        [-.108, -.108, -.188, .110, .258, .226, .344, .362, .611, .529, .298, -2.27], \
+                        [-8.80, -25.8, -28.9, -31.4, -31.2, -30.7, -27.7, -28.2, -29.0, -29.8, -38.3, -35.3], \
+                        [-.126, -.026, .063, .113, .208, .230, .319, .437, .680, .100, .447, -.330], \
+                        [-.360, -.359, -.443, -.420, -.383, -.375, -.329, -.294, -.230, -.210, -.120, -.100], \
+                        [-7.21, -.540, -5.23, -5.26, -6.11, -6.64, -5.69, -6.00, -6.20, -6.40, -6.60, -6.00], \
+                        [-.380, -.363, -.378, -.386, -.370, -.453, -.550, -.582, -.595, -.637, -1.02, -.840], \
+                        [.061, .052, .052, -.012, -.013, -.024, .050, .150, .130, .158, .240, .150]]).T
+
+
 @jit(nopython=True)
 def dampp_lookup(alpha):
     '''
@@ -247,16 +261,6 @@ def dampp_lookup(alpha):
 
     Non-linearities: lookup table, rounding using fix(), ...
     '''
-    dampp_table = np.array([[-.267, -.110, .308, 1.34, 2.08, 2.91, 2.76, 2.05, 1.50, 1.49, 1.83, 1.21], \
-                            [.882, .852, .876, .958, .962, .974, .819, .483, .590, 1.21, -.493, -1.04], \
-                            [-.108, -.108, -.188, .110, .258, .226, .344, .362, .611, .529, .298, -2.27], \
-                            [-8.80, -25.8, -28.9, -31.4, -31.2, -30.7, -27.7, -28.2, -29.0, -29.8, -38.3, -35.3], \
-                            [-.126, -.026, .063, .113, .208, .230, .319, .437, .680, .100, .447, -.330], \
-                            [-.360, -.359, -.443, -.420, -.383, -.375, -.329, -.294, -.230, -.210, -.120, -.100], \
-                            [-7.21, -.540, -5.23, -5.26, -6.11, -6.64, -5.69, -6.00, -6.20, -6.40, -6.60, -6.00], \
-                            [-.380, -.363, -.378, -.386, -.370, -.453, -.550, -.582, -.595, -.637, -1.02, -.840], \
-                            [.061, .052, .052, -.012, -.013, -.024, .050, .150, .130, .158, .240, .150]]).T
-
     s = .2 * alpha
     k = fix(s)
 
@@ -273,9 +277,10 @@ def dampp_lookup(alpha):
     # offset for 0-based indexing
     k -= 1;
     l -= 1
-    d = [dampp_table[k, i] + abs(da) * (dampp_table[l, i] - dampp_table[k, i]) for i in range(9)]
+    for i in range(9):
+        d[i] = DAMPP_TABLE[k, i] + abs(da) * (DAMPP_TABLE[l, i] - DAMPP_TABLE[k, i])
 
-    return np.array(d)
+    return d
 
 
 @jit(nopython=True)
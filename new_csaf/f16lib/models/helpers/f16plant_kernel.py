@@ -0,0 +1,164 @@
+""" Compiled F16 state derivative
+
+the body of subf16df as one nopython function, with the plant parameters packed into a float array
+"""
+import numpy as np
+from numba import jit  # type: ignore
+
+import f16lib.models.helpers.f16plant_helper as ph
+from f16lib.models.helpers.stevens_dyn import stevens_coefficients
+from f16lib.models.helpers.morelli_dyn import morelli_coefficients
+
+# order of the parameters in the packed parameter array (the aero model is last, encoded by AERO_MODELS)
+PARAMETER_NAMES = ('s', 'b', 'cbar', 'rm', 'xcgref', 'xcg', 'he', 'c1', 'c2', 'c3', 'c4', 'c5', 'c6', 'c7', 'c8',
+                   'c9', 'rtod', 'g', 'xcg_mult', 'cxt_mult', 'cyt_mult', 'czt_mult', 'clt_mult', 'cmt_mult',
+                   'cnt_mult', 'model')
+
+AERO_MODELS = {'stevens': 0.0, 'morelli': 1.0}
+
+
+def pack_parameters(parameters) -> np.ndarray:
+    """pack F16 plant parameters into a float array for subf16df_kernel"""
+    if parameters['model'] not in AERO_MODELS:
+        raise NotImplementedError(f"aero model {parameters['model']} is not supported")
+    return np.array([float(parameters[p]) for p in PARAMETER_NAMES[:-1]] + [AERO_MODELS[parameters['model']]])
+
+
+@jit(nopython=True)
+def subf16df_kernel(x, u, params, adjust_cy):
+    """ Calculate state space differential and outputs
+
+    :param x: plant states (13,)
+    :param u: controller inputs (4,)
+    :param params: packed parameters (see pack_parameters)
+    :param adjust_cy: move side acceleration in front of the c.g.
+    :return: (xdot (13,), outputs (4,))
+    """
+    thtlc, el, ail, rdr = u[0], u[1], u[2], u[3]
+    s, b, cbar, rm, xcgref, xcg, he = params[0], params[1], params[2], params[3], params[4], params[5], params[6]
+    c1, c2, c3, c4, c5, c6, c7, c8, c9 = params[7], params[8], params[9], params[10], params[11], params[12], \
+        params[13], params[14], params[15]
+    rtod, g = params[16], params[17]
+    xcg_mult, cxt_mult, cyt_mult, czt_mult, clt_mult, cmt_mult, cnt_mult = params[18], params[19], params[20], \
+        params[21], params[22], params[23], params[24]
+
+    vt, alpha, beta, phi, theta, psi, p, q, r = x[0], x[1], x[2], x[3], x[4], x[5], x[6], x[7], x[8]
+    alt, power = x[11], x[12]
+
+    alpha, beta = alpha * rtod, beta * rtod
+    xcg *= xcg_mult
+
+    qbar = ph.qbar(vt, alt)
+    power_dot, thrust = ph.engine(thtlc, power, vt, alt)
+
+    if params[25] == 0.0:
+        cxt, cyt, czt, clt, cmt, cnt = stevens_coefficients(alpha, beta, el, ail, rdr, ail / 20, rdr / 30)
+    else:
+        cxt, cyt, czt, clt, cmt, cnt = morelli_coefficients(alpha, beta, el, ail, rdr, p, q, r,
+                                                            cbar, b, vt, xcg, xcgref)
+
+    cxt *= cxt_mult
+    cyt *= cyt_mult
+    czt *= czt_mult
+    clt *= clt_mult
+    cmt *= cmt_mult
+    cnt *= cnt_mult
+
+    tvt = .5 / vt
+    b2v = b * tvt
+    cq = cbar * q * tvt
+
+    # damping derivatives
+    d = ph.dampp_lookup(alpha)
+
+    cxt = cxt + cq * d[0]
+    cyt = cyt + b2v * (d[1] * r + d[2] * p)
+    czt = czt + cq * d[3]
+    clt = clt + b2v * (d[4] * r + d[5] * p)
+    cmt = cmt + cq * d[6] + czt * (xcgref - xcg)
+    cnt = cnt + b2v * (d[7] * r + d[8] * p) - cyt * (xcgref - xcg) * cbar / b
+
+    cbta = np.cos(x[2])
+    ub = vt * np.cos(x[1]) * cbta
+    vb = vt * np.sin(x[2])
+    wb = vt * np.sin(x[1]) * cbta
+    sth = np.sin(theta)
+    cth = np.cos(theta)
+    sph = np.sin(phi)
+    cph = np.cos(phi)
+    spsi = np.sin(psi)
+    cpsi = np.cos(psi)
+    qs = qbar * s
+    qsb = qs * b
+    rmqs = rm * qs
+    gcth = g * cth
+    qsph = q * sph
+    ay = rmqs * cyt
+    az = rmqs * czt
+
+    # force equations
+    udot = r * vb - q * wb - g * sth + rm * (qs * cxt + thrust)
+    vdot = p * wb - r * ub + gcth * sph + ay
+    wdot = q * ub - p * vb + gcth * cph + az
+    dum = (ub * ub + wb * wb)
+
+    xdot = np.empty(13)
+    xdot[0] = (ub * udot + vb * vdot + wb * wdot) / vt
+    xdot[1] = (ub * wdot - wb * udot) / dum
+    xdot[2] = (vt * vdot - vb * xdot[0]) * cbta / dum
+
+    # kinematics
+    xdot[3] = p + (sth / cth) * (qsph + r * cph)
+    xdot[4] = q * cph - r * sph
+    xdot[5] = (qsph + r * cph) / cth
+
+    # moments
+    xdot[6] = (c2 * p + c1 * r + c4 * he) * q + qsb * (c3 * clt + c4 * cnt)
+    xdot[7] = (c5 * p - c7 * he) * r + c6 * (r * r - p * p) + qs * cbar * c7 * cmt
+    xdot[8] = (c8 * p - c2 * r + c9 * he) * q + qsb * (c4 * clt + c9 * cnt)
+
+    # navigation
+    t1 = sph * cpsi
+    t2 = cph * sth
+    t3 = sph * spsi
+    s1 = cth * cpsi
+    s2 = cth * spsi
+    s3 = t1 * sth - cph * spsi
+    s4 = t3 * sth + cph * cpsi
+    s5 = sph * cth
+    s6 = t2 * cpsi + t3
+    s7 = t2 * spsi - t1
+    s8 = cph * cth
+    xdot[9] = ub * s1 + vb * s3 + wb * s6
+    xdot[10] = ub * s2 + vb * s4 + wb * s7
+    xdot[11] = ub * sth - vb * s5 - wb * s8
+    xdot[12] = power_dot
+
+    xa = 15.0  # sets distance normal accel is in front of the c.g. (xa = 15.0 at pilot)
+    az = az - xa * xdot[7]
+    if adjust_cy:
+        ay = ay + xa * xdot[8]
+
+    output = np.empty(4)
+    output[0] = (-az / g) - 1
+    output[1] = ay / g
+    output[2] = az
+    output[3] = ay
+    return xdot, output
+
+
+@jit(nopython=True)
+def subf16df_stacked_kernel(xs, us, params, adjust_cy):
+    """ subf16df_kernel for the rows of stacked states and inputs
+
+    :param xs: plant states (N, 13)
+    :param us: controller inputs (N, 4)
+    :return: (xdot (N, 13), outputs (N, 4))
+    """
+    xdots = np.empty((xs.shape[0], 13))
+    outputs = np.empty((xs.shape[0], 4))
+    for idx in range(xs.shape[0]):
+        xdot, output = subf16df_kernel(xs[idx], us[idx], params, adjust_cy)
+        xdots[idx, :] = xdot
+        outputs[idx, :] = output
+    return xdots, outputs
@@ -1,11 +1,14 @@
 import numpy as np
 
-from math import sin, cos
-
 from f16lib.models.helpers.variables import State
 
 
 class FeedbackController:
+    """ low-level feedback controller
+
+    states and inputs are single vectors, or stacked (N, width) arrays of N configurations
+    """
+
     def __init__(self, ctrlLimits, model, ctrl_fn, xequil, uequil):
         self.ctrlLimits = ctrlLimits
         self.model = model
@@ -14,10 +17,10 @@ class FeedbackController:
 
     @staticmethod
     def permute2xctrl(x_f16, cstate):
-        state = np.concatenate((x_f16, cstate))
+        state = np.concatenate((x_f16, cstate), axis=-1)
         # Reorder states to match controller:
         # [alpha, q, int_e_Nz, beta, p, r, int_e_ps, int_e_Ny_r]
-        return np.array([state[i] for i in [1, 7, 13, 2, 6, 8, 14, 15]])
+        return state[..., [1, 7, 13, 2, 6, 8, 14, 15]]
 
     def xerror(self, x_f16):
         # Calculate perturbation from trim state
@@ -30,19 +33,20 @@ class FeedbackController:
         return self.ctrl_fn(x_ctrl)  # Full Control
 
     def output(self, t, cstate, u):
-        assert len(u) == 21
+        cstate, u = np.asarray(cstate, dtype=float), np.asarray(u, dtype=float)
+        assert u.shape[-1] == 21
         # TODO: hard coded indices!
-        x_f16, y, u_ref = u[:13], u[13:17], u[17:]
+        x_f16, y, u_ref = u[..., :13], u[..., 13:17], u[..., 17:]
 
         # Initialize control vectors
-        u_deg = np.zeros((4,))  # throt, ele, ail, rud
-        u_deg[1:4] = self.compute(x_f16, cstate)
+        u_deg = np.zeros(u.shape[:-1] + (4,))  # throt, ele, ail, rud
+        u_deg[..., 1:4] = self.compute(x_f16, cstate)
 
         # Set throttle as directed from output of getOuterLoopCtrl(...)
-        u_deg[0] = u_ref[3]
+        u_deg[..., 0] = u_ref[..., 3]
 
         # Add in equilibrium control
-        u_deg[0:4] += self.uequil
+        u_deg += self.uequil
         u_deg = clip_u(self.model, u_deg)
 
         return u_deg
@@ -50,41 +54,45 @@ class FeedbackController:
     def ps(self, x_f16):
         xerror = self.xerror(x_f16)
         # Nonlinear (Actual): ps = p * cos(alpha) + r * sin(alpha)
-        ps = xerror[State.p] * cos(xerror[State.alpha]) + xerror[State.r] * sin(xerror[State.alpha])
+        ps = xerror[..., State.p] * np.cos(xerror[..., State.alpha]) + \
+            xerror[..., State.r] * np.sin(xerror[..., State.alpha])
         return ps
 
     def ps_(self, x_f16):
-        ps_ = x_f16[State.p] * cos(x_f16[State.alpha]) + x_f16[State.r] * sin(x_f16[State.alpha])
+        ps_ = x_f16[..., State.p] * np.cos(x_f16[..., State.alpha]) + \
+            x_f16[..., State.r] * np.sin(x_f16[..., State.alpha])
         xequil = self.xequil
-        ps_equil = xequil[State.p] * cos(xequil[State.alpha]) + xequil[State.r] * sin(xequil[State.alpha])
+        ps_equil = xequil[State.p] * np.cos(xequil[State.alpha]) + xequil[State.r] * np.sin(xequil[State.alpha])
         return ps_ - ps_equil
 
     def Ny_r(self, x_f16, Ny):
         # Calculate (side force + yaw rate) term
         xerror = self.xerror(x_f16)
-        Ny_r = Ny + xerror[State.r]
+        Ny_r = Ny + xerror[..., State.r]
         return Ny_r
 
     def _der(self, t, cstate, u):
         'get the derivatives of the integrators in the low-level controller'
-        x_f16, y, u_ref = u[:13], u[13:17], u[17:]
-        assert len(u_ref) > 2, f"{len(u)}"
-        Nz, Ny, az, ay = y
+        u = np.asarray(u, dtype=float)
+        x_f16, y, u_ref = u[..., :13], u[..., 13:17], u[..., 17:]
+        assert u_ref.shape[-1] > 2, f"{u.shape[-1]}"
+        Nz, Ny = y[..., 0], y[..., 1]
 
         ps = self.ps(x_f16)
         Ny_r = self.Ny_r(x_f16, Ny)
 
-        return [Nz - u_ref[0], ps - u_ref[1], Ny_r - u_ref[2]]
+        return np.stack([Nz - u_ref[..., 0], ps - u_ref[..., 1], Ny_r - u_ref[..., 2]], axis=-1)
 
     def step(self, sampling_period, t, cstate, u):
         'get the next state of the integrators in the low-level controller'
 
-        x_f16, y, u_ref = u[:13], u[13:17], u[17:]
-        Nz, Ny, _, _ = y
+        u = np.asarray(u, dtype=float)
+        x_f16, y, u_ref = u[..., :13], u[..., 13:17], u[..., 17:]
+        Nz, Ny = y[..., 0], y[..., 1]
 
         ps, Ny_r = self.ps(x_f16), self.Ny_r(x_f16, Ny)
 
-        error = np.array([Nz - u_ref[0], ps - u_ref[1], Ny_r - u_ref[2]])
+        error = np.stack([Nz - u_ref[..., 0], ps - u_ref[..., 1], Ny_r - u_ref[..., 2]], axis=-1)
         # Integrate/Sum the error
         error_ = cstate + error * sampling_period
 
@@ -128,7 +136,7 @@ class CtrlLimits:
 
 def clip_u(model, u_deg):
     """ helper to clip controller output within defined control limits
-    :param u_deg: controller output
+    :param u_deg: controller output (4,), or stacked outputs (N, 4)
     :param parameters: containing equilibrium state (uequil) and control limits (ctrlLimits)
     :return: saturated control output
     """
@@ -138,8 +146,5 @@ def clip_u(model, u_deg):
     AileronMinDeg, AileronMaxDeg = parameters["aileron_min"], parameters["aileron_max"]
     RudderMinDeg, RudderMaxDeg = parameters["rudder_min"], parameters["rudder_max"]
 
-    u_deg[0] = max(min(u_deg[0], ThrottleMax), ThrottleMin)
-    u_deg[1] = max(min(u_deg[1], ElevatorMaxDeg), ElevatorMinDeg)
-    u_deg[2] = max(min(u_deg[2], AileronMaxDeg), AileronMinDeg)
-    u_deg[3] = max(min(u_deg[3], RudderMaxDeg), RudderMinDeg)
-    return u_deg
+    return np.clip(u_deg, [ThrottleMin, ElevatorMinDeg, AileronMinDeg, RudderMinDeg],
+                   [ThrottleMax, ElevatorMaxDeg, AileronMaxDeg, RudderMaxDeg], out=u_deg)
@@ -14,7 +14,8 @@ def get_ctrl_law(klong, klat):
     k[1:, 3:] = klat
 
     def ctrl_fn(x):
-        return np.dot(-k, x)
+        # x is (8,) or stacked (N, 8)
+        return np.dot(x, -k.T)
 
     return ctrl_fn
 
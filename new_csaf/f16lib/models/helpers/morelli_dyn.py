@@ -18,6 +18,14 @@ def morelli_f16(*, alpha, beta, de, da, dr, p, q, r, cbar, b, V, xcg, xcgref):
     Computes the f16 dynamics using Morelli approximation via polynomials
     All angles are in degrees
     '''
+    return morelli_coefficients(alpha, beta, de, da, dr, p, q, r, cbar, b, V, xcg, xcgref)
+
+
+@jit(nopython=True)
+def morelli_coefficients(alpha, beta, de, da, dr, p, q, r, cbar, b, V, xcg, xcgref):
+    '''
+    morelli_f16 with positional arguments (callable from other nopython functions)
+    '''
 
     # alpha=max(-10*pi/180,min(45*pi/180,alpha)) # bounds alpha between -10 deg and 45 deg
     # beta = max( - 30 * pi / 180, min(30 * pi / 180, beta)) #bounds beta between -30 deg and 30 deg
@@ -85,7 +85,7 @@ def cz(alpha, beta, el):
 def cl(alpha, beta):
     """For calculating rolling moment coefficient"""
 
-    a = np.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0], \
+    a = np.array([[0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.], \
                   [-.001, -.004, -.008, -.012, -.016, -.022, -.022, -.021, -.015, -.008, -.013, -.015], \
                   [-.003, -.009, -.017, -.024, -.030, -.041, -.045, -.040, -.016, -.002, -.010, -.019], \
                   [-.001, -.010, -.020, -.030, -.039, -.054, -.057, -.054, -.023, -.006, -.014, -.027], \
@@ -175,7 +175,7 @@ def cm(alpha, el):
 def cn(alpha, beta):
     """cn function"""
 
-    a = np.array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0], \
+    a = np.array([[0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0., 0.], \
                   [.018, .019, .018, .019, .019, .018, .013, .007, .004, -.014, -.017, -.033], \
                   [.038, .042, .042, .042, .043, .039, .030, .017, .004, -.035, -.047, -.057], \
                   [.056, .057, .059, .058, .058, .053, .032, .012, .002, -.046, -.071, -.073], \
@@ -403,6 +403,14 @@ def stevens_f16(*, alpha, beta, el, ail, rdr, dail, drdr):
     Computes the f16 dynamics using Stevens Lookup table model
     All angles are in degrees
     '''
+    return stevens_coefficients(alpha, beta, el, ail, rdr, dail, drdr)
+
+
+@jit(nopython=True)
+def stevens_coefficients(alpha, beta, el, ail, rdr, dail, drdr):
+    '''
+    stevens_f16 with positional arguments (callable from other nopython functions)
+    '''
     cxt = cx(alpha, el)
     cyt = cy(beta, ail, rdr)
     czt = cz(alpha, beta, el)
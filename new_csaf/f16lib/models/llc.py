@@ -17,7 +17,7 @@ def model_init(model):
 
 
 def model_output(model, t, state_controller, input_all):
-    assert len(input_all) == 21, f"wrong length {len(input_all)}"
+    assert np.shape(input_all)[-1] == 21, f"wrong length {np.shape(input_all)[-1]}"
     # TODO: hard coded indices!
     """ get the reference commands for the control surfaces """
     return model.parameters['llc'].output(t, np.array(state_controller), np.array(input_all))
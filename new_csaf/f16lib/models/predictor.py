@@ -10,5 +10,8 @@ def model_output(model, time_t, state_switch, input_autopilot):
 def model_init(model):
     model.parameters['predictor'] = CollisionPredictor(
         model.parameters["intruder_waypoints"],
-        model.parameters["own_waypoints"]
+        model.parameters["own_waypoints"],
+        mode=model.parameters["mode"],
+        window=model.parameters["window"],
+        ownship_model=model.parameters["ownship_model"]
     )
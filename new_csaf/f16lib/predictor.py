@@ -7,12 +7,26 @@ from f16lib.components import (f16_xequil,
                                create_nagents_acas_xu,
                                StaticObject,
                                F16PlantStateMessage)
+from csaf.core.solver import RK4Solver
+from csaf.core.system import SystemSnapshot
 import GPy # type: ignore
 import csaf
+import collections
 import typing
 import numpy as np
 
 
+class F16SurrogatePlantComponent(F16PlantComponent):
+    """F16 plant of the surrogate, stepped with RK4 at its sampling rate through the compiled derivative"""
+    system_solver = RK4Solver
+    default_parameters = {**F16PlantComponent.default_parameters, "compiled": True}
+
+
+class F16SurrogateLlcComponent(F16LlcComponent):
+    """F16 low level controller of the surrogate, stepped with RK4 at its sampling rate"""
+    system_solver = RK4Solver
+
+
 class F16AcasShieldSurrogate(csaf.System):
     class F16SurrogatePlaceholderComponent(csaf.DiscreteComponent):
         name = "F16 Surrogate Placeholder"
@@ -32,8 +46,8 @@ class F16AcasShieldSurrogate(csaf.System):
         }
 
     components = {
-        "plant": F16PlantComponent,
-        "llc": F16LlcComponent,
+        "plant": F16SurrogatePlantComponent,
+        "llc": F16SurrogateLlcComponent,
         "autopilot": create_nagents_acas_xu(2),
         "waypoint": F16AutoWaypointComponent,
         "switch": F16AcasSwitchComponent,
@@ -62,15 +76,27 @@ class F16AcasShieldSurrogate(csaf.System):
 
 
 
-def generate_surrogate_system(predictors: typing.Tuple[GPy.models.GPRegression, GPy.models.GPRegression]):
-    """create the 'digital twin' used by the predictor component"""
+def generate_surrogate_system(predictors: typing.Tuple[GPy.models.GPRegression, GPy.models.GPRegression],
+                              tspan: typing.Optional[typing.Sequence[float]] = None):
+    """create the 'digital twin' used by the predictor component
+
+    :param tspan: when given, the predictors are evaluated once over these times, and the surrogate interpolates
+        them instead of calling the predictors at every tick
+    """
     # import relevant f16 objects
     from f16lib.messages import F16ControllerOutputMessage, F16PlantOutputMessage, F16PlantStateMessage
 
+    if tspan is not None:
+        ttable = np.asarray(tspan, dtype=float)
+        ptables = [predictor.predict(ttable[:, np.newaxis])[0].flatten() for predictor in predictors]
+
     # infer flows from the GP predictors
     def surrogate_state_update(model, t, states, inputs):
         state = list(f16_xequil.copy())
-        state[9:11] = [predictor.predict(np.array([[t]]))[0][0][0] for predictor in predictors]
+        if tspan is not None:
+            state[9:11] = [np.interp(t, ttable, ptable) for ptable in ptables]
+        else:
+            state[9:11] = [predictor.predict(np.array([[t]]))[0][0][0] for predictor in predictors]
         return state
 
     def surrogate_output(model, t, states, inputs):
@@ -102,15 +128,104 @@ def generate_surrogate_system(predictors: typing.Tuple[GPy.models.GPRegression,
     return _SurrogateSystem
 
 
+class OwnshipSurrogate:
+    """ persistent surrogate system for ownship predictions
+
+    the system is built and configured once, on first use. Every prediction restores its components from a snapshot
+    of the configured system and sets the new states, rather than creating the system again. Copies (e.g. in
+    snapshots of a predictor component) neither copy nor share the system, they build their own on first use.
+    """
+
+    def __init__(self, waypoints, system_type: typing.Type[csaf.System] = F16AcasShieldSurrogate):
+        self.waypoints = waypoints
+        self.system_type = system_type
+        self._system: typing.Optional[csaf.System] = None
+        self._initial: typing.Optional[SystemSnapshot] = None
+
+    @property
+    def system(self) -> csaf.System:
+        """configured surrogate system (built on first use)"""
+        if self._system is None:
+            self._system = self.system_type()
+            self._system.set_component_param('waypoint', 'waypoints', self.waypoints)
+            self._initial = self._system.snapshot()
+        return self._system
+
+    def simulate(self, states: typing.Mapping[str, typing.Sequence], tspan) -> typing.Dict[str, csaf.TimeTrace]:
+        """ simulate the surrogate from states
+
+        :param states: component name -> initial states
+        :param tspan: time span (tmin, tmax)
+        """
+        system = self.system
+        system.restore(self._initial)  # type: ignore
+        for cname, cstates in states.items():
+            system.set_state(cname, cstates)
+        return system.simulate_tspan(tspan, snapshot=system.snapshot())  # type: ignore
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        return {**self.__dict__, "_system": None, "_initial": None}
+
+
+def propagate_kinematic(state: typing.Sequence, waypoints: typing.Sequence, tspan: typing.Sequence[float],
+                        airspeed: float = 550.0, max_accel: float = 10.0, k_prop_psi: float = 5.0,
+                        max_bank_deg: float = 65.0, roll_time_constant: float = 1.0, max_roll_rate: float = 0.3,
+                        slant_range_threshold: float = 250.0) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """ reduced fidelity ownship prediction, following the waypoints with coordinated turns
+
+    the bank angle is steered toward the command of the waypoint autopilot (heading error times k_prop_psi, bounded
+    to max_bank_deg) as a first order lag with a bounded roll rate, the turn rate is g tan(bank) / airspeed, and
+    the airspeed approaches the autopilot airspeed with a bounded acceleration. A waypoint is passed when it is
+    within the slant range threshold. The defaults fit the F16 waypoint autopilot to about 150 ft over 10 s.
+
+    :param state: F16 plant states at tspan[0]
+    :param waypoints: (east, north, altitude) waypoints
+    :param tspan: increasing prediction times
+    :return: (north, east) positions at tspan
+    """
+    g = 32.17
+    vt, phi, psi = float(state[0]), float(state[3]), float(state[5])
+    n, e, alt = float(state[9]), float(state[10]), float(state[11])
+    max_bank = np.deg2rad(max_bank_deg)
+    times = np.asarray(tspan, dtype=float)
+    north, east = np.empty(len(times)), np.empty(len(times))
+    widx = 0
+    for idx, t in enumerate(times):
+        if idx > 0:
+            dt = t - times[idx - 1]
+            phi_cmd = 0.0
+            if widx < len(waypoints):
+                psi_cmd = np.pi / 2 - np.arctan2(waypoints[widx][1] - n, waypoints[widx][0] - e)
+                psi_err = (psi_cmd - psi + np.pi) % (2 * np.pi) - np.pi
+                phi_cmd = min(max(psi_err * k_prop_psi, -max_bank), max_bank)
+            phi += min(max((phi_cmd - phi) / roll_time_constant, -max_roll_rate), max_roll_rate) * dt
+            psi_rate = g * np.tan(phi) / vt
+            dv = min(max(airspeed - vt, -max_accel * dt), max_accel * dt)
+            # advance along the arc at the mid step heading and airspeed
+            psi_mid, vt_mid = psi + 0.5 * psi_rate * dt, vt + 0.5 * dv
+            n += vt_mid * np.cos(psi_mid) * dt
+            e += vt_mid * np.sin(psi_mid) * dt
+            psi += psi_rate * dt
+            vt += dv
+        while widx < len(waypoints) and np.linalg.norm([waypoints[widx][0] - e, waypoints[widx][1] - n,
+                                                         waypoints[widx][2] - alt]) < slant_range_threshold:
+            widx += 1
+        north[idx], east[idx] = n, e
+    return north, east
+
+
 class PredictorBuffer:
     import numpy as np
 
     # number of steps to take before re-running predictor
     n_steps = 5
 
-    def __init__(self):
-        self.pstates = [] #deque(maxlen=5*10)
-        self.times = []
+    def __init__(self, maxlen: typing.Optional[int] = None):
+        """
+        :param maxlen: keep only the last maxlen samples (all when None)
+        """
+        self.pstates: typing.Deque = collections.deque(maxlen=maxlen)
+        self.times: typing.Deque = collections.deque(maxlen=maxlen)
         self.init_out = [0.,0.,0.,0.7]
         self._finished = False
 
@@ -139,6 +254,15 @@ class PredictorBuffer:
 class CollisionPredictor:
     surrogate_type = F16AcasShieldSurrogate
 
+    # prediction modes
+    #   full: GPs are trained from scratch over the whole history
+    #   windowed: GPs are kept between retrains, trained over the last window samples and warm started from their
+    #       previous hyperparameters, so the cost of a retrain is bounded
+    modes = ("full", "windowed")
+
+    # optimizer iterations of a warm started retrain
+    warm_iters: int = 10
+
     @staticmethod
     def prod_kernel():
         kern0 = GPy.kern.RBF(1, lengthscale=40, variance=5)
@@ -158,6 +282,15 @@ class CollisionPredictor:
         my.optimize()
         return mx, my
 
+    @staticmethod
+    def update_predictors(predictors, tspan, pstates, idx=0, max_iters=None):
+        """retrain GP predictors over new data, starting from their current hyperparameters"""
+        tt = np.array(tspan)[:, np.newaxis]
+        for m, col in zip(predictors, (9+13*idx, 10+13*idx)):
+            m.set_XY(tt, pstates[:, col][:, np.newaxis])
+            m.optimize(max_iters=max_iters if max_iters is not None else CollisionPredictor.warm_iters)
+        return predictors
+
     @staticmethod
     def predict_intruder(tt, tspan, pstates, predictors, idx=0):
         #tt = (np.arange(0, len(pstates), 1) / 10)[:, np.newaxis]
@@ -169,23 +302,30 @@ class CollisionPredictor:
         return (tt.flatten(), xt.flatten(), yt.flatten()), (x.flatten(), xv.flatten()), (y.flatten(), yv.flatten())
 
     @staticmethod
-    def predict_ownship(tt, tspan, pstates, waypoints, idx=0):
+    def predict_ownship(tt, tspan, pstates, waypoints, idx=0, surrogate: typing.Optional[OwnshipSurrogate] = None):
+        """ predict the ownship positions by simulating a surrogate system
+
+        :param surrogate: persistent surrogate to simulate (a new surrogate system is created when None)
+        """
         #tt = (np.arange(0, len(pstates), 1) / 10)[:, np.newaxis]
         xt = (pstates[:, 10+idx*13])[:, np.newaxis]
         yt = (pstates[:, 9+idx*13])[:, np.newaxis]
 
         tr = min(tspan), max(tspan)
 
-        # create pub/sub components out of the configuration
-        alt_system = CollisionPredictor.surrogate_type()
-
         # set the scenario states
-        alt_system.set_state('plant', pstates[-1, :13])
-        alt_system.set_state('intruder_plant', pstates[-1, 13:26])
-        alt_system.set_state('balloon', pstates[-1, 26:39])
-        alt_system.set_component_param('waypoint', 'waypoints', waypoints)
-        trajs = alt_system.simulate_tspan(tr - min(tr),
-                                         show_status=False)
+        states = {'plant': pstates[-1, :13], 'intruder_plant': pstates[-1, 13:26], 'balloon': pstates[-1, 26:39]}
+        trajs: typing.Any
+        if surrogate is not None:
+            trajs = surrogate.simulate(states, (0.0, max(tr) - min(tr)))
+        else:
+            # create pub/sub components out of the configuration
+            alt_system = CollisionPredictor.surrogate_type()
+            for cname, cstates in states.items():
+                alt_system.set_state(cname, cstates)
+            alt_system.set_component_param('waypoint', 'waypoints', waypoints)
+            trajs = alt_system.simulate_tspan(tr - min(tr),
+                                             show_status=False)
 
         x = np.array(trajs['plant'].states)[:, 10]
         xv = np.zeros(x.shape)
@@ -202,15 +342,48 @@ class CollisionPredictor:
                 (x.flatten(), xv.flatten()), \
                 (y.flatten(), yv.flatten())
 
-
-    def __init__(self, waypoints, own_waypoints):
+    @staticmethod
+    def predict_ownship_kinematic(tt, tspan, pstates, waypoints, idx=0):
+        """predict the ownship positions with the kinematic turn rate model (see propagate_kinematic)"""
+        xt = (pstates[:, 10+idx*13])[:, np.newaxis]
+        yt = (pstates[:, 9+idx*13])[:, np.newaxis]
+        y, x = propagate_kinematic(pstates[-1, idx*13:(idx+1)*13], waypoints, tspan)
+        return (tt.flatten(), xt.flatten(), yt.flatten()), \
+                (x, np.zeros(x.shape)), \
+                (y, np.zeros(y.shape))
+
+
+    # ownship models
+    #   surrogate: simulate a surrogate system, kept between predictions
+    #   kinematic: coordinated turns toward the waypoints (reduced fidelity, faster still)
+    ownship_models = ("surrogate", "kinematic")
+
+    def __init__(self, waypoints, own_waypoints, mode="full", window=100, ownship_model="surrogate"):
+        """
+        :param mode: prediction mode (see modes)
+        :param window: number of samples used by the windowed mode
+        :param ownship_model: ownship prediction model (see ownship_models)
+        """
+        assert mode in self.modes, f"predictor mode must be one of {self.modes} (got {mode})"
+        assert ownship_model in self.ownship_models, \
+            f"ownship model must be one of {self.ownship_models} (got {ownship_model})"
         self.intruder_waypoints = waypoints
         self.own_waypoints = own_waypoints
-        self.pbuffer = PredictorBuffer()
+        self.mode = mode
+        self.ownship_model = ownship_model
+        self._surrogate: typing.Optional[OwnshipSurrogate] = None
+        self.pbuffer = PredictorBuffer(window if mode == "windowed" else None)
         self.step_count = 0
         self.prev_ret = False
         self.predictors = None
 
+    @property
+    def surrogate(self) -> OwnshipSurrogate:
+        """persistent surrogate system of the ownship (created on first use)"""
+        if self._surrogate is None:
+            self._surrogate = OwnshipSurrogate(self.own_waypoints, self.surrogate_type)
+        return self._surrogate
+
     def step(self, t, comp_input):
         if len(self.pbuffer.times) == 0 or not np.isclose(t, self.pbuffer.times[-1]):
             self.pbuffer.step(t, comp_input)
@@ -236,6 +409,9 @@ class CollisionPredictor:
     def train_predictors(self):
         #t = np.arange(0, len(self.pbuffer.buffer), 1) / 10.0
         t = self.pbuffer.tbuffer
+        if self.mode == "windowed" and self.predictors is not None:
+            self.predictors = self.update_predictors(self.predictors, t, self.pbuffer.buffer, 1)
+            return self.predictors
         wt, wp = self.build_waypoints()
         predictors = self.make_predictors(
             [*t, *wt],
@@ -247,13 +423,28 @@ class CollisionPredictor:
         self.predictors = predictors
         return predictors
 
+    def horizon(self) -> np.ndarray:
+        """prediction times, over 10 s from the last buffered sample"""
+        t = self.pbuffer.tbuffer
+        return np.arange(max(t), max(t) + 10.0, 0.1)
+
+    def surrogate_system(self):
+        """'digital twin' of the intruder, with the predictions tabulated over the horizon in one call"""
+        if self.predictors is None: self.train_predictors()
+        return generate_surrogate_system(self.predictors, tspan=self.horizon())
+
     def make_pos_prediction(self):
         t = self.pbuffer.tbuffer
-        tspan = np.arange(max(t), max(t) + 10.0, 0.1)
+        tspan = self.horizon()
         #predictors = self.train_predictors()
         if self.predictors is None: self.train_predictors()
         _, (intx, _), (inty, _) = self.predict_intruder(t, tspan, self.pbuffer.buffer, self.predictors, idx=1)
-        _, (ownx, _), (owny, _) = self.predict_ownship(t, tspan, self.pbuffer.buffer, self.own_waypoints)
+        if self.ownship_model == "kinematic":
+            _, (ownx, _), (owny, _) = self.predict_ownship_kinematic(t, tspan, self.pbuffer.buffer,
+                                                                     self.own_waypoints)
+        else:
+            _, (ownx, _), (owny, _) = self.predict_ownship(t, tspan, self.pbuffer.buffer, self.own_waypoints,
+                                                           surrogate=self.surrogate)
         return (ownx, owny), (intx, inty)
 
     def make_prediction(self):
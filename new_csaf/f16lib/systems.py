@@ -1,9 +1,22 @@
+from csaf.core.events import ZeroCrossing
 from csaf.core.system import System
 import numpy as np
 import typing
 import f16lib.components as f16c
 
 
+def altitude(states: typing.Sequence[float]) -> float:
+    """altitude (ft) of F16 plant states"""
+    return states[11]
+
+
+def ground_collision_crossing(component_name: str = "plant") -> ZeroCrossing:
+    """
+    ground collision condition, as the altitude of an aircraft crossing zero
+    """
+    return ZeroCrossing(component_name, altitude, direction=-1, name="ground_collision")
+
+
 class F16Simple(System):
     components = {
         "plant": f16c.F16PlantComponent,
@@ -20,7 +33,8 @@ class F16Simple(System):
         ("autopilot", "inputs_pstates"): ("plant", "states")
     }
 
-    priority: typing.Optional[typing.Sequence[str]] = None
+    # at a shared sampling instant, the autopilot reads the new plant state before the llc tracks its command
+    priority: typing.Optional[typing.Sequence[str]] = ["plant", "autopilot", "llc"]
 
 
 class F16AirspeedSimple(F16Simple):
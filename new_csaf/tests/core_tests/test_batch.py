@@ -0,0 +1,119 @@
+import typing
+
+import numpy as np
+import pytest
+
+import csaf
+from csaf.core.batch import BatchSimulation
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+class DecayState(typing.NamedTuple):
+    x: float
+
+
+class DecayComponent(csaf.ContinuousComponent):
+    name = "Decay"
+    sampling_frequency = 10.0
+    default_parameters = {"rate": 1.0}
+    inputs = (("inputs", DecayState),)
+    outputs = (("outputs", DecayState),)
+    states = DecayState
+    default_initial_values = {"states": [1.0], "inputs": [0.0]}
+    flows = {
+        "states": lambda m, t, s, u: -m.rate * np.asarray(s) + np.asarray(u),
+        "outputs": lambda m, t, s, u: np.asarray(s)
+    }
+    is_vectorized = True
+
+
+class GainComponent(csaf.DiscreteComponent):
+    name = "Gain"
+    sampling_frequency = 5.0
+    default_parameters = {"gain": 0.5}
+    inputs = (("inputs", DecayState),)
+    outputs = (("outputs", DecayState),)
+    states = f16c.EmptyMessage
+    default_initial_values = {"states": [], "inputs": [0.0]}
+    flows = {
+        "outputs": lambda m, t, s, u: [m.gain * u[0]]
+    }
+
+
+class DecaySystem(csaf.System):
+    components = {"plant": DecayComponent, "gain": GainComponent}
+    connections = {
+        ("plant", "inputs"): ("gain", "outputs"),
+        ("gain", "inputs"): ("plant", "outputs")
+    }
+
+
+def _single(system_type, tspan, ivs, params=None):
+    sys = system_type()
+    for cname, values in ivs.items():
+        for ivname, v in values.items():
+            sys.set_component_iv(cname, ivname, v)
+    for cname, values in (params or {}).items():
+        for pname, v in values.items():
+            sys.set_component_param(cname, pname, v)
+    return sys.simulate_tspan(tspan)
+
+
+def test_batch_vectorized_matches_single():
+    ivs = [{"plant": {"states": [x0]}} for x0 in (1.0, -2.0, 3.5)]
+    batch = DecaySystem().simulate_batch_tspan((0.0, 2.0), initial_values=ivs)
+    assert len(batch) == 3
+    for iv, traces in zip(ivs, batch):
+        ref = _single(DecaySystem, (0.0, 2.0), iv)
+        assert traces["plant"].times == ref["plant"].times
+        assert np.allclose(traces["plant"].states, ref["plant"].states, rtol=1E-5, atol=1E-7)
+        assert np.allclose(traces["gain"].outputs, ref["gain"].outputs, rtol=1E-5, atol=1E-7)
+
+
+def test_batch_parameters_fall_back_to_members():
+    params = [{"plant": {"rate": r}} for r in (0.5, 2.0)]
+    batch = DecaySystem().simulate_batch_tspan((0.0, 1.0), parameters=params)
+    for p, traces in zip(params, batch):
+        ref = _single(DecaySystem, (0.0, 1.0), {}, p)
+        assert np.allclose(traces["plant"].states, ref["plant"].states)
+
+
+def test_batch_f16_termination():
+    def ground_collision(cname, outs):
+        return cname == "plant" and outs["states"][11] <= 0.0
+
+    low = list(f16c.f16_gcas_scen)
+    low[11] = 200.0
+    ivs = [{"plant": {"states": f16c.f16_gcas_scen}}, {"plant": {"states": low}}]
+    batch, passed = f16s.F16Simple().simulate_batch_tspan((0.0, 5.0),
+                                                          initial_values=ivs,
+                                                          terminating_conditions=ground_collision,
+                                                          return_passed=True)
+    assert passed == [True, False]
+    ref = _single(f16s.F16Simple, (0.0, 5.0), ivs[0])
+    # the plant integrates the stacked states as one ODE, so its steps differ from the single simulation
+    assert np.allclose(batch[0]["plant"].states, ref["plant"].states, rtol=1E-5, atol=1E-5)
+    assert batch[0]["autopilot"].fdas == ref["autopilot"].fdas
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_batch_f16_vectorized(compiled):
+    high = list(f16c.f16_gcas_scen)
+    high[11] = 4000.0
+    ivs = [{"plant": {"states": f16c.f16_gcas_scen}}, {"plant": {"states": high}}]
+    sys = f16s.F16Simple()
+    sys.set_component_param("plant", "compiled", compiled)
+    members = sys.batch_members(initial_values=ivs)
+    batch = BatchSimulation(members)
+    dtraces, passed = batch.simulate_tspan((0.0, 3.0))
+    assert {"plant", "llc"} <= batch._vectorized
+    for iv, traces in zip(ivs, dtraces):
+        ref = _single(f16s.F16Simple, (0.0, 3.0), iv, {"plant": {"compiled": compiled}})
+        assert np.allclose(traces["plant"].states, ref["plant"].states, rtol=1E-5, atol=1E-5)
+        assert np.allclose(traces["llc"].outputs, ref["llc"].outputs, rtol=1E-5, atol=1E-5)
+
+
+def test_batch_requires_configurations():
+    with pytest.raises(AssertionError):
+        DecaySystem().simulate_batch_tspan((0.0, 1.0))
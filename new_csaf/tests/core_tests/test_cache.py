@@ -0,0 +1,142 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from csaf.core.cache import ResultCache, enable_cache, disable_cache, get_cache, simulation_key, _called_functions
+from csaf.core.monitor import RunningMin
+import f16lib.components as f16c
+import f16lib.systems as f16s
+import f16lib.models.f16 as f16
+import f16lib.models.llc as llc
+import f16lib.models.helpers.f16plant_kernel as pk
+import f16lib.models.helpers.llc_helper as lh
+
+
+@pytest.fixture
+def cache(tmp_path):
+    yield enable_cache(tmp_path)
+    disable_cache()
+
+
+def test_result_cache_lru(tmp_path):
+    rc = ResultCache(tmp_path, max_bytes=4000)
+    payload = bytes(1000)
+    for idx in range(3):
+        rc.put(f"k{idx}", payload)
+        # distinct access times, in the past
+        os.utime(rc.path(f"k{idx}"), (time.time() - 10 + idx, time.time() - 10 + idx))
+    assert len(rc) == 3 and rc.get("k0") == payload
+    rc.put("k3", payload)
+    # k1 is the least recently used after reading k0
+    assert rc.get("k1") is None
+    assert all(rc.get(k) == payload for k in ("k0", "k2", "k3"))
+    assert rc.size <= 4000 and rc.hits == 4 and rc.misses == 1
+
+    rc.path("bad").write_bytes(b"not a pickle")
+    assert rc.get("bad") is None and not rc.path("bad").exists()
+
+
+def test_simulation_key():
+    system = f16s.F16Simple()
+    key = simulation_key(system, (0.0, 10.0))
+    assert key is not None and key == simulation_key(f16s.F16Simple(), (0, 10))
+    assert key != simulation_key(system, (0.0, 5.0))
+    system.set_state("plant", f16c.f16_gcas_scen)
+    assert key != simulation_key(system, (0.0, 10.0))
+    assert simulation_key(system, (0.0, 10.0), terminating_conditions_all=RunningMin("plant", index=11)) != \
+        simulation_key(system, (0.0, 10.0), terminating_conditions_all=RunningMin("plant", index=11, below=500.0))
+    # objects without a stable hash are not cached
+    assert simulation_key(system, (0.0, 10.0), terminating_conditions_all=object()) is None
+
+    # a parameter set again replaces its earlier value, so reused systems keep the key of their configuration
+    reused, fresh = f16s.F16Simple(), f16s.F16Simple()
+    reused.set_component_param("autopilot", "NzMax", 5.0)
+    reused.set_component_param("autopilot", "NzMax", 7.0)
+    fresh.set_component_param("autopilot", "NzMax", 7.0)
+    assert simulation_key(reused, (0.0, 10.0)) == simulation_key(fresh, (0.0, 10.0))
+
+    # system settings
+    fresh.skip_unchanged = False
+    assert simulation_key(reused, (0.0, 10.0)) != simulation_key(fresh, (0.0, 10.0))
+
+
+def test_simulation_key_code_and_files(tmp_path):
+    # the functions the flows call, through module attributes and compiled kernels
+    called = _called_functions(f16.model_state_update)
+    assert f16._subf16df in called and pk.subf16df_stacked_kernel.py_func in called
+
+    model = tmp_path / "weights.npz"
+    model.write_bytes(b"0")
+
+    class Plant(f16c.F16PlantComponent):
+        model_files = (str(model),)
+
+    class System(f16s.F16Simple):
+        components = {**f16s.F16Simple.components, "plant": Plant}
+
+    key = simulation_key(System(), (0.0, 10.0))
+    assert key is not None and key != simulation_key(f16s.F16Simple(), (0.0, 10.0))
+    model.write_bytes(b"1")
+    assert simulation_key(System(), (0.0, 10.0)) != key
+
+    # the methods of the classes an initializer creates (the LLC feedback controller)
+    called = _called_functions(llc.model_init)
+    assert lh.FeedbackController._der in called and lh.clip_u in called
+
+    # the methods of the classes of objects in the parameters
+    keys = []
+    for scale in ("2.0", "3.0"):
+        namespace = {"__name__": __name__}
+        exec(f"class Gain:\n    def apply(self, x):\n        return {scale} * x\n", namespace)
+
+        class Autopilot(f16c.F16GcasComponent):
+            default_parameters = {**f16c.F16GcasComponent.default_parameters, "gain": namespace["Gain"]()}
+
+        class GainSystem(f16s.F16Simple):
+            components = {**f16s.F16Simple.components, "autopilot": Autopilot}
+
+        keys.append(simulation_key(GainSystem(), (0.0, 10.0)))
+    assert None not in keys and keys[0] != keys[1]
+
+
+def test_simulate_cached(cache):
+    assert get_cache() is cache
+    system = f16s.F16Simple()
+    system.set_state("plant", f16c.f16_gcas_scen)
+    monitor = RunningMin("plant", index=11)
+    trajs, passed = system.simulate_tspan((0.0, 3.0), terminating_conditions_all=monitor, return_passed=True)
+    assert len(cache) == 1 and cache.hits == 0
+    value = monitor.value
+
+    # a new system with the same definition is served from the cache, and the monitor set to its stored state
+    other = f16s.F16Simple()
+    other.set_state("plant", f16c.f16_gcas_scen)
+    monitor = RunningMin("plant", index=11)
+    ctrajs, cpassed = other.simulate_tspan((0.0, 3.0), terminating_conditions_all=monitor, return_passed=True)
+    assert cache.hits == 1 and cpassed == passed and monitor.value == value
+    assert all(np.array_equal(ctrajs[k].times, trajs[k].times) for k in trajs)
+    assert np.array_equal(ctrajs["plant"].states, trajs["plant"].states)
+    assert other.validate_tspan((0.0, 3.0), terminating_conditions_all=monitor) and cache.hits == 2
+
+    # changes and opting out miss the cache
+    other.set_component_param("autopilot", "NzMax", 5.0)
+    other.simulate_tspan((0.0, 3.0), terminating_conditions_all=monitor)
+    other.simulate_tspan((0.0, 3.0), terminating_conditions_all=monitor, use_cache=False)
+    assert cache.hits == 2 and len(cache) == 2
+
+
+def test_simulate_cached_crossings(cache):
+    system = f16s.F16Simple()
+    state = list(f16c.f16_gcas_scen)
+    state[11] = 200.0
+    system.set_state("plant", state)
+    zero_crossings = [f16s.ground_collision_crossing()]
+    trajs = system.simulate_tspan((0.0, 5.0), zero_crossings=zero_crossings)
+    crossings = system.crossings
+    ctrajs = system.simulate_tspan((0.0, 5.0), zero_crossings=zero_crossings)
+    assert cache.hits == 1 and system.crossings == crossings and len(crossings) == 1
+    assert ctrajs["plant"].times[-1] == trajs["plant"].times[-1] == crossings[0].time
+    system.simulate_tspan((0.0, 5.0))
+    assert cache.hits == 1 and system.crossings == []
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from csaf.core.events import ZeroCrossing
+from csaf.core.monitor import Monitor
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+class CrossingCounter(Monitor):
+    """monitor of the crossings only"""
+    per_sample = False
+
+    def __init__(self):
+        self.names = []
+
+    def reset(self, traces):
+        self.names = []
+
+    def update(self, component_name, sample):
+        raise AssertionError("crossing monitors are not updated with samples")
+
+    def crossing(self, crossing):
+        self.names.append(crossing.name)
+        return False
+
+
+@pytest.fixture
+def low_f16():
+    system = f16s.F16Simple()
+    state = list(f16c.f16_gcas_scen)
+    state[11] = 200.0
+    system.set_state("plant", state)
+    yield system
+
+
+def test_terminal_crossing(low_f16):
+    """the simulation stops at the crossing, between two samples"""
+    trajs, passed = low_f16.simulate_tspan((0.0, 5.0), return_passed=True,
+                                           zero_crossings=[f16s.ground_collision_crossing()])
+    assert not passed and len(low_f16.crossings) == 1
+    crossing = low_f16.crossings[0]
+    assert crossing.name == "ground_collision" and crossing.direction == -1
+    assert crossing.states["plant"][11] == pytest.approx(0.0, abs=1E-6)
+    assert trajs["plant"].times[-1] == crossing.time and trajs["plant"].states[-1, 11] == pytest.approx(0.0, abs=1E-6)
+    assert trajs["plant"].states[-2, 11] > 0.0
+    assert all(t[-1] <= crossing.time for t in (trajs["llc"].times, trajs["autopilot"].times))
+
+    # the tick based condition stops at the first sample under the ground
+    ttrajs, _ = low_f16.simulate_tspan((0.0, 5.0), return_passed=True,
+                                       terminating_conditions=lambda c, o: c == "plant" and o["states"][11] <= 0.0)
+    assert ttrajs["plant"].times[-2] < crossing.time < ttrajs["plant"].times[-1]
+
+
+def test_nonterminal_crossings(low_f16):
+    below = ZeroCrossing("plant", lambda s: s[11] - 150.0, terminal=False, name="below")
+    above = ZeroCrossing("plant", lambda s: s[11] - 150.0, direction=1, terminal=False, name="above")
+    counter = CrossingCounter()
+    trajs, passed = low_f16.simulate_tspan((0.0, 0.5), return_passed=True, terminating_conditions_all=counter,
+                                           zero_crossings=[below, above])
+    assert passed and trajs["plant"].times[-1] == pytest.approx(0.5, abs=0.04)
+    assert counter.names == ["below"] == [c.name for c in low_f16.crossings]
+    assert np.isclose(low_f16.crossings[0].states["plant"][11], 150.0)
+
+
+def test_crossing_monolithic(low_f16):
+    """the states of grouped components within a step come from integrating the group again"""
+    class F16SimpleMonolithic(f16s.F16Simple):
+        monolithic = True
+
+    zero_crossings = [f16s.ground_collision_crossing()]
+    low_f16.simulate_tspan((0.0, 5.0), zero_crossings=zero_crossings)
+    system = F16SimpleMonolithic()
+    system.set_state("plant", low_f16.component_instances["plant"].initial_values["states"])
+    system.simulate_tspan((0.0, 5.0), zero_crossings=zero_crossings)
+    assert system.crossings[0].time == pytest.approx(low_f16.crossings[0].time, abs=1E-3)
+    assert system.crossings[0].states["plant"][11] == pytest.approx(0.0, abs=1E-6)
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+import csaf
+from csaf.core.monitor import Monitor, RunningMin, RunningMax, Always, Eventually, SeparationMonitor, AnyOf, \
+    as_monitor
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+def _feed(monitor, samples, cname="plant"):
+    monitor.reset({})
+    return [monitor.update(cname, {"times": t, "states": [v]}) for t, v in samples]
+
+
+def test_running_extrema():
+    samples = [(0.0, 3.0), (1.0, 1.0), (2.0, 2.0)]
+    rmin, rmax = RunningMin("plant", below=1.5), RunningMax("plant", above=2.5)
+    assert _feed(rmin, samples) == [False, True, True] and rmin.value == 1.0
+    assert _feed(rmax, samples) == [True, True, True] and rmax.value == 3.0
+    rmin.update("other", {"times": 3.0, "states": [-10.0]})
+    assert rmin.value == 1.0
+
+
+@pytest.mark.parametrize("window", [0.0, 0.5, 2.0])
+def test_windowed_robustness(window):
+    rng = np.random.default_rng(0)
+    times = np.arange(0.0, 10.0, 0.1)
+    values = rng.uniform(-1.0, 3.0, len(times))
+    always = Always("plant", window=window, threshold=-2.0)
+    eventually = Eventually("plant", window=window, threshold=2.5)
+    for m in (always, eventually):
+        m.reset({})
+    for idx, (t, v) in enumerate(zip(times, values)):
+        always.update("plant", {"times": t, "states": [v]})
+        eventually.update("plant", {"times": t, "states": [v]})
+        in_window = values[:idx + 1][times[:idx + 1] >= t - window]
+        assert np.isclose(always.robustness, np.min(in_window) + 2.0)
+        assert np.isclose(eventually.robustness, np.max(in_window) - 2.5)
+
+
+def test_eventually_dwell():
+    # never above 1.0 for a whole window of 1s
+    samples = [(t, 0.0) for t in np.arange(0.0, 2.0, 0.25)]
+    res = _feed(Eventually("plant", window=1.0, threshold=1.0), samples)
+    assert res.index(True) == 4
+
+
+def test_separation_and_any_of():
+    sep = SeparationMonitor("a", ["b"], 1.0, indices=slice(0, 2))
+    other = RunningMax("c", above=10.0)
+    monitor = AnyOf(sep, other)
+    monitor.reset({})
+    assert not monitor.update("a", {"times": 0.0, "states": [0.0, 0.0]})
+    assert not monitor.update("b", {"times": 0.0, "states": [3.0, 4.0]})
+    assert sep.separation == 5.0
+    assert monitor.update("b", {"times": 1.0, "states": [0.5, 0.0]})
+    assert other.value == -np.inf
+
+
+def test_monitor_matches_condition():
+    def ground(ctraces):
+        states = ctraces["plant"].states
+        return bool(states) and np.min(states[:, 11]) < 1000.0
+
+    results = []
+    for cond in (ground, RunningMin("plant", index=11, below=1000.0)):
+        system = f16s.F16Simple()
+        low = list(f16c.f16_gcas_scen)
+        low[11] = 1100.0
+        system.set_state("plant", low)
+        trajs, passed = system.simulate_tspan((0.0, 5.0), terminating_conditions_all=cond, return_passed=True)
+        results.append((len(trajs["plant"]), passed))
+    assert results[0] == results[1] and not results[0][1]
+
+
+class _CountingMonitor(Monitor):
+    def __init__(self, per_sample: bool, stop_after: int = -1):
+        self.per_sample = per_sample
+        self.stop_after = stop_after
+        self.count = 0
+
+    def update(self, component_name, sample):
+        self.count += 1
+        return self.count == self.stop_after
+
+
+def test_env_monitor_per_sample():
+    """the system env updates only the monitors of samples, and stops when they terminate"""
+    class _Env(csaf.SystemEnv):
+        system_type = f16s.F16Simple
+        agents = ["autopilot"]
+
+    crossings, samples = _CountingMonitor(per_sample=False), _CountingMonitor(per_sample=True, stop_after=50)
+    for monitor in (crossings, AnyOf(crossings, samples)):
+        env = _Env(terminating_conditions_all=monitor)
+        env.reset()
+        out = env.step(None)
+        nsteps = 0
+        while out is not None and nsteps < 100:
+            try:
+                out = env.step({flow: env.system.get_signal("autopilot", flow) for flow in ("states", "fdas", "outputs")})
+            except StopIteration:
+                break
+            nsteps += 1
+        assert crossings.count == 0
+    assert samples.count == 50 and nsteps < 100
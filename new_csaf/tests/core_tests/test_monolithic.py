@@ -0,0 +1,72 @@
+import typing
+
+import numpy as np
+
+import csaf
+import f16lib.components as f16c
+import f16lib.systems as f16s
+from csaf.core.monolithic import find_continuous_groups
+
+
+class Scalar(typing.NamedTuple):
+    x: float
+
+
+class IntegratorComponent(csaf.ContinuousComponent):
+    """x' = sign * u"""
+    name = "Integrator"
+    sampling_frequency = 10.0
+    default_parameters = {"sign": 1.0}
+    inputs = (("inputs", Scalar),)
+    outputs = (("outputs", Scalar),)
+    states = Scalar
+    default_initial_values = {"states": [0.0], "inputs": [0.0]}
+    flows = {
+        "states": lambda m, t, s, u: [m.sign * u[0]],
+        "outputs": lambda m, t, s, u: [s[0]]
+    }
+
+
+class OscillatorSystem(csaf.System):
+    """x' = -y, y' = x split into two components"""
+    components = {"x": IntegratorComponent, "y": IntegratorComponent}
+    connections = {
+        ("x", "inputs"): ("y", "outputs"),
+        ("y", "inputs"): ("x", "outputs")
+    }
+
+
+def _oscillator(monolithic: bool):
+    sys = OscillatorSystem()
+    sys.monolithic = monolithic
+    sys.set_component_param("x", "sign", -1.0)
+    sys.set_state("x", [1.0])
+    sys.set_state("y", [0.0])
+    return sys.simulate_tspan((0.0, 5.0))
+
+
+def test_monolithic_groups():
+    sys = f16s.F16AcasShieldIntruderBalloon()
+    sys.initialize_buffer()
+    groups = sorted(sorted(g.names) for g in find_continuous_groups(sys))
+    assert groups == [["intruder_llc", "intruder_plant"], ["llc", "plant"]]
+
+
+def test_monolithic_removes_zoh_error():
+    split, mono = _oscillator(False), _oscillator(True)
+    times = np.array(mono["x"].times)
+    exact = np.cos(times)
+    err_split = np.max(np.abs(np.array(split["x"].states)[:, 0] - exact))
+    err_mono = np.max(np.abs(np.array(mono["x"].states)[:, 0] - exact))
+    assert err_mono < 1E-4
+    assert err_mono < err_split / 100
+
+
+def test_monolithic_gcas():
+    sys = f16s.F16Simple()
+    sys.monolithic = True
+    sys.set_state("plant", f16c.f16_gcas_scen)
+    _, passed = sys.simulate_tspan((0.0, 20.0),
+                                   terminating_conditions=lambda c, o: c == "plant" and o["states"][11] <= 0.0,
+                                   return_passed=True)
+    assert passed
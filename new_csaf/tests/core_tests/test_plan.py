@@ -0,0 +1,64 @@
+import numpy as np
+
+from csaf.core.plan import ExecutionPlan
+import f16lib.systems as f16s
+
+
+def test_plan_is_shared_per_system():
+    plan = ExecutionPlan.compile(f16s.F16Simple)
+    assert ExecutionPlan.compile(f16s.F16Simple) is plan
+    assert f16s.F16Simple().execution_plan is plan
+
+
+def test_plan_routes_connections():
+    sys = f16s.F16Shield()
+    sys.initialize_buffer()
+    plan = sys.execution_plan
+    for cname, component in sys.component_instances.items():
+        expected = []
+        for inname in component.inputs_names:
+            expected += sys.get_signal(*sys.connections.get((cname, inname), (cname, inname)))
+        assert sys.build_input_vec(cname) == expected
+        assert len(plan.inputs[cname]) == sum(len(m.__annotations__) for _, m in component.inputs)
+    assert len(set(np.concatenate([np.arange(sl.start, sl.stop) for sl in plan.slices.values()]))) == plan.size
+
+
+def test_plan_numeric_storage():
+    """float signals are stored in the float array, the others (e.g. autopilot modes) in the object array"""
+    sys = f16s.F16Simple()
+    sys.initialize_buffer()
+    plan = sys.execution_plan
+    assert ("plant", "states") in plan.numeric
+    assert ("autopilot", "states") not in plan.numeric
+    assert sys._signals.dtype == np.float64
+    assert sys.get_signal("autopilot", "states") == ["Waiting"]
+    assert all(type(v) is float for v in sys.get_signal("plant", "states"))
+    assert plan.input_masks["plant"] is None
+    snap = sys.snapshot()
+    sys.write_signals("autopilot", {"states": ["Roll"]})
+    sys.restore(snap)
+    assert sys.get_signal("autopilot", "states") == ["Waiting"]
+
+
+def test_skip_unchanged():
+    """pure components at a fixed point of their inputs are not updated again, with the same traces"""
+    system = f16s.F16AcasShieldIntruderBalloon()
+    trajs = system.simulate_tspan((0.0, 10.0))
+    assert system._nskipped > 0
+    system.skip_unchanged = False
+    full = system.simulate_tspan((0.0, 10.0))
+    assert system._nskipped == 0
+    for cname in trajs:
+        assert np.array_equal(trajs[cname].times, full[cname].times)
+        for name in trajs[cname].names:
+            assert np.array_equal(trajs[cname][name], full[cname][name]), f"{cname} {name} differ"
+
+
+def test_versions_tracked_only():
+    """only the signals pure components depend on count versions"""
+    system = f16s.F16AcasShieldIntruderBalloon()
+    system.simulate_tspan((0.0, 2.0))
+    plan = system.execution_plan
+    assert ("plant", "states") not in plan.tracked
+    assert all(system._versions[idx] == 0 for key, idx in plan.versions.items() if key not in plan.tracked)
+    assert any(system._versions[plan.versions[key]] > 0 for key in plan.tracked)
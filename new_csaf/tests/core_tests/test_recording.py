@@ -0,0 +1,61 @@
+import numpy as np
+
+from csaf.core.monitor import RunningMin
+from csaf.core.recording import RecordingPolicy
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+def test_recording_selection():
+    system = f16s.F16Simple()
+    system.set_state("plant", f16c.f16_gcas_scen)
+    full = system.simulate_tspan((0.0, 3.0))
+    policy = RecordingPolicy(include={"plant": ["states"], "autopilot": None}, exclude={"autopilot": ["fdas"]})
+    trajs = system.simulate_tspan((0.0, 3.0), recording=policy)
+    assert set(trajs) == {"plant", "autopilot"}
+    assert set(trajs["plant"].names) == {"times", "states"}
+    assert set(trajs["autopilot"].names) == {"times", "states", "outputs"}
+    assert np.array_equal(trajs["plant"].states, full["plant"].states)
+
+
+def test_recording_decimation():
+    system = f16s.F16Simple()
+    system.set_state("plant", f16c.f16_gcas_scen)
+    full = system.simulate_tspan((0.0, 10.0))
+    monitor = RunningMin("plant", index=11)
+    trajs = system.simulate_tspan((0.0, 10.0), terminating_conditions_all=monitor,
+                                  recording=RecordingPolicy(include=["plant", "llc"], rate={"plant": 5.0}))
+    # every sixth plant sample (30 Hz), all of the llc samples, and the monitor sees every sample
+    assert np.allclose(trajs["plant"].times, full["plant"].times[::6])
+    assert np.array_equal(trajs["plant"].states, full["plant"].states[::6])
+    assert len(trajs["llc"]) == len(full["llc"])
+    assert monitor.value == np.min(full["plant"].states[:, 11])
+
+    # the last samples only
+    trajs = system.simulate_tspan((0.0, 10.0), recording=RecordingPolicy(include=["plant"], last=10))
+    assert np.array_equal(trajs["plant"].times, full["plant"].times[-10:])
+
+
+def test_recording_crossing():
+    system = f16s.F16Simple()
+    state = list(f16c.f16_gcas_scen)
+    state[11] = 200.0
+    system.set_state("plant", state)
+    trajs = system.simulate_tspan((0.0, 5.0), zero_crossings=[f16s.ground_collision_crossing()],
+                                  recording=RecordingPolicy(include=["plant"], rate=1.0))
+    assert trajs["plant"].times[-1] == system.crossings[0].time
+    assert np.allclose(trajs["plant"].times[:-1], np.arange(0.0, system.crossings[0].time, 1.0))
+
+
+def test_recording_shared_policy():
+    system = f16s.F16Simple()
+    policy = RecordingPolicy(include=["plant"], rate=1.0)
+    first = policy.create_traces(system.component_instances)
+    second = policy.create_traces(system.component_instances)
+    # simulations sharing the policy keep their own recording grid
+    sample = {name: [0.0] * 13 for name in first["plant"].names}
+    for t in np.arange(0.0, 3.0, 0.5):
+        policy.record(first, "plant", {**sample, "times": t})
+        policy.record(second, "plant", {**sample, "times": t + 0.25})
+    assert np.allclose(first["plant"].times, [0.0, 1.0, 2.0])
+    assert np.allclose(second["plant"].times, [0.25, 1.25, 2.25])
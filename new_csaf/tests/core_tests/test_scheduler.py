@@ -10,3 +10,43 @@ def test_scheduler():
     s = Scheduler({"a": a, "b": b}, ["a", "b"])
     assert len(s.get_schedule_tspan([1.0-1/30.0, 1.0])) == 1
     assert len(s.get_schedule_tspan([0.0, 1e-08])) == 2
+
+
+def test_scheduler_no_drift():
+    a = F16PlantComponent()
+    b = F16GcasComponent()
+    s = Scheduler({"a": a, "b": b}, ["b", "a"])
+    table = s.get_event_table([0.0, 1000.0])
+    assert len(table) == 30000 + 10000
+    # every gcas event coincides with a plant event, and comes first by priority
+    last = table[table['tick'] == 29997]
+    assert list(last['component']) == [0, 1]
+    assert last['time'][0] == last['time'][1] == 999.9
+    assert s.get_event_table([0.0, 1000.0]) is table
+
+
+def test_scheduler_coroutine_matches_tspan():
+    a = F16PlantComponent()
+    b = F16GcasComponent()
+    s = Scheduler({"a": a, "b": b}, ["a", "b"])
+    evts = s.get_schedule_tspan([0.5, 3.0])
+    sched = s.get_scheduler(0.5)
+    assert [next(sched) for _ in range(len(evts))] == evts
+
+
+def test_event_queue_wakeups():
+    a = F16PlantComponent()
+    b = F16GcasComponent()
+    s = Scheduler({"a": a, "b": b}, ["b", "a"])
+    assert list(s.get_event_queue((0.5, 3.0))) == s.get_schedule_tspan([0.5, 3.0])
+    assert list(s.get_event_queue((0.5, 3.0), after={"a": 1.0})) == \
+        [(c, t) for c, t in s.get_schedule_tspan([0.5, 3.0]) if c == "b" or t > 1.0]
+
+    # b is idle until 2.0 after its first event, then for the rest of the time span
+    queue = s.get_event_queue((0.0, 3.0))
+    btimes = []
+    for cname, ctime in queue:
+        if cname == "b":
+            btimes.append(ctime)
+            queue.hold("b", 2.0 if ctime < 2.0 else float("inf"))
+    assert btimes == [0.0, 2.0]
@@ -0,0 +1,56 @@
+import importlib.util
+import os
+import pathlib
+
+import numpy as np
+
+from csaf.core.trace import TimeTrace
+
+# the shared trace transfer of the workgroup runner in src, which only needs numpy
+_spec = importlib.util.spec_from_file_location(
+    "shared_traces", pathlib.Path(__file__).resolve().parents[3] / "src" / "shared_traces.py")
+shared_traces = importlib.util.module_from_spec(_spec)  # type: ignore
+_spec.loader.exec_module(shared_traces)  # type: ignore
+
+
+def make_traces():
+    plant = TimeTrace(["times", "states", "outputs"],
+                      [[0.0, 0.1, 0.2],
+                       [[1.0, 2.0], [1.5, 2.5], [2.0, 3.0]],
+                       [[0], [1], [2]]])
+    autopilot = TimeTrace(["times", "states", "outputs"],
+                          [[0.0, 0.5, 1.0],
+                           [["Waiting"], ["Roll"], ["Pull"]],
+                           [[], [], []]])
+    return {"plant": plant, "autopilot": autopilot}
+
+
+def test_pack_unpack_roundtrip(tmp_path):
+    trajs = make_traces()
+    desc = shared_traces.pack_traces(trajs, str(tmp_path))
+    assert os.path.exists(desc["filename"])
+    ret = shared_traces.unpack_traces(desc, TimeTrace)
+    # the file is removed once mapped
+    assert not os.path.exists(desc["filename"])
+    assert set(ret) == set(trajs)
+    for cname, trace in trajs.items():
+        assert ret[cname].names == trace.names
+        for name in trace.names:
+            assert np.array_equal(np.asarray(getattr(ret[cname], name)), np.asarray(getattr(trace, name)))
+    assert np.asarray(ret["plant"].outputs).dtype == np.asarray(trajs["plant"].outputs).dtype
+    assert ret["autopilot"].states == trajs["autopilot"].states
+
+
+def test_pack_non_numeric(tmp_path):
+    trajs = {"autopilot": TimeTrace(["times", "states"], [[], []])}
+    desc = shared_traces.pack_traces(trajs, str(tmp_path))
+    assert desc["filename"] is None
+    assert list(shared_traces.unpack_traces(desc, TimeTrace)["autopilot"].times) == []
+
+
+def test_discard_traces(tmp_path):
+    desc = shared_traces.pack_traces(make_traces(), str(tmp_path))
+    shared_traces.discard_traces(desc)
+    assert os.listdir(tmp_path) == []
+    # already removed
+    shared_traces.discard_traces(desc)
@@ -0,0 +1,77 @@
+import numpy as np
+
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+def test_resume_from_snapshot():
+    system = f16s.F16Simple()
+    system.set_state("plant", f16c.f16_gcas_scen)
+    full = system.simulate_tspan((0.0, 6.0))
+
+    system.simulate_tspan((0.0, 3.0))
+    snap = system.snapshot()
+    assert 2.9 < snap.time <= 3.0
+    for _ in range(2):
+        suffix = system.simulate_tspan((snap.time, 6.0), snapshot=snap)
+        for cname, trace in full.items():
+            after = np.asarray(trace.times) > snap.update_times[cname]
+            assert np.array_equal(suffix[cname].times, trace.times[after])
+        after = np.asarray(full["plant"].times) > snap.update_times["plant"]
+        assert np.array_equal(suffix["plant"].states, full["plant"].states[after])
+
+
+def test_branch_from_snapshot():
+    system = f16s.F16Simple()
+    system.set_state("plant", f16c.f16_gcas_scen)
+    system.simulate_tspan((0.0, 2.0))
+    snap = system.snapshot()
+
+    # perturb the altitude of the snapshot
+    system.restore(snap)
+    states = system.get_signal("plant", "states")
+    states[11] += 100.0
+    system.write_signals("plant", {"states": states})
+    branch = system.snapshot()
+    assert snap.signals is not branch.signals
+
+    trajs = system.simulate_tspan((snap.time, 4.0), snapshot=snap)
+    btrajs = system.simulate_tspan((snap.time, 4.0), snapshot=branch)
+    assert np.all(btrajs["plant"].states[:, 11] > trajs["plant"].states[:, 11])
+
+
+def test_snapshot_stateful_components():
+    system = f16s.F16AcasShield()
+    system.simulate_tspan((0.0, 2.0))
+    snap = system.snapshot()
+    auto = system.component_instances["autopilot"].parameters["auto"]
+    sauto = snap.components["autopilot"].parameters["auto"]
+    assert sauto is not auto and sauto.nets is auto.nets
+    full = system.simulate_tspan((0.0, 4.0))
+    suffix = system.simulate_tspan((snap.time, 4.0), snapshot=snap)
+    after = np.asarray(full["plant"].times) > snap.update_times["plant"]
+    assert np.array_equal(suffix["plant"].states, full["plant"].states[after])
+
+
+def test_reset_restores_setup(monkeypatch):
+    """resets restore the components as set up, initializing them only for the parameters they depend on"""
+    import f16lib.models.nnllc as nnllc
+    system = f16s.F16AcasShieldIntruderBalloon()
+    system.set_component_param("acas", "nn_backend", "numpy")
+    first = system.simulate_tspan((0.0, 5.0))
+    loads = []
+    init = nnllc.Model.__init__
+    monkeypatch.setattr(nnllc.Model, "__init__", lambda self, *args: loads.append(args) or init(self, *args))
+    again = system.simulate_tspan((0.0, 5.0))
+    system.set_component_param("acas", "hold_reference", False)
+    system.set_component_param("acas", "nn_backend", "numpy")
+    system.simulate_tspan((0.0, 5.0))
+    assert loads == [] and system.component_instances["acas"].auto is not None
+    assert system._components["acas"] is not system._pristine["acas"] and system._pristine["acas"].auto is None
+    system.reset(full=True)
+    full = system.simulate_tspan((0.0, 5.0))
+    for cname in first:
+        assert np.array_equal(again[cname].times, first[cname].times)
+        assert np.array_equal(full[cname].times, first[cname].times)
+    assert np.array_equal(again["plant"].states, first["plant"].states)
+    assert np.array_equal(full["plant"].states, first["plant"].states)
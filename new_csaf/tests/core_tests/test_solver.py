@@ -0,0 +1,65 @@
+import typing
+
+import numpy as np
+import pytest
+
+import csaf
+import f16lib.components as f16c
+import f16lib.systems as f16s
+from csaf.core.solver import EulerSolver, RK4Solver, DormandPrinceSolver
+
+
+class DecayState(typing.NamedTuple):
+    x: float
+
+
+def _decay(solver):
+    class DecayComponent(csaf.ContinuousComponent):
+        name = "Decay"
+        sampling_frequency = 10.0
+        default_parameters: typing.Dict[str, typing.Any] = {}
+        inputs = ()
+        outputs = ()
+        states = DecayState
+        default_initial_values = {"states": [1.0]}
+        flows = {"states": lambda m, t, s, u: -np.asarray(s)}
+        system_solver = solver
+    return DecayComponent()
+
+
+@pytest.mark.parametrize("solver, order", [(EulerSolver, 1), (RK4Solver, 4), (DormandPrinceSolver, 5)])
+def test_fixed_step_order(solver, order):
+    """error shrinks with the order of the method as substeps are added"""
+    errs = []
+    for substeps in (4, 8):
+        c = _decay(solver.with_substeps(substeps))
+        ret = c.solve_state([], [1.0], [0.0, 0.5, 1.0])
+        assert len(ret) == 3
+        errs.append(abs(ret[-1][0] - np.exp(-1.0)))
+    assert errs[1] < errs[0]
+    assert np.log2(errs[0] / errs[1]) == pytest.approx(order, abs=0.3)
+
+
+def test_fixed_step_stacked():
+    c = _decay(RK4Solver)
+    ret = c.solve_state([], np.array([[1.0], [2.0]]), [0.0, 0.1])
+    assert np.shape(ret[-1]) == (2, 1)
+    assert ret[-1][1][0] == pytest.approx(2 * ret[-1][0][0])
+
+
+def test_rk4_gcas():
+    class Plant(f16c.F16PlantComponent):
+        system_solver = RK4Solver.with_substeps(2)
+
+    class Llc(f16c.F16NNLlcComponent):
+        system_solver = RK4Solver.with_substeps(2)
+
+    class F16SimpleRK4(f16s.F16Simple):
+        components = {**f16s.F16Simple.components, "plant": Plant, "llc": Llc}
+
+    sys = F16SimpleRK4()
+    sys.set_state("plant", f16c.f16_gcas_scen)
+    _, passed = sys.simulate_tspan((0.0, 20.0),
+                                   terminating_conditions=lambda c, o: c == "plant" and o["states"][11] <= 0.0,
+                                   return_passed=True)
+    assert passed
@@ -0,0 +1,112 @@
+import os
+import time
+import typing
+
+import numpy as np
+import pytest
+
+import csaf
+
+from csaf.core.sweep import Sweep
+from csaf.test.scenario import Scenario
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+class GcasConfiguration(typing.NamedTuple):
+    alt: float
+
+
+class GcasScenario(Scenario):
+    configuration_space = GcasConfiguration
+    system_type = f16s.F16Simple
+
+    def configure_system(self, sys: csaf.System, conf: typing.Sequence) -> csaf.System:
+        state = list(f16c.f16_gcas_scen)
+        state[11] = conf[0]
+        sys.set_state("plant", state)
+        return sys
+
+
+def min_altitude(trajs, passed):
+    return float(np.min(trajs["plant"].states[:, 11]))
+
+
+def altitude_config(alt):
+    state = list(f16c.f16_gcas_scen)
+    state[11] = alt
+    return {"initial_values": {"plant": {"states": state}}}
+
+
+def test_sweep_system():
+    configs = [altitude_config(alt) for alt in (3000.0, 3600.0)] + \
+              [{"parameters": {"plant": {"not_a_param": 1.0}}}, {}]
+    calls = []
+    with Sweep(f16s.F16Simple, processes=2) as sweep:
+        res = sweep.run_all(configs, (0.0, 2.0), chunksize=2, progress=lambda n, total: calls.append((n, total)))
+        assert [r.position for r in res] == [0, 1, 2, 3]
+        assert [r.ok for r in res] == [True, True, False, True]
+        assert "not_a_param" in res[2].error and res[2].result is None
+
+        # runs match a serial simulation
+        system = f16s.F16Simple()
+        system.set_state("plant", configs[1]["initial_values"]["plant"]["states"])
+        trajs = system.simulate_tspan((0.0, 2.0))
+        assert np.array_equal(res[1].result["plant"].states, trajs["plant"].states)
+        assert calls == [(n, 4) for n in range(1, 5)]
+
+        # the workers are kept between runs
+        summaries = sweep.run_all(configs[:2], (0.0, 2.0), summary=min_altitude)
+        assert summaries[1].result == pytest.approx(np.min(trajs["plant"].states[:, 11]))
+
+
+def test_sweep_scenario():
+    confs = [(3000.0,), (3600.0,)]
+    with Sweep(GcasScenario, processes=2) as sweep:
+        res = list(sweep.run(confs, (0.0, 2.0), summary=min_altitude))
+    assert sorted(r.position for r in res) == [0, 1]
+    assert all(r.ok and r.passed for r in res)
+    res = sorted(res, key=lambda r: r.position)
+    assert res[0].result < res[1].result
+
+
+def test_sweep_worker_reuse(monkeypatch):
+    """workers reconfigure their system for every run, without building systems or running initializers"""
+    import csaf.core.sweep as csweep
+    for name in ("_worker_target", "_worker_system", "_worker_setup"):
+        monkeypatch.setattr(csweep, name, getattr(csweep, name))
+    csweep._init_worker(GcasScenario)
+    inits = []
+    init = f16c.F16LlcComponent.initialize
+    monkeypatch.setattr(f16c.F16LlcComponent, "initialize", lambda self: inits.append(self) or init(self))
+    system = csweep._system_for((3000.0,))
+    assert system is csweep._worker_system
+    system.simulate_tspan((0.0, 0.5))
+    system = csweep._system_for((3600.0,))
+    assert system is csweep._worker_system and len(system._iv_changes) == 1
+    system.simulate_tspan((0.0, 0.5))
+    assert system.component_instances["plant"].initial_values["states"][11] == 3600.0 and inits == []
+
+
+class FailingGcasScenario(GcasScenario):
+    """kills its worker for negative altitudes, and hangs for altitudes over 10000 ft"""
+
+    def configure_system(self, sys: csaf.System, conf: typing.Sequence) -> csaf.System:
+        if conf[0] < 0.0:
+            os._exit(1)
+        if conf[0] > 10000.0:
+            time.sleep(60.0)
+        return super().configure_system(sys, conf)
+
+
+def test_sweep_worker_failures():
+    confs = [(3000.0,), (-1.0,), (3600.0,), (20000.0,), (3200.0,)]
+    with Sweep(FailingGcasScenario, processes=2, mp_context="fork", timeout=5.0) as sweep:
+        start = time.monotonic()
+        res = sweep.run_all(confs, (0.0, 1.0), chunksize=2, summary=min_altitude)
+        assert time.monotonic() - start < 30.0
+        assert [r.ok for r in res] == [True, False, True, False, True]
+        assert "died" in res[1].error and "timed out" in res[3].error
+
+        # the pool recovers
+        assert all(r.ok for r in sweep.run_all(confs[:1], (0.0, 1.0), summary=min_altitude))
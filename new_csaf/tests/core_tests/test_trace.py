@@ -0,0 +1,118 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from csaf.core.trace import ColumnarTimeTrace, TimeTrace, TraceArray
+import f16lib.components as f16c
+import f16lib.systems as f16s
+
+
+def test_columnar_trace_append_grow():
+    trace = ColumnarTimeTrace(['times', 'states', 'outputs'], capacity=2)
+    assert not trace.states and len(trace) == 0
+    for idx in range(5):
+        trace.append(times=0.5 * idx, states=[idx, 2.0 * idx], outputs=['clear'])
+    assert len(trace) == 5
+    assert trace.states.shape == (5, 2) and trace.times.shape == (5,)
+    assert isinstance(trace.states, TraceArray) and trace.states
+    assert trace.times.index(1.0) == 2
+    assert trace.outputs.tolist() == [['clear']] * 5
+    assert trace[1][0] == 0.5 and list(trace[1][1]) == [1.0, 2.0]
+    with pytest.raises(TypeError):
+        trace.append(times=3.0, states=[0.0, 0.0])
+
+
+def test_columnar_trace_views():
+    trace = ColumnarTimeTrace(['times', 'states'])
+    trace.append(times=0.0, states=[1.0])
+    view = trace.states
+    assert np.shares_memory(view, trace['states'])
+    assert type(np.array(view) * 2.0) is np.ndarray
+    assert view == [[1.0]] and view != [[2.0]]
+    assert view.equal([[1.0]]).tolist() == [[True]]
+
+
+def test_columnar_trace_demote():
+    trace = ColumnarTimeTrace(['times', 'states'])
+    trace.append(times=0.0, states=[1.0, 2.0])
+    trace.append(times=1.0, states=[1.0, 2.0, 3.0])
+    assert trace.states.tolist() == [[1.0, 2.0], [1.0, 2.0, 3.0]]
+
+
+def test_columnar_trace_ring():
+    trace = ColumnarTimeTrace(['times', 'x'], max_length=3)
+    for idx in range(10):
+        trace.append(times=float(idx), x=[idx, 2 * idx])
+        assert list(trace.times) == [float(i) for i in range(max(idx - 2, 0), idx + 1)]
+    assert trace.x.tolist() == [[7.0, 14.0], [8.0, 16.0], [9.0, 18.0]] and trace[-1][0] == 9.0
+
+    # views are read-only, and keep their rows as the ring advances
+    x = trace.x
+    with pytest.raises(ValueError):
+        x[0, 0] = -1.0
+    for idx in range(10, 16):
+        trace.append(times=float(idx), x=[idx, 2 * idx])
+    assert x.tolist() == [[7.0, 14.0], [8.0, 16.0], [9.0, 18.0]] and list(trace.times) == [13.0, 14.0, 15.0]
+    loaded = pickle.loads(pickle.dumps(trace))
+    loaded.append(times=16.0, x=[16, 32])
+    assert list(loaded.times) == [14.0, 15.0, 16.0]
+
+
+def test_trace_pickle():
+    trace = ColumnarTimeTrace(['times', 'states'])
+    trace.append(times=0.0, states=[1.0, 2.0])
+    loaded = pickle.loads(pickle.dumps(trace))
+    assert np.array_equal(loaded.states, trace.states)
+    loaded.append(times=1.0, states=[3.0, 4.0])
+    assert len(loaded) == 2 and len(trace) == 1
+
+    trace.truncate(0)
+    empty = pickle.loads(pickle.dumps(trace))
+    empty.append(times=0.0, states=[1.0, 2.0])
+    assert empty.states == [[1.0, 2.0]]
+
+    ring = ColumnarTimeTrace(['times'], max_length=2)
+    for t in range(3):
+        ring.append(times=float(t))
+    loaded = pickle.loads(pickle.dumps(ring))
+    assert loaded._buffers['times'].shape == (4,)
+    for t in range(3, 6):
+        loaded.append(times=float(t))
+    assert loaded.times == [4.0, 5.0] and loaded._buffers['times'].shape == (4,)
+
+    ltrace = TimeTrace(['times', 'states'])
+    ltrace.append(times=0.0, states=[1.0, 2.0])
+    assert pickle.loads(pickle.dumps(ltrace)).states == [[1.0, 2.0]]
+
+
+def test_simulate_columnar_traces():
+    system = f16s.F16Simple()
+    system.set_state("plant", f16c.f16_gcas_scen)
+    trajs = system.simulate_tspan((0.0, 2.0))
+    assert isinstance(trajs["plant"], ColumnarTimeTrace)
+    assert trajs["plant"].states.shape == (len(trajs["plant"]), 13)
+    assert trajs["plant"].states.dtype == np.float64
+    assert trajs["autopilot"].states.dtype == object
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_save_load_traces(tmp_path, compress):
+    from csaf.core.trace import save_traces, load_traces
+    system = f16s.F16Simple()
+    system.set_state("plant", f16c.f16_gcas_scen)
+    trajs = system.simulate_tspan((0.0, 2.0))
+    save_traces(trajs, tmp_path / "run", compress=compress, dtypes={"llc": {"states": np.float32}})
+    loaded = load_traces(tmp_path / "run")
+    assert set(loaded) == set(trajs)
+    for cname, trace in trajs.items():
+        assert loaded[cname].names == trace.names and len(loaded[cname]) == len(trace)
+    assert np.array_equal(loaded["plant"].states, trajs["plant"].states)
+    assert isinstance(loaded["plant"]._buffers["states"], np.memmap) != compress
+    assert loaded["llc"].states.dtype == np.float32
+    assert loaded["autopilot"].states.tolist() == trajs["autopilot"].states.tolist()
+
+    # loaded traces can be extended
+    plant = load_traces(tmp_path / "run", components=["plant"])["plant"]
+    plant.append(times=5.0, states=[0.0] * 13, outputs=[0.0] * 4)
+    assert len(plant) == len(trajs["plant"]) + 1
@@ -1,3 +1,5 @@
+import copy
+import typing
 import pytest
 import csaf
 import f16lib.systems as f16s
@@ -53,3 +55,209 @@ def test_acas_scenario(acas_shield_balloon_f16: csaf.System):
                                                       terminating_conditions_all=air_collision_condition,
                                                       return_passed=True)
     assert not p, f"{acas_shield_balloon_f16.__class__.__name__} did not collide"
+
+
+def test_acas_batched_inference():
+    """batched network evaluation issues the same advisories as one evaluation per aircraft pair"""
+    from f16lib.models.acasxu import AcasXuAutopilot
+    rng = np.random.default_rng(0)
+    num_aircraft, num_vars = 4, 16
+    init = np.zeros((num_aircraft, num_vars))
+    init[:, 0] = 800.0
+    init[:, 11] = 1000.0
+    autos = [AcasXuAutopilot(init.flatten(), num_aircraft_acasxu=3, batched=batched) for batched in (False, True)]
+    advisories = 0
+    for t in range(20):
+        x = init.copy()
+        x[:, 0] = rng.uniform(300, 1000, num_aircraft)
+        x[:, 5] = rng.uniform(-np.pi, np.pi, num_aircraft)
+        x[:, 9:11] = rng.uniform(-3000, 3000, (num_aircraft, 2))
+        for auto in autos:
+            auto.advance_discrete_mode(2.0 * t, x.flatten())
+        assert autos[0].all_acasxu_commands == autos[1].all_acasxu_commands
+        assert autos[0].commands == autos[1].commands
+        advisories += sum(c != 0 for cmds in autos[1].all_acasxu_commands for c in cmds)
+    assert advisories > 0
+
+
+def test_acas_session_cache(tmp_path):
+    """sessions are created once per process and options"""
+    import f16lib.models.acasxu as acasxu
+    from f16lib.models.acasxu import AcasXuAutopilot
+    nets = acasxu.load_networks()
+    assert all(a is b for a, b in zip(nets, acasxu.load_networks()))
+
+    # explicit options leave the defaults as they are
+    opt_nets = acasxu.load_networks(intra_op_num_threads=1, optimized_model_dir=str(tmp_path))
+    assert all(a is not b for a, b in zip(nets, opt_nets))
+    assert all(a is b for a, b in zip(opt_nets, acasxu.load_networks(intra_op_num_threads=1,
+                                                                      optimized_model_dir=str(tmp_path))))
+    assert all(a is b for a, b in zip(nets, acasxu.load_networks()))
+    assert len(list(tmp_path.iterdir())) == 5
+
+    # autopilots drop the cleared sessions
+    auto = AcasXuAutopilot(np.zeros(16))
+    assert all(a is b for a, b in zip(auto.nets, nets))
+    acasxu.clear_session_cache()
+    new_nets = acasxu.load_networks()
+    assert all(a is not b for a, b in zip(nets, new_nets))
+    assert all(a is b for a, b in zip(auto.nets, new_nets))
+
+    # the sessions load the optimized models
+    data_in = np.zeros((1, 1, 1, 5), dtype=np.float32)
+    for a, b in zip(opt_nets, acasxu.load_networks(optimized_model_dir=str(tmp_path))):
+        assert np.array_equal(acasxu.predict_with_onnxruntime(a, data_in),
+                              acasxu.predict_with_onnxruntime(b, data_in))
+
+
+def test_acas_numpy_backend():
+    """the numpy networks agree with the onnx networks"""
+    import f16lib.models.acasxu as acasxu
+    rng = np.random.default_rng(0)
+    data_in = rng.uniform(acasxu.ACASXU_INPUT_RANGES[:, 0], acasxu.ACASXU_INPUT_RANGES[:, 1], (200, 5))
+    scaled = acasxu.scale_inputs(data_in)
+    for onet, nnet in zip(acasxu.load_networks("onnx"), acasxu.load_networks("numpy")):
+        ores, nres = acasxu.predict_batch(onet, scaled), acasxu.predict_batch(nnet, scaled)
+        assert np.allclose(ores, nres, rtol=1E-4, atol=1E-4)
+        assert np.array_equal(np.argmin(ores, axis=1), np.argmin(nres, axis=1))
+
+
+def test_acas_scenario_numpy_backend(acas_shield_balloon_f16: csaf.System):
+    """the scenario issues the same advisories with either backend"""
+    trajs: typing.Any = acas_shield_balloon_f16.simulate_tspan((0.0, 20.0))
+    acas_shield_balloon_f16.set_component_param("acas", "nn_backend", "numpy")
+    ntrajs: typing.Any = acas_shield_balloon_f16.simulate_tspan((0.0, 20.0))
+    assert ntrajs["acas"].states == trajs["acas"].states
+    assert any(s != ["clear"] for s in ntrajs["acas"].states)
+
+
+def test_acas_collision_monitor(acas_shield_balloon_f16: csaf.System):
+    """the collision monitor stops the scenario at the same event as the collision condition"""
+    trajs: typing.Any = acas_shield_balloon_f16.simulate_tspan((0.0, 20.0),
+                                                               terminating_conditions_all=f16acas.collision_condition)
+    monitor = f16acas.collision_monitor()
+    mtrajs: typing.Any = acas_shield_balloon_f16.simulate_tspan((0.0, 20.0), terminating_conditions_all=monitor)
+    assert all(len(mtrajs[k]) == len(trajs[k]) for k in trajs)
+    assert monitor.separation < 400.0
+
+
+def test_acas_collision_crossings():
+    """the collision crossings stop the scenario at the exact time the separation crosses the threshold"""
+    import f16lib.goals as f16g
+    goal = f16g.AcasAirspeedCollideNoBalloonGoal
+    system = goal.scenario_type().generate_system(goal.fixed_configurations[0])
+    monitor = f16acas.collision_monitor()
+    mtrajs: typing.Any = system.simulate_tspan(goal.tspans[0], terminating_conditions_all=monitor)
+    trajs: typing.Any = system.simulate_tspan(goal.tspans[0], zero_crossings=f16acas.collision_crossings())
+    crossing = system.crossings[0]
+    assert crossing.name == "collision_intruder_plant"
+    separation = f16acas.separation(crossing.states["plant"], crossing.states["intruder_plant"])
+    assert separation == pytest.approx(0.0, abs=1E-4)
+    assert mtrajs["plant"].times[-2] < crossing.time <= mtrajs["plant"].times[-1]
+    assert trajs["plant"].times[-1] == crossing.time
+
+
+def test_predictor_windowed():
+    from f16lib.predictor import CollisionPredictor
+    pred = CollisionPredictor(((0.0, 0.0, 1000.0),), ((0.0, 0.0, 1000.0),), mode="windowed", window=30)
+    own, balloon = list(f16c.f16_xequil), list(f16c.f16_xequil)
+    for step in range(60):
+        t = step / 10.0
+        intruder = list(f16c.f16_xequil)
+        intruder[9], intruder[10] = 500.0 * t, 1000.0 + 100.0 * t
+        pred.step(t, [*own, *intruder, *balloon])
+        if step == 29:
+            predictors = pred.train_predictors()
+    assert len(pred.pbuffer.buffer) == 30 and pred.pbuffer.tbuffer[0] == pytest.approx(3.0)
+
+    # the GPs are kept, and retrained over the window
+    assert pred.train_predictors() is predictors
+    assert predictors[0].X.shape == (30, 1) and predictors[0].X[0, 0] == pytest.approx(3.0)
+    tspan = np.arange(6.0, 8.0, 0.1)
+    _, (x, _), (y, _) = pred.predict_intruder(pred.pbuffer.tbuffer, tspan, pred.pbuffer.buffer, predictors, idx=1)
+    assert np.allclose(y, 500.0 * tspan, rtol=0.05)
+
+    # the surrogate interpolates a table of predictions over the horizon, made with one call per predictor
+    calls = []
+    for predictor in predictors:
+        predictor.predict = lambda x, predict=predictor.predict: calls.append(x.shape) or predict(x)
+    surrogate = pred.surrogate_system()
+    assert calls == [(len(pred.horizon()), 1)] * 2
+    comp = surrogate.components["intruder_plant"]()
+    state = comp.flows["states"](comp, 7.0, f16c.f16_xequil, [])
+    assert len(calls) == 2
+    assert state[9] == pytest.approx(predictors[0].predict(np.array([[7.0]]))[0][0, 0], rel=1e-3)
+
+
+class F16WaypointSimple(csaf.System):
+    components = {
+        "plant": f16c.F16PlantComponent,
+        "llc": f16c.F16LlcComponent,
+        "waypoint": f16c.F16AutoWaypointComponent
+    }
+
+    connections = {
+        ("plant", "inputs"): ("llc", "outputs"),
+        ("waypoint", "inputs_poutputs"): ("plant", "outputs"),
+        ("waypoint", "inputs_pstates"): ("plant", "states"),
+        ("llc", "inputs_pstates"): ("plant", "states"),
+        ("llc", "inputs_poutputs"): ("plant", "outputs"),
+        ("llc", "inputs_coutputs"): ("waypoint", "outputs")
+    }
+
+
+def test_predictor_ownship_models():
+    import time
+    from f16lib.predictor import CollisionPredictor, OwnshipSurrogate
+    waypoints = ((3000.0, 8000.0, 1000.0), (-3000.0, 16000.0, 1000.0))
+    balloon = list(f16c.f16_xequil)
+    balloon[9] = 1E5
+    tt = np.array([0.0])
+    tspan = np.arange(0.0, 5.0, 0.1)
+    surrogate = OwnshipSurrogate(waypoints)
+    for alt in (1000.0, 1100.0):
+        own = list(f16c.f16_xequil)
+        own[11] = alt
+        pstates = np.array([[*own, *f16c.f16_xequil, *balloon]])
+        fresh = CollisionPredictor.predict_ownship(tt, tspan, pstates, waypoints)
+        reused = CollisionPredictor.predict_ownship(tt, tspan, pstates, waypoints, surrogate=surrogate)
+        assert np.allclose(fresh[1][0], reused[1][0]) and np.allclose(fresh[2][0], reused[2][0])
+    assert len(surrogate.system._iv_changes) == 3
+
+    # copies of a predictor build their own surrogate system, rather than copying or sharing it
+    pred = CollisionPredictor(waypoints, waypoints)
+    assert pred.ownship_model == "surrogate"
+    pred.surrogate.simulate({'plant': pstates[-1, :13]}, (0.0, 1.0))
+    pcopy = copy.deepcopy(pred)
+    assert pcopy.surrogate is not pred.surrogate and pcopy.surrogate._system is None
+    assert pcopy.surrogate.system is not pred.surrogate.system
+    copied = CollisionPredictor.predict_ownship(tt, tspan, pstates, waypoints, surrogate=pcopy.surrogate)
+    assert np.allclose(copied[1][0], reused[1][0]) and np.allclose(copied[2][0], reused[2][0])
+
+    # the kinematic model follows the waypoint autopilot, well within a 10 Hz period
+    tspan = np.arange(0.0, 10.0, 0.1)
+    start = time.perf_counter()
+    kinematic = CollisionPredictor.predict_ownship_kinematic(tt, tspan, pstates, waypoints)
+    assert time.perf_counter() - start < 0.1
+    system = F16WaypointSimple()
+    system.set_state("plant", pstates[-1, :13])
+    system.set_component_param("waypoint", "waypoints", waypoints)
+    trajs = system.simulate_tspan((0.0, 10.0))
+    north = np.interp(tspan, trajs["plant"].times, trajs["plant"].states[:, 9])
+    east = np.interp(tspan, trajs["plant"].times, trajs["plant"].states[:, 10])
+    assert np.max(np.hypot(kinematic[1][0] - east, kinematic[2][0] - north)) < 250.0
+
+
+def test_acas_hold_reference(acas_shield_balloon_f16: csaf.System):
+    """with held references, the controller only wakes up for its network evaluations"""
+    trajs: typing.Any = acas_shield_balloon_f16.simulate_tspan((0.0, 20.0))
+    acas_shield_balloon_f16.set_component_param("acas", "hold_reference", True)
+    # no wakeup before the first update creates the autopilot
+    acas_shield_balloon_f16.reset()
+    acas = acas_shield_balloon_f16.component_instances["acas"]
+    assert acas.wakeup is not None
+    assert acas.wakeup(0.0, [], acas_shield_balloon_f16.build_input_vec("acas")) is None
+    htrajs: typing.Any = acas_shield_balloon_f16.simulate_tspan((0.0, 20.0))
+    assert np.allclose(htrajs["acas"].times, np.arange(0.0, 20.0, 2.0))
+    assert len(htrajs["plant"]) == len(trajs["plant"])
+    assert np.array_equal(htrajs["acas"].states, trajs["acas"].states[::20])
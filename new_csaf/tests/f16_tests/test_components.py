@@ -25,3 +25,65 @@ def test_defaults_component(comp_name, comp):
     if comp not in abstract_components:
         compi = comp()
         compi.solve_default()
+
+
+def test_plant_flows_share_evaluation():
+    import f16lib.models.f16 as f16
+    plant = f16c.F16PlantComponent()
+    plant.memoize_flows = True
+    x, u = f16c.f16_gcas_scen, [0.1, 0.0, 0.0, 0.0]
+    ret = f16.subf16df(plant, 0.0, x, u)
+    assert f16.subf16df(plant, 0.0, list(x), list(u)) is ret
+    assert f16.model_output(plant, 0.0, x, u) is ret[1]
+    assert f16.subf16df(plant, 0.0, x, [0.2, 0.0, 0.0, 0.0]) is not ret
+
+
+@pytest.mark.parametrize("monolithic", [False, True])
+def test_plant_memo_simulation(monkeypatch, monolithic):
+    import f16lib.models.f16 as f16
+    import f16lib.systems as f16s
+    calls, evals = [], []
+    subf16df, _subf16df = f16.subf16df, f16._subf16df
+    monkeypatch.setattr(f16, "subf16df", lambda *args, **kwargs: calls.append(1) or subf16df(*args, **kwargs))
+    monkeypatch.setattr(f16, "_subf16df", lambda *args: evals.append(1) or _subf16df(*args))
+    system = f16s.F16Simple()
+    system.monolithic = monolithic
+    system.set_state("plant", f16c.f16_gcas_scen)
+    system.simulate_tspan((0.0, 1.0))
+    plant = system.component_instances["plant"]
+    if monolithic:
+        # the outputs of the plant are evaluated where the derivative was, so the memo hits
+        assert plant.memoize_flows and len(evals) < len(calls)
+    else:
+        # the outputs are evaluated at the end of the steps only, and nothing is memoized
+        assert not plant.memoize_flows and "_memo_subf16df" not in plant.__dict__ and len(evals) == len(calls)
+
+
+def test_plant_memo_parameter_change():
+    import numpy as np
+    import f16lib.models.f16 as f16
+    plant = f16c.F16PlantComponent()
+    plant.memoize_flows = True
+    x, u = f16c.f16_gcas_scen, [0.1, 0.0, 0.0, 0.0]
+    xd, _ = f16.subf16df(plant, 0.0, x, u)
+    plant.parameters['cxt_mult'] = 5.0
+    cxd, _ = f16.subf16df(plant, 0.0, x, u)
+    assert not np.allclose(xd, cxd)
+    ref = f16c.F16PlantComponent()
+    ref.parameters['cxt_mult'] = 5.0
+    assert np.array_equal(cxd, f16.subf16df(ref, 0.0, x, u)[0])
+
+
+@pytest.mark.parametrize("model", ["stevens", "morelli"])
+def test_plant_compiled_derivative(model):
+    import numpy as np
+    import f16lib.models.f16 as f16
+    x, u = np.array(f16c.f16_gcas_scen, dtype=float), [0.3, -1.0, 0.5, 0.2]
+    plant, cplant = f16c.F16PlantComponent(), f16c.F16PlantComponent()
+    plant.parameters["model"] = cplant.parameters["model"] = model
+    cplant.parameters["compiled"] = True
+    cplant.initialize()
+    xd, out = f16.subf16df(plant, 0.0, x, u)
+    cxd, cout = f16.subf16df(cplant, 0.0, x, u)
+    assert np.allclose(xd, cxd, rtol=1E-12, atol=1E-12)
+    assert np.allclose(out, cout, rtol=1E-12, atol=1E-12)
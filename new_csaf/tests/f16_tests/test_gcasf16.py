@@ -53,3 +53,11 @@ def test_gcas_scenario(simple_f16: f16s.F16Simple):
     simple_f16.set_state("plant", f16_fail_state)
     t, p = simple_f16.simulate_tspan((0.0, 20.0), terminating_conditions=ground_collision_condition, return_passed=True)
     assert not p, f"{simple_f16.__class__.__name__} did not collide with the ground"
+
+
+def test_gcas_scenario_compiled(simple_f16: f16s.F16Simple):
+    """check that GCAS works with the compiled plant derivative"""
+    simple_f16.set_component_param("plant", "compiled", True)
+    simple_f16.set_state("plant", f16c.f16_gcas_scen)
+    t, p = simple_f16.simulate_tspan((0.0, 20.0), terminating_conditions=ground_collision_condition, return_passed=True)
+    assert p, f"{simple_f16.__class__.__name__} collided with the ground"
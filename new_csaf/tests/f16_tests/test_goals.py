@@ -1,7 +1,11 @@
 import f16lib.goals as f16g
+import f16lib.systems as f16s
+from csaf.core.monitor import RunningMin
 from csaf.test.scenario import BOptFalsifyGoal
+import math
 import typing
 import csaf
+import numpy as np
 import pytest
 
 # extract goal types from f16lib
@@ -25,3 +29,87 @@ def test_goal_test(goal_name, goal):
         return
     else:
         assert goal().test()
+
+
+class _QuadraticScenario(csaf.Scenario):
+    system_type = f16s.F16Simple
+
+    bounds = [(-1.0, 1.0)] * 4
+
+
+class _QuadraticGoal(BOptFalsifyGoal):
+    """falsification of a quadratic bowl, minimum at 0.5"""
+    scenario_type = _QuadraticScenario
+
+    tspan = (0.0, 0.1)
+
+    max_iter = 3
+
+    tolerance = 0.0
+
+    @staticmethod
+    def property(ctraces) -> bool:
+        return True
+
+    def objective_function_single(self, conf) -> float:
+        return float(np.sum((np.asarray(conf) - 0.5) ** 2))
+
+
+def test_sim_goal_monitor_per_run():
+    class _MonitoredGoal(_QuadraticGoal):
+        terminating_conditions_all = RunningMin("plant", index=11)
+
+    _MonitoredGoal.run_sim([0.0] * 4)
+    # the monitor of the goal type is a template, each simulation advances a copy
+    assert _MonitoredGoal.terminating_conditions_all.value == math.inf
+
+
+@pytest.mark.parametrize("batch_method", BOptFalsifyGoal.batch_methods)
+def test_bopt_batch(batch_method):
+    goal = _QuadraticGoal()
+    goal.batch_size, goal.processes, goal.batch_method = 3, 2, batch_method
+    goal.optimizer = goal.gen_optimizer()
+    goal.check()
+    assert goal.test()
+    bo = goal.optimizer
+    assert bo.X.shape == (1 + 3 * 3, 4)
+    assert np.allclose(bo.Y[:, 0], [goal.objective_function_single(x) for x in bo.X])
+    # the configurations of a batch are distinct
+    assert len(np.unique(np.round(bo.X[1:4], 6), axis=0)) == 3
+
+
+@pytest.mark.parametrize("batch_method", BOptFalsifyGoal.batch_methods)
+def test_bopt_asynchronous(batch_method):
+    goal = _QuadraticGoal()
+    goal.asynchronous, goal.processes, goal.batch_method, goal.max_iter = True, 3, batch_method, 6
+    goal.optimizer = goal.gen_optimizer()
+    assert goal.test()
+    bo = goal.optimizer
+    assert bo.X.shape == (1 + 6, 4) and bo.Y.shape == (1 + 6, 1)
+    assert np.allclose(bo.Y[:, 0], [goal.objective_function_single(x) for x in bo.X])
+    assert len(np.unique(np.round(bo.X, 6), axis=0)) == 7
+    assert goal.objective_function_single(goal.best_configuration()) == bo.Y.min()
+
+
+def test_bopt_asynchronous_tolerance():
+    """suggestions stop once two consecutive ones are within tolerance"""
+    goal = _QuadraticGoal()
+    # wider than the configuration space
+    goal.asynchronous, goal.processes, goal.max_iter, goal.tolerance = True, 1, 6, 10.0
+    goal.optimizer = goal.gen_optimizer()
+    assert goal.test()
+    assert goal.optimizer.X.shape == (1 + 2, 4)
+
+
+class _DyingGoal(_QuadraticGoal):
+    def objective_function_single(self, conf) -> float:
+        import os
+        os._exit(1)
+
+
+def test_bopt_asynchronous_worker_died():
+    goal = _DyingGoal()
+    goal.asynchronous, goal.processes, goal.evaluation_timeout = True, 2, 2.0
+    goal.optimizer = goal.gen_optimizer()
+    with pytest.raises(TimeoutError):
+        goal.test()
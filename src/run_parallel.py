@@ -1,5 +1,6 @@
 from multiprocessing import Process, Event, Queue, JoinableQueue
 import multiprocessing
+import os
 import tqdm
 import dill
 import numpy as np
@@ -8,6 +9,7 @@ import csaf.system as csys
 import csaf.config as cconf
 import csaf.trace as ctc
 from csaf import csaf_logger
+from shared_traces import shared_directory, pack_traces, unpack_traces, discard_traces
 
 def save_states_to_file(filename, states):
     np.savetxt(filename, [val['plant'] for val in states], delimiter=",")
@@ -94,12 +96,18 @@ class Worker(Process):
         return
 
 class Task(object):
-    def __init__(self, idx, system_attr, initial_states, *args, **kwargs):
+    def __init__(self, idx, system_attr, initial_states, *args, shared_dir=None, summary=None, **kwargs):
+        """
+        :param shared_dir: send the traces back through memory mapped files in this directory (pickled when None)
+        :param summary: send back summary(trajs, passed) instead of the traces
+        """
         self.idx = idx
         self.system_attr = system_attr
         self.args = args
         self.kwargs = kwargs
         self.states = initial_states
+        self.shared_dir = shared_dir
+        self.summary = summary
 
     def __call__(self, system: csys.System):
         for cname, cstate in self.states.items():
@@ -107,7 +115,13 @@ class Task(object):
         assert hasattr(system, self.system_attr)
         try:
             ret = getattr(system, self.system_attr)(*self.args, **self.kwargs)
-            answer = [self.idx, dill.dumps(ret), self.states]
+            if self.summary is not None:
+                answer = [self.idx, ("summary", (self.summary(ret[0], ret[1]), ret[1])), self.states]
+            elif self.shared_dir is not None:
+                desc = pack_traces(ret[0], self.shared_dir, prefix=f"csaf-{os.getpid()}-{self.idx}-")
+                answer = [self.idx, ("shared", (desc, ret[1])), self.states]
+            else:
+                answer = [self.idx, ("pickled", dill.dumps(ret)), self.states]
         except Exception as exc:
             csaf_logger.warning(f"running {self.system_attr} failed for states {self.states}")
             answer = [self.idx, exc, self.states]
@@ -117,7 +131,17 @@ class Task(object):
         return f"id {self.idx} -- {self.system_attr}(args={self.args}, kwargs={self.kwargs})"
 
 
-def run_workgroup(n_tasks, config, initial_states, *args, fname="simulate_tspan", show_status=True, **kwargs):
+def run_workgroup(n_tasks, config, initial_states, *args, fname="simulate_tspan", show_status=True,
+                  shared_memory=True, summary=None, **kwargs):
+    """run the simulations of a list of initial states over a group of worker processes
+
+    :param shared_memory: transfer the traces through memory mapped files rather than pickling them, so the parent
+        attaches to them without copying; the numeric fields of the returned traces are then numpy arrays (views
+        over the mapping) rather than lists, pass False to get the pickled lists
+    :param summary: picklable function summary(trajs, passed), computed in the workers; when given, its value is
+        returned in place of the traces
+    :returns list: (passed, traces or summary value, initial states) of the runs that didn't raise
+    """
     def progress_listener(q):
         pbar = tqdm.tqdm(total = n_tasks)
         for _ in iter(q.get, None):
@@ -147,7 +171,8 @@ def run_workgroup(n_tasks, config, initial_states, *args, fname="simulate_tspan"
 
     # Enqueue jobs
     for idx in range(n_tasks):
-        t = Task(idx, fname, initial_states[idx], *args, **kwargs, show_status=False, return_passed=True)
+        t = Task(idx, fname, initial_states[idx], *args, **kwargs, show_status=False, return_passed=True,
+                 shared_dir=shared_directory() if shared_memory else None, summary=summary)
         tasks.put(t)
 
     # Stop all workers
@@ -162,12 +187,27 @@ def run_workgroup(n_tasks, config, initial_states, *args, fname="simulate_tspan"
 
     # Start printing results
     ret = [None] * n_tasks
-    while n_tasks:
-        result = results.get()
-        if not isinstance(result[1], Exception):
-            res = dill.loads(result[1])
-            ret[result[0]] = tuple([res[1], res[0], result[2]])
-        n_tasks -= 1
+    remaining = n_tasks
+    try:
+        while remaining:
+            result = results.get()
+            remaining -= 1
+            if not isinstance(result[1], Exception):
+                kind, payload = result[1]
+                if kind == "pickled":
+                    res = dill.loads(payload)
+                elif kind == "shared":
+                    res = (unpack_traces(payload[0], ctc.TimeTrace), payload[1])
+                else:
+                    res = payload
+                ret[result[0]] = tuple([res[1], res[0], result[2]])
+    finally:
+        # remove the shared files of the results left unread (e.g. when reading one of them failed)
+        while remaining:
+            result = results.get()
+            remaining -= 1
+            if not isinstance(result[1], Exception) and result[1][0] == "shared":
+                discard_traces(result[1][1][0])
     csaf_logger.info("parallel run finished")
     ret = [val for val in ret if val != None]
     return ret
@@ -0,0 +1,84 @@
+"""transfer of traces between processes through memory mapped files (under /dev/shm when available)
+
+only numpy is needed, so the traces can be packed and attached to apart from the csaf package that simulates them
+"""
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+
+def shared_directory():
+    """directory for the memory mapped result files (shared memory when available)"""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+def pack_traces(trajs, directory, prefix="csaf-"):
+    """write the numeric fields of traces into one memory mapped file
+
+    fields that are not numeric arrays (e.g. strings or ragged lists) are pickled into the descriptor instead
+    :returns dict: compact descriptor of the traces, to pass to unpack_traces
+    """
+    names, fields, pickled, arrays = {}, {}, {}, []
+    offset = 0
+    for cname, trace in trajs.items():
+        names[cname] = trace.names
+        for name in trace.names:
+            values = getattr(trace, name)
+            try:
+                arr = np.asarray(values)
+            except ValueError:
+                arr = None
+            if arr is None or arr.dtype.kind not in "biuf" or arr.size == 0:
+                pickled[(cname, name)] = values
+                continue
+            fields[(cname, name)] = (offset, arr.shape, arr.dtype.str)
+            arrays.append((offset, arr))
+            # keep every field 64 byte aligned
+            offset += -(-arr.nbytes // 64) * 64
+
+    filename = None
+    if offset > 0:
+        fd, filename = tempfile.mkstemp(dir=directory, prefix=prefix)
+        os.close(fd)
+        try:
+            buf = np.memmap(filename, dtype=np.uint8, mode="w+", shape=(offset,))
+            for off, arr in arrays:
+                buf[off:off + arr.nbytes] = np.ascontiguousarray(arr).view(np.uint8).reshape(-1)
+            buf.flush()
+            del buf
+        except BaseException:
+            os.unlink(filename)
+            raise
+    return {"filename": filename, "names": names, "fields": fields, "pickled": pickle.dumps(pickled)}
+
+def unpack_traces(descriptor, trace_type):
+    """attach to the traces written by pack_traces without copying them
+
+    the file is removed once mapped, so it is freed when the traces are no longer referenced
+    :param trace_type: trace class, built as trace_type(names, columns)
+    """
+    buf = None
+    if descriptor["filename"] is not None:
+        try:
+            buf = np.memmap(descriptor["filename"], dtype=np.uint8, mode="c")
+        finally:
+            os.unlink(descriptor["filename"])
+    pickled = pickle.loads(descriptor["pickled"])
+    trajs = {}
+    for cname, names in descriptor["names"].items():
+        columns = []
+        for name in names:
+            if (cname, name) in pickled:
+                columns.append(pickled[(cname, name)])
+            else:
+                off, shape, dtype = descriptor["fields"][(cname, name)]
+                count = int(np.prod(shape))
+                columns.append(np.frombuffer(buf, dtype=dtype, count=count, offset=off).reshape(shape))
+        trajs[cname] = trace_type(names, columns)
+    return trajs
+
+def discard_traces(descriptor):
+    """remove the file of traces written by pack_traces that won't be unpacked"""
+    if descriptor["filename"] is not None and os.path.exists(descriptor["filename"]):
+        os.unlink(descriptor["filename"])